@@ -5,6 +5,8 @@ from ._affine_ops_gen import _Dialect
 from ..annot import Annot
 from ..arith import ArithValue, constant
 from ..memref import MemRefValue, AllocaOp
+from ..scf import carry_iter_args, inner_iter_args, yield_iter_args
+from ..utils import caller_location
 
 # noinspection PyUnresolvedReferences
 from .._mlir.dialects._ods_common import _cext
@@ -40,6 +42,7 @@ class AffineForOp(OpView):
         lower_bound,
         upper_bound,
         step,
+        iter_args: Optional[Union[Operation, OpView, Sequence[Value]]] = None,
         *,
         loc=None,
         ip=None,
@@ -49,14 +52,17 @@ class AffineForOp(OpView):
             "upper_bound": AffineMapAttr.get(AffineMap.get_constant(upper_bound)),
             "step": IntegerAttr.get(IntegerType.get_signless(64), step),
         }
-
-        results = []
+        if iter_args is None:
+            iter_args = []
+        # the bounds are constant maps, so the only operands are the inits
+        iter_args = get_op_results_or_values(iter_args)
+        results = [arg.type for arg in iter_args]
         super().__init__(
             self.build_generic(
                 regions=1,
-                results=[],
+                results=results,
                 attributes=attributes,
-                operands=[],
+                operands=list(iter_args),
                 loc=loc,
                 ip=ip,
             )
@@ -155,23 +161,40 @@ class StoreOp(affine.AffineStoreOp):
 _for_ip = None
 
 
-def affine_range(start, stop=None, step=1):
+def affine_range(start, stop=None, step=1, iter_args=None):
+    """With `iter_args` (loop-carried values), the (single) iteration produces
+    the induction variable along with the iter args as seen in the body, and
+    `end_for` takes the values carried to the next iteration and returns the
+    results of the loop. Only `iter_args` that are MLIR values are carried (see
+    `carry_iter_args`)."""
     global _for_ip
 
     if stop is None:
         stop = start
         start = 0
 
-    for_op = AffineForOp(start, stop, step)
+    inits = carry_iter_args(iter_args) if iter_args else None
+    for_op = AffineForOp(start, stop, step, inits, loc=caller_location())
     _for_ip = InsertionPoint(for_op.body)
     _for_ip.__enter__()
-    return [ArithValue(for_op.induction_variable)]
+    if not iter_args:
+        return [ArithValue(for_op.induction_variable)]
+    return [
+        (
+            ArithValue(for_op.induction_variable),
+            *inner_iter_args(for_op, iter_args),
+        )
+    ]
 
 
-def end_for():
-    affine.AffineYieldOp([])
-    global _for_ip
-    _for_ip.__exit__(None, None, None)
+def end_for(*yielded, names=None):
+    for_op = InsertionPoint.current.block.owner
+    try:
+        return yield_iter_args(affine.AffineYieldOp, for_op, yielded, names)
+    finally:
+        # also on a bad yield, such that the error isn't masked by unbalanced
+        # insertion points
+        _for_ip.__exit__(None, None, None)
 
 
 def store(
@@ -0,0 +1,140 @@
+"""Wrappers that run a kernel over a batch of inputs in a single native call."""
+from typing import Optional, Sequence
+
+from ..mlir._mlir import ir
+from ..mlir._mlir.dialects import arith
+from ..mlir._mlir.dialects import func
+from ..mlir._mlir.dialects import memref
+from ..mlir._mlir.dialects import scf
+from .benchmark import get_func_from_module
+
+BATCHED_FUNC_SUFFIX = "_batched"
+# on the module: batched function name -> the indices of the args it copies back
+BATCH_OUTS_ATTR = "nelli.batch_outs"
+
+
+def batched_func_name(kernel_name: str) -> str:
+    return kernel_name + BATCHED_FUNC_SUFFIX
+
+
+def _contiguous_strides(shape):
+    strides = [1] * len(shape)
+    for i in reversed(range(len(shape) - 1)):
+        strides[i] = strides[i + 1] * shape[i + 1]
+    return strides
+
+
+def emit_batched_func(
+    kernel_func: func.FuncOp, outs: Optional[Sequence[int]] = None
+) -> func.FuncOp:
+    """Takes a function, with statically shaped memref arguments and no results,
+    and returns a new function that takes the same arguments stacked along a
+    new leading (dynamic) batch dimension. The new function calls the original
+    function once per batch element inside an `scf.for` loop; each element is
+    copied into a scratch buffer before the call and the arguments in `outs`
+    (indices; all of them by default) are copied back after the call.
+    """
+    arg_types = [ir.MemRefType(t) for t in kernel_func.type.inputs]
+    assert all(
+        t.has_static_shape for t in arg_types
+    ), f"batched kernel args must have static shapes: {arg_types}"
+    assert (
+        len(kernel_func.type.results) == 0
+    ), f"batched kernels must return results through out params"
+    if outs is None:
+        outs = range(len(arg_types))
+    outs = set(outs)
+
+    dynamic = ir.ShapedType.get_dynamic_size()
+    dynamic_offset = ir.ShapedType.get_dynamic_stride_or_offset()
+    batched_types = [
+        ir.MemRefType.get([dynamic] + list(t.shape), t.element_type) for t in arg_types
+    ]
+    row_types = [
+        ir.MemRefType.get(
+            t.shape,
+            t.element_type,
+            layout=ir.StridedLayoutAttr.get(
+                dynamic_offset, _contiguous_strides(t.shape)
+            ),
+        )
+        for t in arg_types
+    ]
+
+    batched_func = func.FuncOp(
+        batched_func_name(kernel_func.sym_name.value),
+        (batched_types, []),
+        visibility="public",
+    )
+    batched_func.attributes["llvm.emit_c_interface"] = ir.UnitAttr.get()
+
+    with ir.InsertionPoint(batched_func.add_entry_block()):
+        zero = arith.ConstantOp.create_index(0)
+        one = arith.ConstantOp.create_index(1)
+        n_iterations = memref.DimOp(batched_func.arguments[0], zero)
+        scratch = [memref.AllocaOp(t, [], []) for t in arg_types]
+        loop = scf.ForOp(zero, n_iterations, one)
+        with ir.InsertionPoint(loop.body):
+            rows = []
+            for arg, t, row_t in zip(batched_func.arguments, arg_types, row_types):
+                rows.append(
+                    memref.SubViewOp(
+                        row_t,
+                        arg,
+                        [loop.induction_variable],
+                        [],
+                        [],
+                        [dynamic_offset] + [0] * t.rank,
+                        [1] + list(t.shape),
+                        [1] * (t.rank + 1),
+                    )
+                )
+            for row, buf in zip(rows, scratch):
+                memref.CopyOp(row, buf)
+            func.CallOp(kernel_func, scratch)
+            for i, (row, buf) in enumerate(zip(rows, scratch)):
+                if i in outs:
+                    memref.CopyOp(buf, row)
+            scf.YieldOp([])
+        func.ReturnOp([])
+
+    return batched_func
+
+
+def add_batched_func(
+    module: ir.Module, kernel_name: str, outs: Optional[Sequence[int]] = None
+) -> func.FuncOp:
+    """Finds `kernel_name` in `module` and appends its batched wrapper (see
+    `emit_batched_func`) to `module`. The wrapper's `outs` are recorded on
+    `module` (see `get_batch_outs`)."""
+    kernel_func = get_func_from_module(module, kernel_name)
+    if outs is None:
+        outs = range(len(kernel_func.type.inputs))
+    outs = sorted(set(outs))
+    with ir.InsertionPoint(module.body), kernel_func.location:
+        batched_func = emit_batched_func(kernel_func, outs)
+        batch_outs = get_batch_outs(module)
+        batch_outs[batched_func.sym_name.value] = outs
+        i64 = ir.IntegerType.get_signless(64)
+        module.operation.attributes[BATCH_OUTS_ATTR] = ir.DictAttr.get(
+            {
+                name: ir.ArrayAttr.get([ir.IntegerAttr.get(i64, i) for i in idxs])
+                for name, idxs in batch_outs.items()
+            }
+        )
+    return batched_func
+
+
+def get_batch_outs(module) -> dict[str, list[int]]:
+    """The `outs` of the batched functions added (by `add_batched_func`) to the
+    (possibly lowered) `module`, by batched function name."""
+    if BATCH_OUTS_ATTR not in module.operation.attributes:
+        return {}
+    d = ir.DictAttr(module.operation.attributes[BATCH_OUTS_ATTR])
+    batch_outs = {}
+    for i in range(len(d)):
+        named_attr = d[i]
+        batch_outs[named_attr.name] = [
+            ir.IntegerAttr(a).value for a in ir.ArrayAttr(named_attr.attr)
+        ]
+    return batch_outs
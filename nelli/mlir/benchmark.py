@@ -1,11 +1,18 @@
 """Common utilities that are useful for all the benchmarks."""
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+
 import numpy as np
 
+from ..utils import shlib_ext
+from ..mlir._mlir import _mlir_libs
 from ..mlir._mlir import ir
 from ..mlir._mlir.dialects import arith
 from ..mlir._mlir.dialects import func
 from ..mlir._mlir.dialects import memref
 from ..mlir._mlir.dialects import scf
+from .workloads import random_sparse
 
 
 def setup_passes(mlir_module):
@@ -20,22 +27,16 @@ def setup_passes(mlir_module):
     return pipeline
 
 
-def create_sparse_np_tensor(dimensions, number_of_elements):
+def create_sparse_np_tensor(dimensions, number_of_elements, seed=None):
     """Constructs a numpy tensor of dimensions `dimensions` that has only a
     specific number of nonzero elements, specified by the `number_of_elements`
-    argument.
+    argument. See `nelli.mlir.workloads` for more patterns and formats.
     """
-    tensor = np.zeros(dimensions, np.float64)
-    tensor_indices_list = [
-        [np.random.randint(0, dimension) for dimension in dimensions]
-        for _ in range(number_of_elements)
-    ]
-    for tensor_indices in tensor_indices_list:
-        current_tensor = tensor
-        for tensor_index in tensor_indices[:-1]:
-            current_tensor = current_tensor[tensor_index]
-        current_tensor[tensor_indices[-1]] = np.random.uniform(1, 100)
-    return tensor
+    return random_sparse(
+        dimensions,
+        nnz=min(number_of_elements, math.prod(dimensions)),
+        seed=seed,
+    )
 
 
 def get_kernel_func_from_module(module: ir.Module) -> func.FuncOp:
@@ -55,6 +56,18 @@ def get_kernel_func_from_module(module: ir.Module) -> func.FuncOp:
     return module.operation.regions[0].blocks[0].operations[0]
 
 
+def get_func_from_module(module: ir.Module, func_name: str) -> func.FuncOp:
+    """Finds the function named `func_name` among the top-level operations of
+    `module`."""
+    funcs = [
+        op
+        for op in module.body.operations
+        if isinstance(op, func.FuncOp) and op.sym_name.value == func_name
+    ]
+    assert len(funcs) == 1, f"kernel func {func_name} not found"
+    return funcs[0]
+
+
 def emit_timer_func() -> func.FuncOp:
     """Returns the declaration of nanoTime function. If nanoTime function is
     used, the `MLIR_RUNNER_UTILS` and `MLIR_C_RUNNER_UTILS` must be included.
@@ -65,6 +78,19 @@ def emit_timer_func() -> func.FuncOp:
     return nanoTime
 
 
+def get_or_emit_timer_func(module: ir.Module) -> func.FuncOp:
+    """Returns the declaration of nanoTime in `module`, emitting it (at the
+    current insertion point) if there isn't one yet."""
+    timer_funcs = [
+        op
+        for op in module.body.operations
+        if isinstance(op, func.FuncOp) and op.sym_name.value == "nanoTime"
+    ]
+    if timer_funcs:
+        return timer_funcs[0]
+    return emit_timer_func()
+
+
 def emit_benchmark_wrapped_main_func(kernel_func, timer_func):
     """Takes a function and a timer function, both represented as FuncOp
     objects, and returns a new function. This new function wraps the call to
@@ -116,3 +142,174 @@ def wrap(module):
         )
 
     return main_module_with_benchmark
+
+
+TIMED_FUNC_SUFFIX = "_timed"
+
+
+def timed_func_name(kernel_name: str) -> str:
+    return kernel_name + TIMED_FUNC_SUFFIX
+
+
+def emit_timed_func(kernel_func, timer_func) -> func.FuncOp:
+    """Takes a function (with any signature) and a timer function and returns a
+    new function that takes the same arguments plus a (dynamically sized)
+    buffer of i64s. The new function calls the original function, between two
+    calls to the timer function, once per element of the buffer and stores each
+    time taken in the buffer. Results of the original function are dropped.
+    """
+    i64_type = ir.IntegerType.get_signless(64)
+    times_type = ir.MemRefType.get([ir.ShapedType.get_dynamic_size()], i64_type)
+    timed_func = func.FuncOp(
+        timed_func_name(kernel_func.sym_name.value),
+        (list(kernel_func.type.inputs) + [times_type], []),
+        visibility="public",
+    )
+    timed_func.attributes["llvm.emit_c_interface"] = ir.UnitAttr.get()
+
+    with ir.InsertionPoint(timed_func.add_entry_block()):
+        timer_buffer = timed_func.arguments[-1]
+        zero = arith.ConstantOp.create_index(0)
+        n_iterations = memref.DimOp(timer_buffer, zero)
+        one = arith.ConstantOp.create_index(1)
+        loop = scf.ForOp(zero, n_iterations, one)
+        with ir.InsertionPoint(loop.body):
+            start = func.CallOp(timer_func, [])
+            func.CallOp(kernel_func, list(timed_func.arguments[:-1]))
+            end = func.CallOp(timer_func, [])
+            time_taken = arith.SubIOp(end, start)
+            memref.StoreOp(time_taken, timer_buffer, [loop.induction_variable])
+            scf.YieldOp([])
+        func.ReturnOp([])
+
+    return timed_func
+
+
+def add_timed_func(module: ir.Module, kernel_name: str) -> func.FuncOp:
+    """Appends the timing wrapper (see `emit_timed_func`) for `kernel_name`,
+    and the declaration of the timer function if necessary, to `module`."""
+    kernel_func = get_func_from_module(module, kernel_name)
+    with ir.InsertionPoint(module.body), kernel_func.location:
+        return emit_timed_func(kernel_func, get_or_emit_timer_func(module))
+
+
+def runner_utils_shared_libs() -> list[str]:
+    """The runtime libs necessary for `nanoTime`."""
+    libs_dir = Path(_mlir_libs.__file__).parent
+    return [
+        str(libs_dir / f"libmlir_c_runner_utils.{shlib_ext()}"),
+        str(libs_dir / f"libmlir_runner_utils.{shlib_ext()}"),
+    ]
+
+
+@dataclass
+class BenchmarkResult:
+    """Per-repetition times (in ns) of a kernel, and statistics thereof."""
+
+    kernel_name: str
+    times_ns: np.ndarray
+    warmup: int = 0
+    metadata: dict = field(default_factory=dict)
+
+    @property
+    def repetitions(self) -> int:
+        return len(self.times_ns)
+
+    @property
+    def min(self) -> float:
+        return float(np.min(self.times_ns))
+
+    @property
+    def max(self) -> float:
+        return float(np.max(self.times_ns))
+
+    @property
+    def mean(self) -> float:
+        return float(np.mean(self.times_ns))
+
+    @property
+    def median(self) -> float:
+        return float(np.median(self.times_ns))
+
+    @property
+    def p90(self) -> float:
+        return float(np.percentile(self.times_ns, 90))
+
+    @property
+    def p99(self) -> float:
+        return float(np.percentile(self.times_ns, 99))
+
+    @property
+    def stddev(self) -> float:
+        return float(np.std(self.times_ns))
+
+    def as_dict(self) -> dict:
+        return {
+            "kernel_name": self.kernel_name,
+            "warmup": self.warmup,
+            "repetitions": self.repetitions,
+            "min_ns": self.min,
+            "median_ns": self.median,
+            "p90_ns": self.p90,
+            "p99_ns": self.p99,
+            "mean_ns": self.mean,
+            "stddev_ns": self.stddev,
+            "max_ns": self.max,
+            **self.metadata,
+        }
+
+    def __str__(self):
+        return (
+            f"{self.kernel_name}: median {self.median / 1e3:.3f}us "
+            f"(min {self.min / 1e3:.3f}us, p90 {self.p90 / 1e3:.3f}us, "
+            f"p99 {self.p99 / 1e3:.3f}us, stddev {self.stddev / 1e3:.3f}us, "
+            f"n={self.repetitions})"
+        )
+
+
+def run_benchmark(
+    invoker, kernel_name: str, *args, warmup=10, repetitions=100
+) -> BenchmarkResult:
+    """Runs the timing wrapper of `kernel_name` (which must have been added with
+    `add_timed_func` before compiling) `warmup + repetitions` times, in a single
+    native call, and discards the warmup times."""
+    times = np.zeros(warmup + repetitions, dtype=np.int64)
+    invoker.call_plan(timed_func_name(kernel_name))(*args, times)
+    return BenchmarkResult(kernel_name, times[warmup:].copy(), warmup=warmup)
+
+
+def benchmark(
+    module: ir.Module,
+    kernel_name: str,
+    args,
+    pipeline,
+    backend=None,
+    opt_level=3,
+    warmup=10,
+    repetitions=100,
+) -> BenchmarkResult:
+    """Benchmarks `kernel_name` in `module`: adds the timing wrapper, lowers
+    with `pipeline`, JITs and runs it on `args`. The result is recorded in the
+    performance database if `$NELLI_PERF_DB` is set (see `perf_db`)."""
+    from .perf_db import record_result
+    from .refbackend import LLVMJITBackend
+
+    if backend is None:
+        backend = LLVMJITBackend(shared_libs=runner_utils_shared_libs())
+    if not isinstance(pipeline, str):
+        pipeline_str = pipeline.materialize()
+    else:
+        pipeline_str = pipeline
+
+    add_timed_func(module, kernel_name)
+    module = backend.compile(
+        module, pipeline_str, kernel_name=timed_func_name(kernel_name)
+    )
+    invoker = backend.load(module, opt_level=opt_level)
+    result = run_benchmark(
+        invoker, kernel_name, *args, warmup=warmup, repetitions=repetitions
+    )
+    result.metadata.update(pipeline=pipeline_str, opt_level=opt_level)
+    # a no-op unless $NELLI_PERF_DB is set
+    record_result(result)
+    return result
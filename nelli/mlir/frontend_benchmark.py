@@ -0,0 +1,259 @@
+"""Benchmarks of the cost of the Python frontend itself: tracing synthetic
+`mlir_func`s (long straight-line bodies, deep loop and if nests) and `Module`s
+with many methods, split across AST rewriting, bytecode rewriting and IR
+building, e.g.,
+
+    python -m nelli.mlir.frontend_benchmark --statements 1000 --depth 8
+"""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from textwrap import indent
+
+import numpy as np
+
+from ._mlir import ir
+from .affine import affine_range
+from .func import MLIRFunc, get_endfor, rewrite_ast, rewrite_bytecode
+from .pass_stats import count_ops
+
+_PRELUDE = """\
+from nelli.mlir.affine import RankedAffineMemRefValue as AffineMemRef
+from nelli.mlir.module import Module
+from nelli.mlir.utils import F32
+"""
+
+_SIGNATURE = "x: F32, y: F32, A: AffineMemRef[({n}, {n}), F32]"
+
+
+def _straight_line(n_statements) -> list[str]:
+    # two ops (mulf, addf) per statement, each depending on the last
+    lines = ["v = x"]
+    for _ in range(n_statements):
+        lines.append("v = v * y + x")
+    return lines
+
+
+def straight_line_source(name, n_statements, n=8) -> str:
+    body = indent("\n".join(_straight_line(n_statements)), "    ")
+    return f"def {name}({_SIGNATURE.format(n=n)}):\n{body}\n"
+
+
+def loop_nest_source(name, depth, n_statements=1, n=8) -> str:
+    """`depth` nested `for i in range(n)`s around `n_statements` load-multiply-
+    store statements."""
+    lines = []
+    for d in range(depth):
+        lines.append(indent(f"for i{d} in range(0, {n}, 1):", "    " * d))
+    row, col = f"i{max(depth - 2, 0)}", f"i{depth - 1}"
+    for _ in range(n_statements):
+        lines.append(indent(f"A[{row}, {col}] = A[{row}, {col}] * y", "    " * depth))
+    body = indent("\n".join(lines), "    ")
+    return f"def {name}({_SIGNATURE.format(n=n)}):\n{body}\n"
+
+
+def if_nest_source(name, depth, n_statements=1, n=8) -> str:
+    """`depth` nested `if x < y` (with an else at every level)."""
+
+    def nest(d):
+        if d == depth:
+            return _straight_line(n_statements)
+        return [
+            "if x < y:",
+            *indent("\n".join(nest(d + 1)), "    ").splitlines(),
+            "else:",
+            *indent("\n".join(_straight_line(n_statements)), "    ").splitlines(),
+        ]
+
+    body = indent("\n".join(nest(0)), "    ")
+    return f"def {name}({_SIGNATURE.format(n=n)}):\n{body}\n"
+
+
+def module_class_source(name, n_methods, n_statements=10, n=8) -> str:
+    methods = [
+        straight_line_source(f"method{i}", n_statements, n).replace("(", "(self, ", 1)
+        for i in range(n_methods)
+    ]
+    return f"class {name}(Module):\n" + indent("\n".join(methods), "    ")
+
+
+def load_source(src: str, name: str, tmp_dir=None, prelude=_PRELUDE):
+    """Writes `src` (after the imports in `prelude`) to a file (`rewrite_ast`
+    needs `inspect.getsource`) and returns its `name` attribute."""
+    if tmp_dir is None:
+        tmp_dir = tempfile.mkdtemp()
+    path = Path(tmp_dir) / f"{name}.py"
+    path.write_text(prelude + "\n\n" + src)
+    spec = importlib.util.spec_from_file_location(f"nelli_synthetic_{name}", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return getattr(mod, name)
+
+
+@dataclass
+class FrontendBenchmarkResult:
+    name: str
+    # ops in the traced IR (excluding the containing module)
+    n_ops: int
+    # per-repetition wall times, in seconds
+    ast_rewrite_s: np.ndarray
+    bytecode_rewrite_s: np.ndarray
+    ir_build_s: np.ndarray
+    metadata: dict = field(default_factory=dict)
+
+    @property
+    def total_s(self) -> float:
+        return float(
+            np.median(self.ast_rewrite_s + self.bytecode_rewrite_s + self.ir_build_s)
+        )
+
+    @property
+    def ops_per_s(self) -> float:
+        """Ops constructed per second of (median) tracing, all phases included."""
+        return self.n_ops / self.total_s
+
+    @property
+    def ir_ops_per_s(self) -> float:
+        """Ops constructed per second of (median) IR building alone."""
+        return self.n_ops / float(np.median(self.ir_build_s))
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "n_ops": self.n_ops,
+            "repetitions": len(self.ir_build_s),
+            "ast_rewrite_s": float(np.median(self.ast_rewrite_s)),
+            "bytecode_rewrite_s": float(np.median(self.bytecode_rewrite_s)),
+            "ir_build_s": float(np.median(self.ir_build_s)),
+            "total_s": self.total_s,
+            "ops_per_s": self.ops_per_s,
+            "ir_ops_per_s": self.ir_ops_per_s,
+            **self.metadata,
+        }
+
+    def __str__(self):
+        d = self.as_dict()
+        total = d["total_s"] or 1.0
+        return (
+            f"{self.name}: {self.n_ops} ops in {total:.4f}s "
+            f"({self.ops_per_s:.0f} ops/s); "
+            f"ast {100 * d['ast_rewrite_s'] / total:.1f}%, "
+            f"bytecode {100 * d['bytecode_rewrite_s'] / total:.1f}%, "
+            f"ir {100 * d['ir_build_s'] / total:.1f}%"
+        )
+
+
+def _trace_once(fs, range_ctor):
+    """Runs the phases of `mlir_func` on every one of `fs`, separately timed,
+    into a fresh module."""
+    ast_s = bytecode_s = ir_s = 0.0
+    module = ir.Module.create()
+    with ir.InsertionPoint(module.body):
+        for f in fs:
+            start = time.perf_counter()
+            f = rewrite_ast(f, range_ctor=range_ctor, endfor=get_endfor(range_ctor))
+            ast_s += time.perf_counter() - start
+
+            start = time.perf_counter()
+            f = rewrite_bytecode(f)
+            bytecode_s += time.perf_counter() - start
+
+            start = time.perf_counter()
+            MLIRFunc(f)
+            ir_s += time.perf_counter() - start
+    return module, ast_s, bytecode_s, ir_s
+
+
+def benchmark_tracing(
+    name, fs, range_ctor=affine_range, repetitions=5
+) -> FrontendBenchmarkResult:
+    """Traces the (undecorated) functions `fs` `repetitions` times."""
+    times = []
+    for _ in range(repetitions):
+        module, *phase_times = _trace_once(fs, range_ctor)
+        times.append(phase_times)
+    n_ops = sum(count_ops(module).values()) - 1
+    ast_s, bytecode_s, ir_s = np.array(times).T
+    return FrontendBenchmarkResult(
+        name, n_ops, ast_s, bytecode_s, ir_s, {"range_ctor": range_ctor.__name__}
+    )
+
+
+def benchmark_module_class(
+    name, module_cls, range_ctor=affine_range, repetitions=5
+) -> FrontendBenchmarkResult:
+    """Like `benchmark_tracing` for all the methods of a `Module` subclass, as
+    `Module.__init__` would trace them."""
+    # an instance whose methods haven't been traced yet
+    instance = object.__new__(module_cls)
+    methods = [
+        getattr(instance, m)
+        for m in dir(module_cls)
+        if m.startswith("method") and callable(getattr(module_cls, m))
+    ]
+    return benchmark_tracing(name, methods, range_ctor, repetitions)
+
+
+def run_suite(
+    n_statements=1000, depth=8, n_methods=100, range_ctor=affine_range, repetitions=5
+) -> list[FrontendBenchmarkResult]:
+    tmp_dir = tempfile.mkdtemp()
+    cases = [
+        (
+            f"straight_line_{n_statements}",
+            straight_line_source("straight_line", n_statements),
+            "straight_line",
+        ),
+        (
+            f"loop_nest_{depth}",
+            loop_nest_source("loop_nest", depth, n_statements=10),
+            "loop_nest",
+        ),
+        (
+            f"if_nest_{depth}",
+            if_nest_source("if_nest", depth, n_statements=10),
+            "if_nest",
+        ),
+    ]
+    results = []
+    for case_name, src, f_name in cases:
+        f = load_source(src, f_name, tmp_dir)
+        results.append(benchmark_tracing(case_name, [f], range_ctor, repetitions))
+
+    module_cls = load_source(
+        module_class_source("ManyMethods", n_methods), "ManyMethods", tmp_dir
+    )
+    results.append(
+        benchmark_module_class(
+            f"module_{n_methods}_methods", module_cls, range_ctor, repetitions
+        )
+    )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--statements", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--methods", type=int, default=100)
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--output", help="JSON lines file to append results to")
+    args = parser.parse_args(argv)
+
+    for result in run_suite(
+        args.statements, args.depth, args.methods, repetitions=args.repetitions
+    ):
+        print(result)
+        if args.output is not None:
+            with open(args.output, "a") as f:
+                f.write(json.dumps(result.as_dict()) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ from ._mlir._mlir_libs._mlir.ir import (
 
 import inspect
 import ast
+import marshal
 from textwrap import dedent
 from types import FunctionType, CodeType
 
@@ -30,6 +31,7 @@ from .scf import (
     end_parfor as scf_end_parfor,
 )
 from .omp.omp import ws_loop as omp_range, end_for as omp_endfor
+from .parallel import prange, end_prange
 from .arith import ArithValue
 from ..mlir._mlir.dialects import func as func_dialect
 from ..mlir._mlir.ir import (
@@ -47,8 +49,11 @@ from ..mlir._mlir.dialects._ods_common import (
 from .memref import MemRefValue
 from .affine import RankedAffineMemRefValue
 from .tensor import TensorValue
+from .vector import wrap_value
 from .utils import doublewrap, extract_wrapped
 from .annot import Annot
+from . import tracing
+from .rewrite_cache import persistent_key, rewrite_cache
 
 
 def ast_call(name, args=None):
@@ -61,14 +66,168 @@ def ast_call(name, args=None):
     )
 
 
+def _bound_names(stmt) -> list[str]:
+    """Names bound by an assignment statement."""
+    if isinstance(stmt, ast.Assign):
+        targets = stmt.targets
+    elif isinstance(stmt, (ast.AugAssign, ast.AnnAssign)):
+        targets = [stmt.target]
+    else:
+        return []
+    return [
+        n.id
+        for t in targets
+        for n in ast.walk(t)
+        if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)
+    ]
+
+
+def _assigned_names(stmts) -> list[str]:
+    """Names (re)bound in `stmts`, including in nested for loops but not in ifs
+    (since `scf_if`s have no results) or `prange`s (which carry nothing)."""
+    names = []
+    for stmt in stmts:
+        if isinstance(stmt, ast.For) and _is_prange_call(stmt.iter):
+            continue
+        if isinstance(stmt, ast.For):
+            new_names = _assigned_names(stmt.body)
+        else:
+            new_names = _bound_names(stmt)
+        names.extend(n for n in new_names if n not in names)
+    return names
+
+
+def _is_range_call(node):
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id == "range"
+    )
+
+
+def _is_prange_call(node):
+    if not isinstance(node, ast.Call):
+        return False
+    func = node.func
+    return (isinstance(func, ast.Name) and func.id == prange.__name__) or (
+        isinstance(func, ast.Attribute) and func.attr == prange.__name__
+    )
+
+
 class InsertEndFors(ast.NodeTransformer):
-    def __init__(self, endfor):
+    """Appends an `endfor()` to every for loop.
+
+    If `iter_args`, variables that are bound before a `range` loop and
+    reassigned in its body become loop-carried values, i.e.,
+
+        for i in range(0, N):
+            acc = acc + A[i]
+
+    becomes
+
+        for i, acc in range(0, N, iter_args=[acc]):
+            acc = acc + A[i]
+            acc, = endfor(acc, names=("acc",))
+
+    such that after the loop `acc` is the result of the loop. Which of the
+    `iter_args` are actually carried is decided by the range constructor
+    while tracing: only MLIR values are; other (Python) values pass through.
+    Carried values must keep their type through the body (e.g., an `index`
+    can't be reassigned an `f32`).
+
+    `prange` loops get an `end_prange()` instead (and carry nothing). Loops
+    in a region (a `prange` or `with` body, e.g., `with parallel()`) only
+    carry names bound in the region, since their results can't escape it.
+    """
+
+    def __init__(self, endfor, iter_args=False):
         self.endfor = endfor
+        self.iter_args = iter_args
+        # names bound at the current point of the traversal
+        self.defined = set()
+
+    def _visit_block(self, stmts):
+        outer = self.defined
+        self.defined = set(outer)
+        for i, b in enumerate(stmts):
+            stmts[i] = self.visit(b)
+            self.defined.update(_bound_names(b))
+        self.defined = outer
+
+    def _visit_region(self, stmts, bound):
+        outer = self.defined
+        self.defined = set(bound)
+        self._visit_block(stmts)
+        self.defined = outer
+
+    def visit_FunctionDef(self, node):
+        outer = self.defined
+        args = node.args
+        self.defined = {
+            a.arg for a in args.posonlyargs + args.args + args.kwonlyargs
+        }
+        self._visit_block(node.body)
+        self.defined = outer
+        return node
+
+    def visit_If(self, node):
+        self._visit_block(node.body)
+        self._visit_block(node.orelse)
+        return node
+
+    def visit_With(self, node):
+        bound = {
+            n.id
+            for item in node.items
+            if item.optional_vars is not None
+            for n in ast.walk(item.optional_vars)
+            if isinstance(n, ast.Name)
+        }
+        self._visit_region(node.body, bound)
+        return node
 
     def visit_For(self, node):
-        for i, b in enumerate(node.body):
-            node.body[i] = self.visit(b)
-        node.body.append(ast.Expr(ast_call(self.endfor.__name__)))
+        carried = []
+        if self.iter_args and _is_range_call(node.iter):
+            carried = [n for n in _assigned_names(node.body) if n in self.defined]
+
+        targets = {n.id for n in ast.walk(node.target) if isinstance(n, ast.Name)}
+        if _is_prange_call(node.iter):
+            self._visit_region(node.body, targets)
+            node.body.append(ast.Expr(ast_call(end_prange.__name__)))
+            return node
+
+        outer = self.defined
+        self.defined = outer | targets
+        self._visit_block(node.body)
+        self.defined = outer
+
+        if not carried:
+            node.body.append(ast.Expr(ast_call(self.endfor.__name__)))
+            return node
+
+        load = lambda: [ast.Name(id=n, ctx=ast.Load()) for n in carried]
+        store = lambda: [ast.Name(id=n, ctx=ast.Store()) for n in carried]
+        node.target = ast.Tuple(elts=[node.target, *store()], ctx=ast.Store())
+        node.iter.keywords.append(
+            ast.keyword(arg="iter_args", value=ast.List(elts=load(), ctx=ast.Load()))
+        )
+        endfor_call = ast_call(self.endfor.__name__, args=load())
+        # for error messages
+        endfor_call.keywords.append(
+            ast.keyword(
+                arg="names",
+                value=ast.Tuple(
+                    elts=[ast.Constant(value=n) for n in carried], ctx=ast.Load()
+                ),
+            )
+        )
+        node.body.append(
+            ast.Assign(
+                targets=[ast.Tuple(elts=store(), ctx=ast.Store())],
+                value=endfor_call,
+            )
+        )
         return node
 
 
@@ -132,24 +291,46 @@ def bind(func, instance, as_name=None):
     return bound_method
 
 
-def rewrite_ast(f, range_ctor, endfor):
+def _qualified_name(obj):
+    return f"{obj.__module__}.{obj.__qualname__}"
+
+
+def _rewrite_ast_code(f, range_ctor, endfor):
     tree = ast.parse(dedent(inspect.getsource(f)))
     assert isinstance(
         tree.body[0], ast.FunctionDef
     ), f"unexpected ast node {tree.body[0]}"
-    tree = InsertEndFors(endfor=endfor).visit(tree)
+    tree = InsertEndFors(
+        endfor=endfor,
+        iter_args="iter_args" in inspect.signature(range_ctor).parameters,
+    ).visit(tree)
     tree = InsertEndIfs().visit(tree)
     tree.body[0].body.append(ast.Return(value=ast.Constant(value=None)))
 
     tree = ast.fix_missing_locations(tree)
     tree = ast.increment_lineno(tree, f.__code__.co_firstlineno - 1)
     module_code_o = compile(tree, f.__code__.co_filename, "exec")
-    f_code_o = next(
+    return next(
         c
         for c in module_code_o.co_consts
         if type(c) is CodeType and c.co_name == f.__name__
     )
 
+
+def rewrite_ast(f, range_ctor, endfor):
+    f_code_o = rewrite_cache.get_or_rewrite(
+        ("ast", f.__code__, f.__code__.co_filename, range_ctor, endfor),
+        lambda: persistent_key(
+            "ast",
+            inspect.getsource(f),
+            f.__code__.co_filename,
+            f.__code__.co_firstlineno,
+            _qualified_name(range_ctor),
+            _qualified_name(endfor),
+        ),
+        lambda: _rewrite_ast_code(f, range_ctor, endfor),
+    )
+
     # TODO(max): handle other ifs/for loops here
     updated_f = FunctionType(
         code=f_code_o,
@@ -161,6 +342,8 @@ def rewrite_ast(f, range_ctor, endfor):
             },
             endfor.__name__: endfor,
             "range": range_ctor,
+            prange.__name__: prange,
+            end_prange.__name__: end_prange,
             ArithValue.__name__: ArithValue,
             scf_else.__name__: scf_else,
             scf_if.__name__: scf_if,
@@ -179,7 +362,7 @@ def rewrite_ast(f, range_ctor, endfor):
     return updated_f
 
 
-def rewrite_bytecode(f):
+def _rewrite_bytecode_code(f):
     src_lines = inspect.getsource(f).splitlines()
     code = ConcreteBytecode.from_code(f.__code__)
     early_returns = []
@@ -215,7 +398,20 @@ def rewrite_bytecode(f):
         c = code[idx]
         code[idx] = ConcreteInstr("NOP", lineno=c.lineno, location=c.location)
 
-    f_code_o = code.to_code()
+    return code.to_code()
+
+
+def rewrite_bytecode(f):
+    f_code_o = rewrite_cache.get_or_rewrite(
+        ("bytecode", f.__code__, f.__code__.co_filename),
+        lambda: persistent_key(
+            "bytecode",
+            marshal.dumps(f.__code__),
+            inspect.getsource(f),
+            f.__code__.co_filename,
+        ),
+        lambda: _rewrite_bytecode_code(f),
+    )
     updated_f = FunctionType(
         code=f_code_o,
         globals={
@@ -280,7 +476,11 @@ class MLIRFunc:
         self.func_op_ctor = func_op_ctor
         self.func_op_terminator = func_op_terminator
         if build:
-            self._func_op = self._build_func_op()
+            self._func_op = self._traced_build_func_op()
+
+    def _traced_build_func_op(self):
+        with tracing.span("build_ir", "frontend", func=self.f.__name__):
+            return self._build_func_op()
 
     def _build_func_op(self):
         inputs = [(an.mlir_type if isinstance(an, Annot) else an) for an in self.annots]
@@ -309,7 +509,8 @@ class MLIRFunc:
                     else:
                         raise RuntimeError(f"unknown annotation: {annot.py_type}")
                 else:
-                    args[i] = ArithValue(arg)
+                    # scalars and vectors
+                    args[i] = wrap_value(arg)
 
             return_values = self.f(*args)
             if return_values is None:
@@ -336,7 +537,7 @@ class MLIRFunc:
     @property
     def func_op(self):
         if self._func_op is None:
-            self._func_op = self._build_func_op()
+            self._func_op = self._traced_build_func_op()
         return self._func_op
 
     def __call__(self, *args):
@@ -350,6 +551,19 @@ class MLIRFunc:
             return call_op.results
 
 
+def get_endfor(range_ctor):
+    if range_ctor == affine_range:
+        return affine_endfor
+    elif range_ctor == scf_range:
+        return scf_endfor
+    elif range_ctor == omp_range:
+        return omp_endfor
+    elif range_ctor == scf_par_range:
+        return scf_end_parfor
+    else:
+        raise RuntimeError(f"unsupported {range_ctor=}")
+
+
 @doublewrap
 def mlir_func(
     f,
@@ -369,20 +583,12 @@ def mlir_func(
         func_ctor = MLIRFunc
 
     if rewrite_ast_:
-        if range_ctor == affine_range:
-            endfor = affine_endfor
-        elif range_ctor == scf_range:
-            endfor = scf_endfor
-        elif range_ctor == omp_range:
-            endfor = omp_endfor
-        elif range_ctor == scf_par_range:
-            endfor = scf_end_parfor
-        else:
-            raise RuntimeError(f"unsupported {range_ctor=}")
-        f = rewrite_ast(f, range_ctor=range_ctor, endfor=endfor)
+        with tracing.span("rewrite_ast", "frontend", func=f.__name__):
+            f = rewrite_ast(f, range_ctor=range_ctor, endfor=get_endfor(range_ctor))
 
     if rewrite_bytecode_:
-        f = rewrite_bytecode(f)
+        with tracing.span("rewrite_bytecode", "frontend", func=f.__name__):
+            f = rewrite_bytecode(f)
 
     return func_ctor(f, **kwargs)
 
@@ -460,7 +666,7 @@ def declare(
                 else:
                     raise RuntimeError(f"unknown annotation: {annot.py_type}")
             else:
-                res_vals[i] = ArithValue(res_val)
+                res_vals[i] = wrap_value(res_val)
 
         if len(res_vals) == 1:
             res_vals = res_vals[0]
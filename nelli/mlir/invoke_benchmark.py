@@ -0,0 +1,241 @@
+"""Benchmarks of the cost of calling compiled kernels from Python: the per-call
+overhead of a `CallPlan` (on a trivial kernel), compared to the invocation path
+it replaced, and the throughput of an `LLVMJITBackendExecutor` as workers are
+added (on a compute bound kernel), e.g.,
+
+    python -m nelli.mlir.invoke_benchmark --calls 100000 --workers 1 2 4 8
+"""
+from __future__ import annotations
+
+import argparse
+import ctypes
+import json
+import time
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+
+from ._mlir import ir
+from ._mlir.runtime import get_ranked_memref_descriptor
+from .affine import RankedAffineMemRefValue as MemRef
+from .benchmark import runner_utils_shared_libs
+from .func import mlir_func
+from .passes import Pipeline
+from .refbackend import (
+    LLVMJITBackend,
+    LLVMJITBackendExecutor,
+    assert_arg_type_is_supported,
+)
+from .utils import F32, F64
+
+
+def _vadd_module(n) -> ir.Module:
+    module = ir.Module.create()
+    with ir.InsertionPoint(module.body):
+
+        @mlir_func
+        def vadd(A: MemRef[(n,), F32], B: MemRef[(n,), F32], C: MemRef[(n,), F32]):
+            for i in range(0, n):
+                C[i] = A[i] + B[i]
+
+    return module
+
+
+def _matmul_module(n) -> ir.Module:
+    module = ir.Module.create()
+    with ir.InsertionPoint(module.body):
+
+        @mlir_func
+        def matmul(
+            A: MemRef[(n, n), F64], B: MemRef[(n, n), F64], C: MemRef[(n, n), F64]
+        ):
+            for i in range(0, n):
+                for j in range(0, n):
+                    for k in range(0, n):
+                        C[i, k] += A[i, j] * B[j, k]
+
+    return module
+
+
+def _load(backend, module, kernel_name):
+    module = backend.compile(
+        module,
+        kernel_name=kernel_name,
+        pipeline=Pipeline().bufferize().lower_to_llvm(),
+    )
+    return backend.load(module, opt_level=3)
+
+
+def legacy_invoke(ee, function_name: str, *args):
+    """The invocation path `CallPlan` replaced (for the "before" figure): fresh
+    memref descriptors for every argument and `ExecutionEngine.invoke`, which
+    looks up the symbol and packs the arguments, on every call."""
+    ffi_args = []
+    for arg in args:
+        assert_arg_type_is_supported(arg.dtype)
+        ffi_args.append(
+            ctypes.pointer(ctypes.pointer(get_ranked_memref_descriptor(arg)))
+        )
+    ee.invoke(function_name, *ffi_args)
+
+
+@dataclass
+class CallOverheadResult:
+    n_calls: int
+    # through `legacy_invoke`, i.e., before the `CallPlan`
+    legacy_s: float
+    # through the `CallPlan` (patching descriptors, tracing check, ...)
+    call_plan_s: float
+    # calling the native function pointer with the packed args directly, i.e.,
+    # the floor for any Python calling convention
+    raw_s: float
+
+    @property
+    def legacy_calls_per_s(self) -> float:
+        return self.n_calls / self.legacy_s
+
+    @property
+    def calls_per_s(self) -> float:
+        return self.n_calls / self.call_plan_s
+
+    @property
+    def raw_calls_per_s(self) -> float:
+        return self.n_calls / self.raw_s
+
+    @property
+    def speedup(self) -> float:
+        """Of the `CallPlan` over the legacy path."""
+        return self.legacy_s / self.call_plan_s
+
+    @property
+    def overhead_ns(self) -> float:
+        """Per-call cost of the `CallPlan` over the raw ctypes call."""
+        return 1e9 * (self.call_plan_s - self.raw_s) / self.n_calls
+
+    def as_dict(self) -> dict:
+        return {
+            "n_calls": self.n_calls,
+            "legacy_calls_per_s": self.legacy_calls_per_s,
+            "calls_per_s": self.calls_per_s,
+            "raw_calls_per_s": self.raw_calls_per_s,
+            "speedup": self.speedup,
+            "overhead_ns": self.overhead_ns,
+        }
+
+    def __str__(self):
+        return (
+            f"{self.legacy_calls_per_s:.0f} calls/s before (legacy invoke), "
+            f"{self.calls_per_s:.0f} calls/s through the call plan "
+            f"({self.speedup:.1f}x), {self.raw_calls_per_s:.0f} calls/s raw "
+            f"({self.overhead_ns:.0f} ns/call overhead)"
+        )
+
+
+def benchmark_call_overhead(
+    n_calls=100_000, n=4, backend: LLVMJITBackend = None
+) -> CallOverheadResult:
+    if backend is None:
+        backend = LLVMJITBackend(shared_libs=runner_utils_shared_libs())
+    invoker = _load(backend, _vadd_module(n), "vadd")
+    A = np.random.randn(n).astype(np.float32)
+    B = np.random.randn(n).astype(np.float32)
+    C = np.zeros(n, dtype=np.float32)
+    plan = invoker.vadd
+    # resolves the symbol and freezes the signature
+    plan(A, B, C)
+    assert np.allclose(A + B, C), f"vadd is wrong"
+
+    C[...] = 0
+    legacy_invoke(invoker.ee, "vadd", A, B, C)
+    assert np.allclose(A + B, C), f"vadd is wrong"
+
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        legacy_invoke(invoker.ee, "vadd", A, B, C)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        plan(A, B, C)
+    call_plan_s = time.perf_counter() - start
+
+    func, packed_args = plan._func, plan._packed_args
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        func(packed_args)
+    raw_s = time.perf_counter() - start
+    return CallOverheadResult(n_calls, legacy_s, call_plan_s, raw_s)
+
+
+@dataclass
+class ExecutorScalingResult:
+    n: int
+    n_tasks: int
+    # max_workers -> wall time (in seconds) of `n_tasks` matmuls
+    wall_time_s: dict[int, float]
+
+    def kernels_per_s(self, max_workers) -> float:
+        return self.n_tasks / self.wall_time_s[max_workers]
+
+    def as_dict(self) -> dict:
+        return {
+            "n": self.n,
+            "n_tasks": self.n_tasks,
+            "kernels_per_s": {w: self.kernels_per_s(w) for w in self.wall_time_s},
+        }
+
+    def __str__(self):
+        return "\n".join(
+            f"max_workers={w} kernels/s: {self.kernels_per_s(w):.1f}"
+            for w in self.wall_time_s
+        )
+
+
+def benchmark_executor_scaling(
+    max_workers: Sequence[int] = (1, 2, 4, 8),
+    n=128,
+    n_tasks=64,
+    backend: LLVMJITBackend = None,
+) -> ExecutorScalingResult:
+    if backend is None:
+        backend = LLVMJITBackend(shared_libs=runner_utils_shared_libs())
+    invoker = _load(backend, _matmul_module(n), "matmul")
+    batch = [
+        (np.random.randn(n, n), np.random.randn(n, n), np.zeros((n, n)))
+        for _ in range(n_tasks)
+    ]
+    wall_time_s = {}
+    for workers in max_workers:
+        with LLVMJITBackendExecutor(invoker, max_workers=workers) as executor:
+            start = time.perf_counter()
+            for _ in executor.map("matmul", batch):
+                pass
+            wall_time_s[workers] = time.perf_counter() - start
+    return ExecutorScalingResult(n, n_tasks, wall_time_s)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--size", type=int, default=128)
+    parser.add_argument("--tasks", type=int, default=64)
+    parser.add_argument("--output", help="JSON lines file to append results to")
+    args = parser.parse_args(argv)
+
+    results = {
+        "call_overhead": benchmark_call_overhead(args.calls),
+        "executor_scaling": benchmark_executor_scaling(
+            args.workers, args.size, args.tasks
+        ),
+    }
+    for name, result in results.items():
+        print(f"{name}:\n{result}")
+        if args.output is not None:
+            with open(args.output, "a") as f:
+                f.write(json.dumps({"name": name, **result.as_dict()}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
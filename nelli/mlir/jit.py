@@ -0,0 +1,264 @@
+"""A numba-style `@jit` decorator: functions are traced, lowered and JITed on
+their first call with each new signature (the dtype, shape and strides of every
+array argument and the type of every scalar argument) and later calls with the
+same signature dispatch straight to the compiled entry point, e.g.,
+
+    @jit
+    def saxpy(a, x, y):
+        # shapes are static, i.e., known while tracing
+        for i in range(0, MemRefType(x.type).shape[0]):
+            y[i] = a * x[i] + y[i]
+
+    saxpy(np.float32(2.0), x, y)
+
+Arguments needn't be annotated; annotations are inferred from the arguments
+(arrays become `memref`s with static shapes and, if they aren't C contiguous,
+strided layouts).
+"""
+from __future__ import annotations
+
+import ctypes
+import inspect
+import threading
+from dataclasses import dataclass, field
+from types import FunctionType
+from typing import Optional, Union
+
+import numpy as np
+
+from ._mlir import ir
+from .affine import RankedAffineMemRefValue
+from .annot import Annot
+from .batch import _contiguous_strides
+from .func import mlir_func
+from .passes import Pipeline
+from .refbackend import LLVMJITBackend, LLVMJITBackendInvoker
+from .utils import doublewrap
+from . import tracing
+
+_DTYPE_TO_MLIR_TYPE = {
+    np.dtype(np.float16): ir.F16Type.get(),
+    np.dtype(np.float32): ir.F32Type.get(),
+    np.dtype(np.float64): ir.F64Type.get(),
+    np.dtype(np.bool_): ir.IntegerType.get_signless(1),
+    np.dtype(np.int8): ir.IntegerType.get_signless(8),
+    np.dtype(np.uint8): ir.IntegerType.get_signless(8),
+    np.dtype(np.int32): ir.IntegerType.get_signless(32),
+    np.dtype(np.int64): ir.IntegerType.get_signless(64),
+}
+
+_DTYPE_TO_CTYPE = {
+    np.dtype(np.float16): None,
+    np.dtype(np.float32): ctypes.c_float,
+    np.dtype(np.float64): ctypes.c_double,
+    np.dtype(np.bool_): ctypes.c_bool,
+    np.dtype(np.int8): ctypes.c_int8,
+    np.dtype(np.uint8): ctypes.c_uint8,
+    np.dtype(np.int32): ctypes.c_int32,
+    np.dtype(np.int64): ctypes.c_int64,
+}
+
+# Python scalars are passed as their widest numpy counterparts
+_PY_SCALAR_DTYPES = {
+    bool: np.dtype(np.bool_),
+    int: np.dtype(np.int64),
+    float: np.dtype(np.float64),
+}
+
+
+def _scalar_dtype(arg) -> Optional[np.dtype]:
+    if isinstance(arg, np.generic):
+        return arg.dtype
+    return _PY_SCALAR_DTYPES.get(type(arg))
+
+
+def arg_signature(arg):
+    """The part of a call's signature contributed by `arg`: `(dtype, shape,
+    strides)` for arrays and the dtype for scalars."""
+    if isinstance(arg, np.ndarray):
+        return arg.dtype, arg.shape, arg.strides
+    dtype = _scalar_dtype(arg)
+    assert dtype is not None, f"unsupported jit argument type: {type(arg)}"
+    return dtype
+
+
+def _mlir_type(dtype) -> ir.Type:
+    assert (
+        dtype in _DTYPE_TO_MLIR_TYPE
+    ), f"unsupported dtype {dtype}; supported are {list(_DTYPE_TO_MLIR_TYPE)}"
+    return _DTYPE_TO_MLIR_TYPE[dtype]
+
+
+def infer_annotation(signature, memref_cls=RankedAffineMemRefValue):
+    """The `mlir_func` annotation of an argument with `signature` (see
+    `arg_signature`)."""
+    if not isinstance(signature, tuple):
+        return _mlir_type(signature)
+
+    dtype, shape, byte_strides = signature
+    el_type = _mlir_type(dtype)
+    assert all(
+        s >= 0 and s % dtype.itemsize == 0 for s in byte_strides
+    ), f"unsupported strides {byte_strides} (negative or not a multiple of {dtype.itemsize})"
+    strides = [s // dtype.itemsize for s in byte_strides]
+    # strides of unit dims are irrelevant (and numpy doesn't normalize them)
+    if all(
+        s == c or d == 1 for s, c, d in zip(strides, _contiguous_strides(shape), shape)
+    ):
+        return Annot(memref_cls, ir.MemRefType.get(list(shape), el_type))
+    return Annot(
+        memref_cls,
+        ir.MemRefType.get(
+            list(shape), el_type, layout=ir.StridedLayoutAttr.get(0, strides)
+        ),
+    )
+
+
+def _scalar_holder(signature):
+    """A ctypes value (and a pointer to it, as the packed calling convention
+    takes a pointer to every argument) to pass scalars with `signature`
+    through, or `None` for arrays."""
+    if isinstance(signature, tuple):
+        return None
+    ctype = _DTYPE_TO_CTYPE[signature]
+    assert ctype is not None, f"{signature} scalars can't be passed to jitted functions"
+    value = ctype()
+    return value, ctypes.pointer(value)
+
+
+@dataclass
+class Specialization:
+    signature: tuple
+    # the lowered module
+    module: ir.Module
+    invoker: LLVMJITBackendInvoker
+    # per thread: the `_scalar_holder`s of the arguments
+    _local: threading.local = field(
+        default_factory=threading.local, repr=False, compare=False
+    )
+
+    def marshal(self, args) -> list:
+        """Arrays are passed as is; scalars are written into this thread's
+        holders, such that the `CallPlan` is handed the same pointers every
+        call and keeps their slots (rather than rebuilding them)."""
+        holders = getattr(self._local, "holders", None)
+        if holders is None:
+            holders = self._local.holders = [
+                _scalar_holder(sig) for sig in self.signature
+            ]
+        marshalled = []
+        for arg, holder in zip(args, holders):
+            if holder is None:
+                marshalled.append(arg)
+            else:
+                value, pointer = holder
+                value.value = arg
+                marshalled.append(pointer)
+        return marshalled
+
+
+class JITFunction:
+    """The result of `@jit`: a callable that keeps one `Specialization` per
+    signature it was called with.
+
+    Calls on a hot signature cost computing the signature, a dict lookup and a
+    `CallPlan` call (which only patches the data pointers of the arguments).
+    Specializing is serialized by a lock; dispatching isn't.
+    """
+
+    def __init__(
+        self,
+        f,
+        pipeline: Optional[Union[Pipeline, str]] = None,
+        backend: Optional[LLVMJITBackend] = None,
+        opt_level=2,
+        memref_cls=RankedAffineMemRefValue,
+        range_ctor=None,
+    ):
+        if pipeline is None:
+            pipeline = Pipeline().bufferize().lower_to_llvm()
+        if backend is None:
+            backend = LLVMJITBackend()
+        self.f = f
+        self.pipeline = pipeline
+        self.backend = backend
+        self.opt_level = opt_level
+        self.memref_cls = memref_cls
+        self.range_ctor = range_ctor
+        self.params = list(inspect.signature(f).parameters)
+        self.specializations: dict[tuple, Specialization] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def __name__(self):
+        return self.f.__name__
+
+    def _annotated(self, signature) -> FunctionType:
+        """A copy of `f` annotated for `signature` (the code object is shared,
+        so the rewrite cache applies)."""
+        f = FunctionType(
+            self.f.__code__,
+            self.f.__globals__,
+            self.f.__name__,
+            self.f.__defaults__,
+            self.f.__closure__,
+        )
+        f.__qualname__ = self.f.__qualname__
+        f.__annotations__ = {
+            param: infer_annotation(sig, self.memref_cls)
+            for param, sig in zip(self.params, signature)
+        }
+        return f
+
+    def specialize(self, *args) -> Specialization:
+        """Traces, lowers and JITs `f` for the signature of `args` (if it hasn't
+        been already)."""
+        signature = tuple(arg_signature(arg) for arg in args)
+        with self._lock:
+            spec = self.specializations.get(signature)
+            if spec is not None:
+                return spec
+            assert len(args) == len(
+                self.params
+            ), f"{self.f.__name__} takes {len(self.params)} args but got {len(args)}"
+
+            with tracing.span("specialize", "jit", func=self.f.__name__):
+                module = ir.Module.create()
+                with ir.InsertionPoint(module.body):
+                    mlir_func(range_ctor=self.range_ctor)(self._annotated(signature))
+                module = self.backend.compile(
+                    module, self.pipeline, kernel_name=self.f.__name__
+                )
+                invoker = self.backend.load(module, opt_level=self.opt_level)
+            spec = Specialization(signature, module, invoker)
+            self.specializations[signature] = spec
+            return spec
+
+    def __call__(self, *args, outs=None):
+        signature = tuple(arg_signature(arg) for arg in args)
+        spec = self.specializations.get(signature)
+        if spec is None:
+            spec = self.specialize(*args)
+        return spec.invoker.call_plan(self.f.__name__)(*spec.marshal(args), outs=outs)
+
+
+@doublewrap
+def jit(
+    f,
+    pipeline: Optional[Union[Pipeline, str]] = None,
+    backend: Optional[LLVMJITBackend] = None,
+    opt_level=2,
+    memref_cls=RankedAffineMemRefValue,
+    range_ctor=None,
+) -> JITFunction:
+    """Decorates `f` (as `@jit` or `@jit(pipeline=..., ...)`) into a
+    `JITFunction`.
+
+    `pipeline` lowers every specialization (by default,
+    `Pipeline().bufferize().lower_to_llvm()`); `backend` compiles and loads them
+    (pass one with a `cache_dir` to persist native code across processes).
+    Arrays are traced as `memref_cls` values and loops with `range_ctor` (see
+    `mlir_func`). Results are returned through out params (`outs=`, with
+    `Pipeline.bufferize(results_to_out_params=True)`).
+    """
+    return JITFunction(f, pipeline, backend, opt_level, memref_cls, range_ctor)
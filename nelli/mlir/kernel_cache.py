@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+from ..utils import nelli_version, shlib_ext
+from ._mlir import _mlir_libs
+from ._mlir.ir import Module
+
+logger = logging.getLogger(__name__)
+
+# discardable attribute stamped onto lowered modules so that `load` can find
+# the cache entry without re-fingerprinting the (possibly huge) lowered IR
+CACHE_KEY_ATTR = "nelli.cache_key"
+
+LOWERED_IR_FILENAME = "lowered.mlir"
+OBJECT_FILENAME = "kernel.o"
+# why linking the object file into a shared library failed (see `put_native`)
+LINK_ERROR_FILENAME = "link_error.txt"
+
+
+def default_cache_dir() -> Path:
+    return Path(
+        os.environ.get("NELLI_CACHE_DIR", Path.home() / ".cache" / "nelli" / "kernels")
+    )
+
+
+def fingerprint(*parts) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(str(p).encode())
+        # separator so that ("ab", "c") and ("a", "bc") hash differently
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def toolchain_version() -> str:
+    """Identifies the nelli release and the MLIR/LLVM build (by the name, size
+    and mtime of its native libs) that lower and compile kernels; part of every
+    cache key, such that upgrades don't serve stale code."""
+    libs_dir = Path(_mlir_libs.__file__).parent
+    libs = sorted(
+        (p.name, p.stat().st_size, p.stat().st_mtime_ns)
+        for p in libs_dir.iterdir()
+        if p.suffix in {".so", ".dylib"}
+    )
+    return fingerprint(nelli_version(), *libs)
+
+
+def module_fingerprint(module) -> str:
+    return fingerprint(module.operation.get_asm(enable_debug_info=False))
+
+
+def link_shared_library(
+    object_path: Union[str, Path],
+    lib_path: Union[str, Path],
+    shared_libs: Optional[Sequence[str]] = None,
+):
+    """Links an object file (as dumped by `ExecutionEngine.dump_to_object_file`)
+    into a shared library using the host C compiler driver (`$CC`, default `cc`).
+    """
+    if shared_libs is None:
+        shared_libs = []
+    cmd = [os.environ.get("CC", "cc"), "-shared", "-o", str(lib_path), str(object_path)]
+    if platform.system() == "Darwin":
+        # runtime symbols (e.g. refbackend callbacks) are resolved at load time
+        cmd += ["-undefined", "dynamic_lookup"]
+    for lib in shared_libs:
+        cmd += [str(lib), f"-Wl,-rpath,{Path(lib).parent}"]
+    logger.debug(f"linking {' '.join(cmd)}")
+    subprocess.run(cmd, check=True, capture_output=True)
+
+
+def _atomic_write(dst: Path, write):
+    # write into a temp file in the same directory and rename so that
+    # concurrent processes never observe a partially written entry
+    fd, tmp = tempfile.mkstemp(dir=dst.parent, prefix=f".{dst.name}.")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+class KernelCache:
+    """Content-addressed on-disk cache for `LLVMJITBackend`.
+
+    There are two kinds of entries:
+
+    * lowered IR, keyed by the fingerprint of the input module, the pipeline
+      string and the shared libs (see `LLVMJITBackend.compile`);
+    * native code, keyed by the lowered IR key, the opt level, the target
+      (CPU and features, the host's if none is pinned) and the shared libs (see
+      `LLVMJITBackend.native_cache_key`), stored as the object file dumped by
+      the `ExecutionEngine` and a shared library linked from it.
+
+    Both keys include the `toolchain_version`.
+    """
+
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None):
+        if cache_dir is None:
+            cache_dir = default_cache_dir()
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def _ensure_entry_dir(self, key: str) -> Path:
+        entry = self.entry_dir(key)
+        entry.mkdir(parents=True, exist_ok=True)
+        return entry
+
+    def get_lowered(self, key: str, context=None) -> Optional[Module]:
+        path = self.entry_dir(key) / LOWERED_IR_FILENAME
+        if not path.exists():
+            return None
+        logger.debug(f"kernel cache hit (lowered IR) {key}")
+        return Module.parse(path.read_text(), context=context)
+
+    def put_lowered(self, key: str, module):
+        entry = self._ensure_entry_dir(key)
+
+        def write(tmp):
+            with open(tmp, "w") as f:
+                f.write(module.operation.get_asm(enable_debug_info=True))
+
+        _atomic_write(entry / LOWERED_IR_FILENAME, write)
+
+    def shared_library_path(self, key: str) -> Path:
+        return self.entry_dir(key) / f"kernel.{shlib_ext()}"
+
+    def get_shared_library(self, key: str) -> Optional[Path]:
+        path = self.shared_library_path(key)
+        if not path.exists():
+            return None
+        logger.debug(f"kernel cache hit (native code) {key}")
+        return path
+
+    def put_native(
+        self, key: str, ee, shared_libs: Optional[Sequence[str]] = None
+    ) -> Optional[Path]:
+        """Dumps the object code held by `ee` and links it into a shared library.
+
+        The `ExecutionEngine` must already have materialized the module (i.e.,
+        some symbol must have been looked up). Returns the path of the shared
+        library or `None` if linking isn't possible on this host, in which case
+        only the object file is kept and the reason is recorded (see
+        `link_error`); clear the cache to retry.
+        """
+        entry = self._ensure_entry_dir(key)
+        _atomic_write(entry / OBJECT_FILENAME, ee.dump_to_object_file)
+        try:
+            _atomic_write(
+                self.shared_library_path(key),
+                lambda tmp: link_shared_library(
+                    entry / OBJECT_FILENAME, tmp, shared_libs
+                ),
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            stderr = getattr(e, "stderr", b"") or b""
+            reason = f"{e} {stderr.decode(errors='replace')}".strip()
+            (entry / LINK_ERROR_FILENAME).write_text(reason)
+            logger.warning(f"couldn't link cached kernel {key}: {reason}")
+            return None
+        return self.shared_library_path(key)
+
+    def link_error(self, key: str) -> Optional[str]:
+        """Why the native code for `key` couldn't be linked, if it couldn't."""
+        path = self.entry_dir(key) / LINK_ERROR_FILENAME
+        if not path.exists():
+            return None
+        return path.read_text()
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+
+class EngineCache:
+    """In-process LRU cache of loaded engines (`ExecutionEngine`s or
+    `SharedLibraryEngine`s), keyed by module fingerprint and opt level (see
+    `LLVMJITBackend.native_cache_key`).
+
+    Entries are evicted, least recently used first, once there are more than
+    `max_entries` of them or their native code size (see
+    `refbackend.estimate_engine_size`) exceeds `max_bytes`. Sizes are only
+    measured while `max_bytes` is set. Evicted engines are released as soon as
+    no invoker references them anymore.
+    """
+
+    def __init__(
+        self, max_entries: Optional[int] = 64, max_bytes: Optional[int] = None
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[object, int]] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: str):
+        return key in self._entries
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, ee, size_bytes: int = 0):
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (ee, size_bytes)
+            self._total_bytes += size_bytes
+            self._evict()
+
+    def _evict(self):
+        # never evict the entry that was just inserted
+        while len(self._entries) > 1 and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        ):
+            key, (_ee, size_bytes) = self._entries.popitem(last=False)
+            self._total_bytes -= size_bytes
+            logger.debug(f"evicted engine {key} ({size_bytes} bytes)")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
@@ -0,0 +1,268 @@
+"""Runtime per-loop profiling.
+
+`instrument_loops` rewrites a module (before lowering) such that every
+selected loop accumulates, in a module-level counters buffer, its inclusive
+time (`nanoTime` before and after the loop), the number of times it was
+entered and its total number of iterations. The counters are read back (and
+reset) through a generated function; see
+`LLVMJITBackendInvoker.read_loop_profile`.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from ._mlir import ir
+from ._mlir.dialects import arith
+from ._mlir.dialects import func
+from ._mlir.dialects import memref
+from ._mlir.dialects import scf
+from .benchmark import get_or_emit_timer_func
+
+LOOP_PROFILE_ATTR = "nelli.loop_profile"
+COUNTERS_GLOBAL_NAME = "nelli_loop_profile_counters"
+READ_FUNC_NAME = "nelli_loop_profile_read"
+PROFILED_LOOP_OPS = ("affine.for", "scf.for", "scf.parallel")
+
+# columns of the counters buffer
+TIME_NS, ENTRIES, TRIPS = range(3)
+N_COUNTERS = 3
+
+
+@dataclass
+class LoopInfo:
+    loop_id: int
+    kind: str
+    func_name: str
+    depth: int
+    location: str
+
+    @property
+    def source(self) -> str:
+        """`file:line` of the loop in the Python frontend, if known."""
+        m = re.match(r'loc\("(.*)":(\d+):\d+\)', self.location)
+        if m is None:
+            return f"{self.func_name}#{self.loop_id}"
+        filename, line = m.groups()
+        return f"{filename.rsplit('/', 1)[-1]}:{line}"
+
+
+@dataclass
+class LoopStats:
+    loop: LoopInfo
+    time_ns: int
+    entries: int
+    trips: int
+
+    @property
+    def avg_trips(self) -> float:
+        return self.trips / self.entries if self.entries else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "loop_id": self.loop.loop_id,
+            "kind": self.loop.kind,
+            "func": self.loop.func_name,
+            "depth": self.loop.depth,
+            "source": self.loop.source,
+            "time_ns": self.time_ns,
+            "entries": self.entries,
+            "trips": self.trips,
+        }
+
+
+@dataclass
+class LoopProfileReport:
+    loops: list[LoopStats]
+
+    def hottest(self, n=10) -> list[LoopStats]:
+        return sorted(self.loops, key=lambda l: l.time_ns, reverse=True)[:n]
+
+    def as_dict(self) -> list[dict]:
+        return [l.as_dict() for l in self.loops]
+
+    def __str__(self):
+        lines = [
+            f"{'inclusive time (s)':>18} {'entries':>10} {'trips':>12} {'trips/entry':>12}  loop"
+        ]
+        for l in self.hottest(len(self.loops)):
+            indent = "  " * l.loop.depth
+            lines.append(
+                f"{l.time_ns / 1e9:>18.6f} {l.entries:>10} {l.trips:>12} "
+                f"{l.avg_trips:>12.1f}  {indent}{l.loop.kind} {l.loop.source} ({l.loop.func_name})"
+            )
+        return "\n".join(lines)
+
+
+class LoopProfile:
+    """The loops instrumented by `instrument_loops`, in counter order."""
+
+    def __init__(self, loops: Sequence[LoopInfo]):
+        self.loops = list(loops)
+
+    @classmethod
+    def from_module(cls, module) -> Optional[LoopProfile]:
+        """Recovers the loops from the (possibly lowered) module, or `None` if
+        the module wasn't instrumented."""
+        if LOOP_PROFILE_ATTR not in module.operation.attributes:
+            return None
+        loops = []
+        for i, attr in enumerate(
+            ir.ArrayAttr(module.operation.attributes[LOOP_PROFILE_ATTR])
+        ):
+            d = ir.DictAttr(attr)
+            loops.append(
+                LoopInfo(
+                    i,
+                    ir.StringAttr(d["kind"]).value,
+                    ir.StringAttr(d["func"]).value,
+                    ir.IntegerAttr(d["depth"]).value,
+                    ir.StringAttr(d["location"]).value,
+                )
+            )
+        return cls(loops)
+
+    def read(self, invoker) -> LoopProfileReport:
+        """Reads the counters back through `invoker` and resets them."""
+        counters = np.zeros((len(self.loops), N_COUNTERS), dtype=np.int64)
+        invoker.call_plan(READ_FUNC_NAME)(counters)
+        return LoopProfileReport(
+            [
+                LoopStats(
+                    loop,
+                    int(counters[loop.loop_id, TIME_NS]),
+                    int(counters[loop.loop_id, ENTRIES]),
+                    int(counters[loop.loop_id, TRIPS]),
+                )
+                for loop in self.loops
+            ]
+        )
+
+
+def _collect_loops(op, loop_ops, depth, loops):
+    for region in op.regions:
+        for block in region.blocks:
+            ops = list(block.operations)
+            for i, child in enumerate(ops):
+                child_depth = depth
+                if child.operation.name in loop_ops:
+                    # loops are never the last op in a block (the terminator is)
+                    loops.append((child, ops[i + 1], depth))
+                    child_depth += 1
+                _collect_loops(child, loop_ops, child_depth, loops)
+
+
+def _increment(counters, loop_id, column, value):
+    row = arith.ConstantOp.create_index(loop_id)
+    col = arith.ConstantOp.create_index(column)
+    prev = memref.LoadOp(counters, [row, col])
+    memref.StoreOp(arith.AddIOp(prev, value), counters, [row, col])
+
+
+def _emit_read_func(counters_type):
+    """Copies the counters into the (caller allocated) buffer and zeroes them."""
+    read_func = func.FuncOp(READ_FUNC_NAME, ([counters_type], []), visibility="public")
+    read_func.attributes["llvm.emit_c_interface"] = ir.UnitAttr.get()
+    with ir.InsertionPoint(read_func.add_entry_block()):
+        counters = memref.GetGlobalOp(counters_type, COUNTERS_GLOBAL_NAME)
+        zero = arith.ConstantOp.create_index(0)
+        one = arith.ConstantOp.create_index(1)
+        zero_i64 = arith.ConstantOp(ir.IntegerType.get_signless(64), 0)
+        n_loops, n_counters = counters_type.shape
+        rows = scf.ForOp(zero, arith.ConstantOp.create_index(n_loops), one)
+        with ir.InsertionPoint(rows.body):
+            cols = scf.ForOp(zero, arith.ConstantOp.create_index(n_counters), one)
+            with ir.InsertionPoint(cols.body):
+                idx = [rows.induction_variable, cols.induction_variable]
+                value = memref.LoadOp(counters, idx)
+                memref.StoreOp(value, read_func.arguments[0], idx)
+                memref.StoreOp(zero_i64, counters, idx)
+                scf.YieldOp([])
+            scf.YieldOp([])
+        func.ReturnOp([])
+    return read_func
+
+
+def instrument_loops(
+    module: ir.Module,
+    loop_ops: Sequence[str] = PROFILED_LOOP_OPS,
+    pred: Optional[Callable[[ir.OpView], bool]] = None,
+) -> LoopProfile:
+    """Instruments every loop (of the kinds in `loop_ops` and, optionally,
+    satisfying `pred`) in every function in `module` with a timer and counters.
+
+    Times are inclusive (of nested loops and of the instrumentation of those
+    nested loops). Counters are plain loads and stores, i.e., they aren't
+    accurate if iterations of an `scf.parallel` actually run concurrently.
+    The loops are recorded in the `nelli.loop_profile` module attribute, such
+    that they can be recovered (`LoopProfile.from_module`) after lowering.
+    """
+    assert (
+        LOOP_PROFILE_ATTR not in module.operation.attributes
+    ), f"module is already instrumented"
+
+    loops = []
+    kernel_funcs = [
+        op
+        for op in module.body.operations
+        if isinstance(op, func.FuncOp) and len(op.regions[0].blocks) > 0
+    ]
+    for kernel_func in kernel_funcs:
+        func_loops = []
+        _collect_loops(kernel_func, set(loop_ops), 0, func_loops)
+        for loop, next_op, depth in func_loops:
+            if pred is None or pred(loop):
+                loops.append((kernel_func.sym_name.value, loop, next_op, depth))
+
+    i64_type = ir.IntegerType.get_signless(64)
+    counters_type = ir.MemRefType.get([max(len(loops), 1), N_COUNTERS], i64_type)
+    with module.context, ir.Location.unknown():
+        with ir.InsertionPoint(module.body):
+            timer_func = get_or_emit_timer_func(module)
+            memref.GlobalOp(
+                COUNTERS_GLOBAL_NAME,
+                ir.TypeAttr.get(counters_type),
+                sym_visibility="private",
+                initial_value=ir.DenseElementsAttr.get_splat(
+                    ir.RankedTensorType.get(counters_type.shape, i64_type),
+                    ir.IntegerAttr.get(i64_type, 0),
+                ),
+            )
+            _emit_read_func(counters_type)
+
+        loop_infos = []
+        for loop_id, (func_name, loop, next_op, depth) in enumerate(loops):
+            with ir.InsertionPoint(loop):
+                start = func.CallOp(timer_func, [])
+            with ir.InsertionPoint.at_block_begin(loop.regions[0].blocks[0]):
+                counters = memref.GetGlobalOp(counters_type, COUNTERS_GLOBAL_NAME)
+                _increment(counters, loop_id, TRIPS, arith.ConstantOp(i64_type, 1))
+            with ir.InsertionPoint(next_op):
+                end = func.CallOp(timer_func, [])
+                counters = memref.GetGlobalOp(counters_type, COUNTERS_GLOBAL_NAME)
+                _increment(counters, loop_id, TIME_NS, arith.SubIOp(end, start))
+                _increment(counters, loop_id, ENTRIES, arith.ConstantOp(i64_type, 1))
+            loop_infos.append(
+                LoopInfo(
+                    loop_id, loop.operation.name, func_name, depth, str(loop.location)
+                )
+            )
+
+        module.operation.attributes[LOOP_PROFILE_ATTR] = ir.ArrayAttr.get(
+            [
+                ir.DictAttr.get(
+                    {
+                        "kind": ir.StringAttr.get(l.kind),
+                        "func": ir.StringAttr.get(l.func_name),
+                        "depth": ir.IntegerAttr.get(i64_type, l.depth),
+                        "location": ir.StringAttr.get(l.location),
+                    }
+                )
+                for l in loop_infos
+            ]
+        )
+
+    return LoopProfile(loop_infos)
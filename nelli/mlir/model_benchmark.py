@@ -0,0 +1,328 @@
+"""End-to-end benchmarks of the torchvision models in `tests/pytorch_nns`
+(see `scripts/torchvision_mlir.py`).
+
+For every model (and the input size it was traced with), measures parse time,
+the lowering time of every stage of the pipeline (`STAGES`), JIT
+time, first-inference latency and steady-state latency and throughput, and
+appends one JSON object per model to a results file, e.g.,
+
+    python -m nelli.mlir.model_benchmark tests/pytorch_nns \\
+        --models resnet18 alexnet --sizes 32 224 --output results.jsonl
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from ..utils import nelli_version, shlib_ext
+from ._mlir import _mlir_libs
+from ._mlir import ir
+from ._mlir.runtime import unranked_memref_to_numpy
+from .benchmark import BenchmarkResult
+from .passes import Pipeline
+from .perf_db import record_result
+from .refbackend import (
+    LLVMJITBackend,
+    elemental_type_to_ctype,
+    materialize,
+    memref_type_to_np_dtype,
+)
+from .transform import match, sequence, tile_linalg_to_scf_for
+
+INPUT_SIZES = (32, 64, 128, 224, 299)
+
+_FORWARD_INPUT_RE = re.compile(
+    r"func\.func @forward\(%arg0: tensor<(\d+)x(\d+)x(\d+)x(\d+)xf32>"
+)
+
+
+def basic_tile(target, *extra_args):
+    m = match(target, ["linalg.matmul"])
+    tile_linalg_to_scf_for(m, sizes=[2, 2])
+
+
+# the stages of the pipeline that lowers the models (`tests/test_nns.py` runs it
+# too, see `model_pipeline`), in order; each stage is run (and timed) separately
+STAGES: list[tuple[str, Callable[[], Pipeline]]] = [
+    (
+        "fuse",
+        lambda: Pipeline()
+        .FUNC()
+        .refbackend_generalize_tensor_pad()
+        .linalg_transform_patterns(generalize_pad_tensor=True)
+        .linalg_fuse_elementwise_ops()
+        .CNUF(),
+    ),
+    (
+        "bufferize",
+        lambda: Pipeline().bufferize().FUNC().refbackend_munge_memref_copy().CNUF(),
+    ),
+    (
+        "transform",
+        lambda: Pipeline()
+        .transform_dialect_interpreter()
+        .transform_dialect_erase_schedule(),
+    ),
+    (
+        "parallelize",
+        lambda: Pipeline()
+        .FUNC()
+        .convert_linalg_to_parallel_loops()
+        .CNUF()
+        .lower_to_openmp(),
+    ),
+    (
+        "to_llvm",
+        lambda: Pipeline().refbackend_munge_calling_conventions().lower_to_llvm(),
+    ),
+]
+
+
+def model_pipeline() -> Pipeline:
+    """All of `STAGES`, as one pipeline."""
+    pipeline = Pipeline()
+    for _, stage in STAGES:
+        pipeline += stage()
+    return pipeline
+
+
+def model_shared_libs() -> list[str]:
+    """The runtime libs the lowered models link against (including OpenMP)."""
+    libs_dir = Path(_mlir_libs.__file__).parent
+    return [
+        str(libs_dir / f"libmlir_c_runner_utils.{shlib_ext()}"),
+        str(libs_dir / f"libmlir_runner_utils.{shlib_ext()}"),
+        str(libs_dir / f"libomp.{shlib_ext()}"),
+    ]
+
+
+@dataclass
+class ModelIR:
+    name: str
+    path: Path
+    # NCHW
+    input_shape: tuple[int, int, int, int]
+
+    @property
+    def input_size(self) -> int:
+        return self.input_shape[2]
+
+
+def discover_models(
+    models_dir,
+    models: Optional[Sequence[str]] = None,
+    sizes: Optional[Sequence[int]] = None,
+) -> list[ModelIR]:
+    """The models (`<name>.mlir`) in `models_dir` whose names are in `models`
+    and whose input size (the height of the `forward` input) is in `sizes`."""
+    found = []
+    for path in sorted(Path(models_dir).glob("*.mlir")):
+        if models is not None and path.stem not in models:
+            continue
+        with open(path) as f:
+            m = None
+            for line in f:
+                m = _FORWARD_INPUT_RE.search(line)
+                if m is not None:
+                    break
+        assert m is not None, f"no forward(tensor<NxCxHxWxf32>) in {path}"
+        input_shape = tuple(map(int, m.groups()))
+        if sizes is not None and input_shape[2] not in sizes:
+            continue
+        found.append(ModelIR(path.stem, path, input_shape))
+    return found
+
+
+@dataclass
+class ModelBenchmarkResult:
+    model: str
+    input_shape: tuple[int, ...]
+    parse_time_s: float
+    # stage name -> wall time
+    lowering_times_s: dict[str, float]
+    jit_time_s: float
+    first_inference_s: float
+    inference: BenchmarkResult
+    metadata: dict = field(default_factory=dict)
+
+    @property
+    def lowering_time_s(self) -> float:
+        return sum(self.lowering_times_s.values())
+
+    @property
+    def throughput(self) -> float:
+        """Images per second, at the median latency."""
+        return self.input_shape[0] / (self.inference.median * 1e-9)
+
+    def as_dict(self) -> dict:
+        return {
+            "model": self.model,
+            "input_shape": list(self.input_shape),
+            "input_size": self.input_shape[2],
+            "parse_time_s": self.parse_time_s,
+            "lowering_times_s": dict(self.lowering_times_s),
+            "lowering_time_s": self.lowering_time_s,
+            "jit_time_s": self.jit_time_s,
+            "first_inference_s": self.first_inference_s,
+            "inference": self.inference.as_dict(),
+            "throughput_per_s": self.throughput,
+            **self.metadata,
+        }
+
+    def __str__(self):
+        stages = " ".join(f"{k}={v:.3f}" for k, v in self.lowering_times_s.items())
+        return (
+            f"{self.model} {'x'.join(map(str, self.input_shape))}: "
+            f"parse {self.parse_time_s:.3f}s, lower {self.lowering_time_s:.3f}s "
+            f"({stages}), jit {self.jit_time_s:.3f}s, "
+            f"first inference {self.first_inference_s * 1e3:.2f}ms, "
+            f"median {self.inference.median / 1e6:.2f}ms, "
+            f"p90 {self.inference.p90 / 1e6:.2f}ms, "
+            f"{self.throughput:.1f} images/s"
+        )
+
+
+def environment_metadata() -> dict:
+    """What's needed to compare results across nelli versions and machines."""
+    return {
+        "nelli_version": nelli_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def benchmark_model(
+    model: ModelIR,
+    backend: Optional[LLVMJITBackend] = None,
+    opt_level=3,
+    warmup=3,
+    repetitions=10,
+    seed=0,
+) -> ModelBenchmarkResult:
+    """Parses, lowers, JITs and runs `model`; steady-state latencies are
+    measured around the Python call to `forward` (including the callback that
+    receives the result)."""
+    if backend is None:
+        backend = LLVMJITBackend(shared_libs=model_shared_libs())
+
+    src = model.path.read_text()
+    start = time.perf_counter()
+    module = ir.Module.parse(src)
+    parse_time_s = time.perf_counter() - start
+    with ir.InsertionPoint(module.body):
+        sequence(basic_tile)
+
+    lowering_times_s = {}
+    for stage_name, stage_pipeline in STAGES:
+        start = time.perf_counter()
+        module = backend.compile(module, stage_pipeline(), kernel_name="forward")
+        lowering_times_s[stage_name] = time.perf_counter() - start
+
+    result = None
+
+    def callback(*args):
+        nonlocal result
+        assert len(args) == 1
+        arg, type = args[0], invoker.ret_types[0]
+        result = (
+            arg
+            if type in elemental_type_to_ctype
+            else unranked_memref_to_numpy(arg, memref_type_to_np_dtype[type])
+        )
+
+    start = time.perf_counter()
+    invoker = backend.load(module, consume_return_func=callback, opt_level=opt_level)
+    # the engine compiles lazily, on the first lookup
+    materialize(invoker.ee, module)
+    jit_time_s = time.perf_counter() - start
+
+    x = np.random.default_rng(seed).standard_normal(model.input_shape, np.float32)
+    start = time.perf_counter()
+    invoker.forward(x)
+    first_inference_s = time.perf_counter() - start
+    assert result is not None and not np.isnan(result).any(), f"{model.name} failed"
+
+    times_ns = np.empty(warmup + repetitions, dtype=np.int64)
+    for i in range(warmup + repetitions):
+        start_ns = time.perf_counter_ns()
+        invoker.forward(x)
+        times_ns[i] = time.perf_counter_ns() - start_ns
+
+    inference = BenchmarkResult(
+        "forward",
+        times_ns[warmup:],
+        warmup,
+        {
+            "pipeline": model_pipeline().materialize(),
+            "opt_level": opt_level,
+        },
+    )
+    # a no-op unless $NELLI_PERF_DB is set
+    record_result(inference, name=f"{model.name}@{model.input_size}")
+    return ModelBenchmarkResult(
+        model.name,
+        model.input_shape,
+        parse_time_s,
+        lowering_times_s,
+        jit_time_s,
+        first_inference_s,
+        inference,
+        environment_metadata(),
+    )
+
+
+def run_suite(
+    models_dir,
+    models: Optional[Sequence[str]] = None,
+    sizes: Optional[Sequence[int]] = INPUT_SIZES,
+    output=None,
+    **kwargs,
+) -> list[ModelBenchmarkResult]:
+    """Benchmarks every model in `models_dir` (see `discover_models`), one
+    after another, appending each result (as a JSON line) to `output`."""
+    results = []
+    for model in discover_models(models_dir, models, sizes):
+        result = benchmark_model(model, **kwargs)
+        results.append(result)
+        if output is not None:
+            with open(output, "a") as f:
+                f.write(json.dumps(result.as_dict()) + "\n")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("models_dir", help="directory of <model>.mlir files")
+    parser.add_argument("--models", nargs="*", help="model names (default: all)")
+    parser.add_argument("--sizes", nargs="*", type=int, default=list(INPUT_SIZES))
+    parser.add_argument("--output", help="JSON lines file to append results to")
+    parser.add_argument("--opt-level", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--repetitions", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    for result in run_suite(
+        args.models_dir,
+        args.models,
+        args.sizes,
+        args.output,
+        opt_level=args.opt_level,
+        warmup=args.warmup,
+        repetitions=args.repetitions,
+    ):
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,9 @@ from typing import Union, List, Optional
 from . import _omp_ops_gen as omp
 from ..arith import constant
 from ..utils import I32
-from .._mlir.ir import Value, InsertionPoint
+from .._mlir.ir import Attribute, Value, InsertionPoint
+
+SCHEDULE_KINDS = ("static", "dynamic", "guided", "auto", "runtime")
 
 
 class ParallelOp(omp.ParallelOp):
@@ -50,9 +52,16 @@ class WsLoopOp(omp.WsLoopOp):
         upper_bounds: List[Union[Value, int]],
         steps: Optional[List[Union[Value, int]]] = None,
         *,
+        schedule: Optional[str] = None,
+        chunk: Optional[Union[Value, int]] = None,
+        index=False,
         loc=None,
         ip=None,
     ):
+        """`schedule` is one of `SCHEDULE_KINDS` and `chunk` its chunk size.
+        Literal bounds (and chunk sizes) become `i32` constants or, if `index`,
+        `index` constants; the induction variable has the type of the bounds.
+        """
         num_bounds = len(lower_bounds)
         assert num_bounds == len(upper_bounds)
         if steps is None:
@@ -60,12 +69,24 @@ class WsLoopOp(omp.WsLoopOp):
         else:
             assert len(steps) == num_bounds
 
-        if isinstance(lower_bounds[0], int):
-            lower_bounds = [constant(l, type=I32) for l in lower_bounds]
-        if isinstance(upper_bounds[0], int):
-            upper_bounds = [constant(l, type=I32) for l in upper_bounds]
-        if isinstance(steps[0], int):
-            steps = [constant(l, type=I32) for l in steps]
+        def to_value(l):
+            if not isinstance(l, int):
+                return l
+            return constant(l, index=True) if index else constant(l, type=I32)
+
+        lower_bounds = [to_value(l) for l in lower_bounds]
+        upper_bounds = [to_value(l) for l in upper_bounds]
+        steps = [to_value(l) for l in steps]
+
+        schedule_val = None
+        if schedule is not None:
+            assert (
+                schedule in SCHEDULE_KINDS
+            ), f"unknown {schedule=}; expected one of {SCHEDULE_KINDS}"
+            schedule_val = Attribute.parse(f"#omp<schedulekind {schedule}>")
+        if chunk is not None:
+            assert schedule is not None, f"a chunk size needs a schedule"
+            chunk = to_value(chunk)
 
         linear_vars = linear_step_vars = reduction_vars = []
         super().__init__(
@@ -75,10 +96,12 @@ class WsLoopOp(omp.WsLoopOp):
             linear_vars,
             linear_step_vars,
             reduction_vars,
+            schedule_val=schedule_val,
+            schedule_chunk_var=chunk,
             loc=loc,
             ip=ip,
         )
-        self.regions[0].blocks.append(I32, *[])
+        self.regions[0].blocks.append(lower_bounds[0].type, *[])
 
     @property
     def body(self):
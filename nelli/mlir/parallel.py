@@ -0,0 +1,98 @@
+"""Per-loop parallelism: `prange` marks a single for loop (in an `mlir_func`) as
+parallel, independently of the function's `range_ctor`, e.g.,
+
+    @mlir_func(range_ctor=scf_range)
+    def scale(A: MemRef[(M, N), F32]):
+        for i in prange(0, M, schedule="dynamic", chunk=4, num_threads=8):
+            for j in range(0, N):
+                A[i, j] = A[i, j] * 2.0
+
+parallelizes only the outer loop. Loops lower to an `omp.wsloop` (in its own
+`omp.parallel`) or, with `lowering="scf"`, to an `scf.parallel` (which has no
+scheduling options; `Pipeline.lower_to_openmp` picks them).
+
+Note that the induction variables of parallel loops aren't affine dims, so
+index memrefs with them as `MemRefValue`s (not `RankedAffineMemRefValue`s).
+"""
+from typing import Optional, Union
+
+from .arith import ArithValue, constant
+from .omp import _omp_ops_gen as omp
+from .omp.omp import ParallelOp as OMPParallelOp, WsLoopOp, SCHEDULE_KINDS
+from .scf import ParallelOp as SCFParallelOp
+from ._mlir.dialects import scf
+from ._mlir.ir import InsertionPoint, Value
+from .utils import caller_location
+
+LOWERINGS = ("omp", "scf")
+
+# (lowering, insertion points) of the enclosing pranges, innermost last
+_pranges = []
+
+
+def _index(v):
+    return constant(v, index=True) if isinstance(v, int) else v
+
+
+def prange(
+    start: Union[Value, int],
+    stop: Optional[Union[Value, int]] = None,
+    step: Union[Value, int] = 1,
+    *,
+    schedule: Optional[str] = None,
+    chunk: Optional[Union[Value, int]] = None,
+    num_threads: Optional[Union[Value, int]] = None,
+    lowering: str = "omp",
+):
+    """A parallel `range(start, stop, step)` over `index`es.
+
+    `schedule` (one of `SCHEDULE_KINDS`), `chunk` and `num_threads` only apply
+    to the `"omp"` lowering. The loop body must be terminated by `end_prange`
+    (which `mlir_func` inserts).
+    """
+    assert lowering in LOWERINGS, f"unknown {lowering=}; expected one of {LOWERINGS}"
+    if stop is None:
+        start, stop = 0, start
+    start, stop, step = map(_index, (start, stop, step))
+
+    ips = []
+    if lowering == "omp":
+        assert (
+            schedule is None or schedule in SCHEDULE_KINDS
+        ), f"unknown {schedule=}; expected one of {SCHEDULE_KINDS}"
+        parallel_op = OMPParallelOp(num_threads=num_threads, loc=caller_location())
+        ips.append(InsertionPoint(parallel_op.body))
+        ips[-1].__enter__()
+        for_op = WsLoopOp(
+            [start],
+            [stop],
+            [step],
+            schedule=schedule,
+            chunk=chunk,
+            index=True,
+            loc=caller_location(),
+        )
+        iv = for_op.induction_variable
+    else:
+        assert (
+            schedule is None and chunk is None and num_threads is None
+        ), f"scf.parallel has no schedule, chunk or num_threads"
+        for_op = SCFParallelOp([start], [stop], [step], loc=caller_location())
+        iv = for_op.induction_variables[0]
+
+    ips.append(InsertionPoint(for_op.body))
+    ips[-1].__enter__()
+    _pranges.append((lowering, ips))
+    return [ArithValue(iv)]
+
+
+def end_prange():
+    assert _pranges, f"end_prange without a prange"
+    lowering, ips = _pranges.pop()
+    if lowering == "omp":
+        omp.YieldOp([])
+        ips.pop().__exit__(None, None, None)
+        omp.TerminatorOp()
+    else:
+        scf.YieldOp([])
+    ips.pop().__exit__(None, None, None)
@@ -0,0 +1,213 @@
+"""Per-pass compile time, IR size and memory statistics for `run_pipeline`."""
+from __future__ import annotations
+
+import platform
+import resource
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+from . import tracing
+from ._mlir.passmanager import PassManager
+
+
+def _parse_pipeline_elements(pipeline: str, i=0) -> tuple[list, int]:
+    # elements are `name`, `name{options}` or `anchor(elements)`;
+    # options can contain anything, including commas and parens, except
+    # unbalanced braces
+    elements = []
+    while i < len(pipeline):
+        start = i
+        while i < len(pipeline) and pipeline[i] not in ",(){":
+            i += 1
+        name = pipeline[start:i].strip()
+        if i < len(pipeline) and pipeline[i] == "{":
+            depth = 0
+            while i < len(pipeline):
+                if pipeline[i] == "{":
+                    depth += 1
+                elif pipeline[i] == "}":
+                    depth -= 1
+                    if depth == 0:
+                        i += 1
+                        break
+                i += 1
+            name = pipeline[start:i].strip()
+        children = None
+        if i < len(pipeline) and pipeline[i] == "(":
+            children, i = _parse_pipeline_elements(pipeline, i + 1)
+            assert pipeline[i] == ")", f"unbalanced parens in {pipeline}"
+            i += 1
+        if name:
+            elements.append((name, children))
+        if i < len(pipeline) and pipeline[i] == ")":
+            return elements, i
+        # skip the comma
+        i += 1
+    return elements, i
+
+
+def split_pipeline(pipeline: str) -> list[str]:
+    """Splits a (textual) pass pipeline into a list of pipelines, each of which
+    runs exactly one pass, nested under the same anchors as in `pipeline`, e.g.,
+
+        builtin.module(canonicalize,func.func(cse,loop-invariant-code-motion))
+
+    becomes
+
+        builtin.module(canonicalize)
+        builtin.module(func.func(cse))
+        builtin.module(func.func(loop-invariant-code-motion))
+    """
+    elements, _ = _parse_pipeline_elements(pipeline.strip())
+
+    def flatten(elements, anchors):
+        for name, children in elements:
+            if children is None:
+                pass_pipeline = name
+                for anchor in reversed(anchors):
+                    pass_pipeline = f"{anchor}({pass_pipeline})"
+                yield pass_pipeline
+            else:
+                yield from flatten(children, anchors + [name])
+
+    return list(flatten(elements, []))
+
+
+def count_ops(module) -> dict[str, int]:
+    from ..utils import walk_operation
+
+    counts = Counter()
+
+    def count(op):
+        counts[op.name] += 1
+
+    walk_operation(module.operation, count)
+    return dict(counts)
+
+
+def process_peak_rss_bytes() -> int:
+    """The high-water mark of the resident set size of the process, over its
+    whole lifetime so far."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss if platform.system() == "Darwin" else max_rss * 1024
+
+
+@dataclass
+class PassStats:
+    pass_pipeline: str
+    wall_time_s: float
+    op_counts_before: dict[str, int]
+    op_counts_after: dict[str, int]
+    # how much the pass raised the process's peak RSS, i.e., 0 unless it needed
+    # more memory than anything that ran before it
+    peak_rss_growth_bytes: int
+
+    @property
+    def ops_before(self) -> int:
+        return sum(self.op_counts_before.values())
+
+    @property
+    def ops_after(self) -> int:
+        return sum(self.op_counts_after.values())
+
+    def as_dict(self) -> dict:
+        return {
+            "pass": self.pass_pipeline,
+            "wall_time_s": self.wall_time_s,
+            "ops_before": self.ops_before,
+            "ops_after": self.ops_after,
+            "op_counts_before": dict(self.op_counts_before),
+            "op_counts_after": dict(self.op_counts_after),
+            "peak_rss_growth_bytes": self.peak_rss_growth_bytes,
+        }
+
+
+@dataclass
+class PipelineReport:
+    """Filled in by `run_pipeline(..., pass_stats=PipelineReport())`: one
+    `PassStats` per pass, in the order they ran."""
+
+    pipeline: str = ""
+    passes: list[PassStats] = field(default_factory=list)
+    # `process_peak_rss_bytes` after the pipeline ran
+    process_peak_rss_bytes: int = 0
+
+    @property
+    def total_wall_time_s(self) -> float:
+        return sum(p.wall_time_s for p in self.passes)
+
+    def slowest(self, n=10) -> list[PassStats]:
+        return sorted(self.passes, key=lambda p: p.wall_time_s, reverse=True)[:n]
+
+    def as_dict(self) -> dict:
+        return {
+            "pipeline": self.pipeline,
+            "total_wall_time_s": self.total_wall_time_s,
+            "process_peak_rss_bytes": self.process_peak_rss_bytes,
+            "passes": [p.as_dict() for p in self.passes],
+        }
+
+    def __str__(self):
+        total = self.total_wall_time_s or 1.0
+        lines = [
+            f"{'wall time (s)':>14} {'%':>6} {'ops before':>11} {'ops after':>10} {'rss growth (MB)':>16}  pass"
+        ]
+        for p in self.passes:
+            lines.append(
+                f"{p.wall_time_s:>14.6f} {100 * p.wall_time_s / total:>6.1f} "
+                f"{p.ops_before:>11} {p.ops_after:>10} "
+                f"{p.peak_rss_growth_bytes / 2**20:>16.1f}  {p.pass_pipeline}"
+            )
+        lines.append(f"{self.total_wall_time_s:>14.6f} {100.0:>6.1f}  total")
+        lines.append(f"process peak rss: {self.process_peak_rss_bytes / 2**20:.1f} MB")
+        return "\n".join(lines)
+
+
+def run_passes(
+    module,
+    pipeline: str,
+    report: Optional[PipelineReport] = None,
+    enable_ir_printing=False,
+):
+    """Runs `pipeline` on `module` one pass at a time (see `split_pipeline`),
+    each in a trace span. If `report` is provided, each pass is also timed and
+    ops are counted before and after it (which walks the whole module). With
+    `enable_ir_printing`, the IR is printed after every pass (as with a single
+    `PassManager`; the caller is responsible for disabling multithreading).
+
+    The Python bindings expose neither MLIR's pass timing nor pass
+    instrumentation callbacks, hence each pass is run by its own `PassManager`.
+    """
+    if report is not None:
+        report.pipeline = pipeline
+        op_counts = count_ops(module)
+        peak_rss = process_peak_rss_bytes()
+    for pass_pipeline in split_pipeline(pipeline):
+        pm = PassManager.parse(pass_pipeline)
+        if enable_ir_printing:
+            pm.enable_ir_printing()
+        pass_name = pass_pipeline.split("{", 1)[0].rsplit("(", 1)[-1].rstrip(")")
+        cat = "transform" if pass_name.startswith("transform-") else "pass"
+        with tracing.span(pass_name, cat, pipeline=pass_pipeline):
+            start = time.perf_counter()
+            pm.run(module.operation)
+            wall_time_s = time.perf_counter() - start
+        if report is None:
+            continue
+        peak_rss_after = process_peak_rss_bytes()
+        op_counts_after = count_ops(module)
+        report.passes.append(
+            PassStats(
+                pass_pipeline,
+                wall_time_s,
+                op_counts,
+                op_counts_after,
+                peak_rss_after - peak_rss,
+            )
+        )
+        op_counts, peak_rss = op_counts_after, peak_rss_after
+    if report is not None:
+        report.process_peak_rss_bytes = process_peak_rss_bytes()
@@ -94,8 +94,8 @@ class Pipeline:
     def lower_to_llvm_(self):
         return any(["to-llvm" in p for p in self._pipeline])
 
-    def bufferize(self):
-        return (
+    def bufferize(self, results_to_out_params=False):
+        (
             self.FUNC()
             .scf_bufferize()
             .empty_tensor_to_alloc_tensor()
@@ -106,21 +106,27 @@ class Pipeline:
             .FUNC()
             .tensor_bufferize()
             .finalizing_bufferize()
-            .buffer_deallocation()
             .CNUF()
         )
-
-    def lower_to_llvm(self):
+        if results_to_out_params:
+            # needs to happen before deallocation so that the (now copied out)
+            # result buffers are freed
+            self.buffer_results_to_out_params()
+        return self.FUNC().buffer_deallocation().CNUF()
+
+    def lower_to_llvm(self, vector=False):
+        """`vector=True` also lowers the vector dialect (e.g. kernels written
+        with `nelli.mlir.vector`)."""
+        self.cse().FUNC()
+        if vector:
+            # transfers that can't be lowered directly become loops
+            self.convert_vector_to_scf()
+        self.lower_affine().arith_expand().convert_math_to_llvm().CNUF()
+        self.convert_math_to_libm().convert_linalg_to_llvm()
+        if vector:
+            self.convert_vector_to_llvm()
         return (
-            self.cse()
-            .FUNC()
-            .lower_affine()
-            .arith_expand()
-            .convert_math_to_llvm()
-            .CNUF()
-            .convert_math_to_libm()
-            .convert_linalg_to_llvm()
-            .expand_strided_metadata()
+            self.expand_strided_metadata()
             .finalize_memref_to_llvm()
             .convert_scf_to_cf()
             .convert_cf_to_llvm()
@@ -0,0 +1,368 @@
+"""A (SQLite) store of benchmark runs and a CLI to compare them.
+
+A run is a set of `BenchmarkResult`s recorded together, along with the git
+revision, the host CPU and the nelli version; each result is keyed by its name,
+pipeline and opt level. `benchmark` (and the model benchmark suite) record
+their results automatically if the `NELLI_PERF_DB` environment variable is set
+(one run per process), e.g.,
+
+    NELLI_PERF_DB=perf.db pytest tests/test_benchmark.py
+    python -m nelli.mlir.perf_db perf.db runs
+    python -m nelli.mlir.perf_db perf.db compare -2 -1
+
+`compare` exits with a non-zero status if any benchmark got significantly
+slower, such that it can gate upgrades.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+from ..utils import nelli_version
+from .benchmark import BenchmarkResult
+from .target import host_cpu_model
+
+PERF_DB_ENV_VAR = "NELLI_PERF_DB"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    label TEXT,
+    git_revision TEXT,
+    host_cpu TEXT,
+    nelli_version TEXT,
+    python TEXT,
+    platform TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    name TEXT NOT NULL,
+    pipeline TEXT NOT NULL,
+    opt_level INTEGER,
+    times_ns TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_run_id ON results(run_id);
+"""
+
+
+def git_revision(cwd=None) -> Optional[str]:
+    """`HEAD` of the repo at `cwd` (by default, the one nelli is imported from;
+    suffixed with `-dirty` if there are uncommitted changes), or `None` if it
+    isn't a git repo."""
+    if cwd is None:
+        cwd = Path(__file__).parent
+    try:
+        run = lambda *args: subprocess.run(
+            ["git", *args], cwd=cwd, check=True, capture_output=True, text=True
+        ).stdout.strip()
+        revision = run("rev-parse", "HEAD")
+        if run("status", "--porcelain", "--untracked-files=no"):
+            revision += "-dirty"
+        return revision
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@dataclass
+class Run:
+    id: int
+    timestamp: str
+    label: Optional[str]
+    git_revision: Optional[str]
+    host_cpu: str
+    nelli_version: Optional[str]
+    python: str
+    platform: str
+
+    def __str__(self):
+        revision = (self.git_revision or "unknown")[:12]
+        label = f" {self.label}" if self.label else ""
+        return (
+            f"{self.id:>5} {self.timestamp} {revision:<18} "
+            f"{self.host_cpu} (nelli {self.nelli_version}){label}"
+        )
+
+
+class PerfDB:
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def new_run(self, label: Optional[str] = None) -> int:
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (timestamp, label, git_revision, host_cpu, "
+                "nelli_version, python, platform) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    label,
+                    git_revision(),
+                    host_cpu_model(),
+                    nelli_version(),
+                    platform.python_version(),
+                    platform.platform(),
+                ),
+            )
+        return cursor.lastrowid
+
+    def has_result(self, run_id: int, name: str, pipeline: str, opt_level) -> bool:
+        return (
+            self.conn.execute(
+                "SELECT 1 FROM results WHERE run_id = ? AND name = ? AND "
+                "pipeline = ? AND opt_level IS ?",
+                (run_id, name, pipeline, opt_level),
+            ).fetchone()
+            is not None
+        )
+
+    def add_result(self, run_id: int, result: BenchmarkResult, name=None):
+        """Records `result` under `name` (by default, its kernel name); the
+        pipeline and opt level are taken from its metadata. A run holds one
+        result per (name, pipeline, opt level)."""
+        if name is None:
+            name = result.kernel_name
+        metadata = dict(result.metadata)
+        pipeline = str(metadata.pop("pipeline", ""))
+        opt_level = metadata.pop("opt_level", None)
+        metadata["warmup"] = result.warmup
+        assert not self.has_result(
+            run_id, name, pipeline, opt_level
+        ), f"run {run_id} already has a result for {(name, pipeline, opt_level)}"
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    name,
+                    pipeline,
+                    opt_level,
+                    json.dumps([int(t) for t in result.times_ns]),
+                    json.dumps(metadata, default=str),
+                ),
+            )
+
+    def record(self, results: list[BenchmarkResult], label=None) -> int:
+        run_id = self.new_run(label)
+        for result in results:
+            self.add_result(run_id, result)
+        return run_id
+
+    def runs(self) -> list[Run]:
+        return [
+            Run(*row) for row in self.conn.execute("SELECT * FROM runs ORDER BY id")
+        ]
+
+    def resolve_run_id(self, run: int) -> int:
+        """Run ids are positive; negative numbers count back from the latest
+        run (-1 is the latest)."""
+        if run > 0:
+            return run
+        ids = [r.id for r in self.runs()]
+        assert -len(ids) <= run < 0, f"no run {run}; there are {len(ids)} runs"
+        return ids[run]
+
+    def results(self, run_id: int) -> dict[tuple[str, str, int], BenchmarkResult]:
+        """The results of a run, keyed by (name, pipeline, opt level)."""
+        results = {}
+        for name, pipeline, opt_level, times_ns, metadata in self.conn.execute(
+            "SELECT name, pipeline, opt_level, times_ns, metadata FROM results "
+            "WHERE run_id = ?",
+            (run_id,),
+        ):
+            metadata = json.loads(metadata)
+            warmup = metadata.pop("warmup", 0)
+            metadata.update({"pipeline": pipeline, "opt_level": opt_level})
+            key = (name, pipeline, opt_level)
+            assert key not in results, f"run {run_id} has multiple results for {key}"
+            results[key] = BenchmarkResult(
+                name, np.array(json.loads(times_ns), dtype=np.int64), warmup, metadata
+            )
+        return results
+
+
+def mann_whitney_u(a, b) -> float:
+    """The two-sided p-value of the Mann-Whitney U test that samples `a` and
+    `b` come from the same distribution (normal approximation, with the
+    correction for ties)."""
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    n1, n2 = len(a), len(b)
+    values = np.concatenate([a, b])
+    order = np.argsort(values, kind="mergesort")
+    sorted_values = values[order]
+    # average ranks of ties
+    _, first, counts = np.unique(sorted_values, return_index=True, return_counts=True)
+    avg_ranks = first + (counts + 1) / 2
+    ranks = np.empty_like(values)
+    ranks[order] = np.repeat(avg_ranks, counts)
+
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    tie_term = ((counts**3 - counts).sum()) / (n * (n - 1)) if n > 1 else 0.0
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term))
+    if sigma == 0:
+        return 1.0
+    # with continuity correction
+    z = (abs(u - n1 * n2 / 2) - 0.5) / sigma
+    return float(min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2))))
+
+
+@dataclass
+class Comparison:
+    key: tuple[str, str, int]
+    baseline: BenchmarkResult
+    candidate: BenchmarkResult
+    p_value: float
+    # "slower", "faster" or "unchanged"
+    verdict: str
+
+    @property
+    def ratio(self) -> float:
+        """Candidate median over baseline median (> 1 is slower)."""
+        return self.candidate.median / self.baseline.median
+
+    def as_dict(self) -> dict:
+        name, pipeline, opt_level = self.key
+        return {
+            "name": name,
+            "pipeline": pipeline,
+            "opt_level": opt_level,
+            "baseline_median_ns": self.baseline.median,
+            "candidate_median_ns": self.candidate.median,
+            "ratio": self.ratio,
+            "p_value": self.p_value,
+            "verdict": self.verdict,
+        }
+
+
+def compare_results(
+    baseline: dict, candidate: dict, alpha=0.01, threshold=0.05
+) -> list[Comparison]:
+    """Compares the results (as returned by `PerfDB.results`) common to both
+    runs. A change is significant if the Mann-Whitney U test rejects (at level
+    `alpha`) that the times are from the same distribution and the medians
+    differ by more than `threshold` (relative)."""
+    comparisons = []
+    for key in sorted(baseline.keys() & candidate.keys(), key=str):
+        base, cand = baseline[key], candidate[key]
+        p_value = mann_whitney_u(base.times_ns, cand.times_ns)
+        ratio = cand.median / base.median
+        verdict = "unchanged"
+        if p_value < alpha and ratio > 1 + threshold:
+            verdict = "slower"
+        elif p_value < alpha and ratio < 1 / (1 + threshold):
+            verdict = "faster"
+        comparisons.append(Comparison(key, base, cand, p_value, verdict))
+    return comparisons
+
+
+def format_comparisons(comparisons: list[Comparison]) -> str:
+    lines = [
+        f"{'baseline (us)':>14} {'candidate (us)':>15} {'ratio':>7} {'p':>8} {'':>9}  benchmark"
+    ]
+    for c in comparisons:
+        name, pipeline, opt_level = c.key
+        lines.append(
+            f"{c.baseline.median / 1e3:>14.3f} {c.candidate.median / 1e3:>15.3f} "
+            f"{c.ratio:>7.3f} {c.p_value:>8.2g} {c.verdict:>9}  "
+            f"{name} (O{opt_level}) {pipeline}"
+        )
+    return "\n".join(lines)
+
+
+_current_run: Optional[tuple[str, int]] = None
+
+
+def record_result(result: BenchmarkResult, name=None) -> Optional[int]:
+    """Records `result` into the database at `$NELLI_PERF_DB` (if set), in a
+    run shared by the whole process. Under pytest, the name is prefixed with
+    the id of the test. Repeated names (e.g., a kernel benchmarked for several
+    inputs by one test) are numbered, `name#2`, `name#3`, ... Returns the run
+    id."""
+    global _current_run
+    path = os.environ.get(PERF_DB_ENV_VAR)
+    if not path:
+        return None
+    if name is None:
+        name = result.kernel_name
+        test = os.environ.get("PYTEST_CURRENT_TEST")
+        if test:
+            name = f"{test.split(' ')[0]}::{name}"
+    db = PerfDB(path)
+    try:
+        if _current_run is None or _current_run[0] != path:
+            _current_run = (path, db.new_run())
+        run_id = _current_run[1]
+        pipeline = str(result.metadata.get("pipeline", ""))
+        opt_level = result.metadata.get("opt_level")
+        unique_name, i = name, 1
+        while db.has_result(run_id, unique_name, pipeline, opt_level):
+            i += 1
+            unique_name = f"{name}#{i}"
+        db.add_result(run_id, result, unique_name)
+    finally:
+        db.close()
+    return _current_run[1]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("db", help="path to the SQLite database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("runs", help="list the recorded runs")
+    compare = subparsers.add_parser(
+        "compare", help="compare two runs (negative ids count back from the latest)"
+    )
+    compare.add_argument("baseline", type=int)
+    compare.add_argument("candidate", type=int)
+    compare.add_argument("--alpha", type=float, default=0.01)
+    compare.add_argument("--threshold", type=float, default=0.05)
+    compare.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    db = PerfDB(args.db)
+    try:
+        if args.command == "runs":
+            for run in db.runs():
+                print(run)
+            return 0
+
+        baseline = db.resolve_run_id(args.baseline)
+        candidate = db.resolve_run_id(args.candidate)
+        comparisons = compare_results(
+            db.results(baseline), db.results(candidate), args.alpha, args.threshold
+        )
+    finally:
+        db.close()
+
+    if args.json:
+        print(json.dumps([c.as_dict() for c in comparisons], indent=2))
+    else:
+        print(f"run {baseline} -> run {candidate}")
+        print(format_comparisons(comparisons))
+    slower = [c for c in comparisons if c.verdict == "slower"]
+    if slower:
+        print(f"{len(slower)} significant slowdown(s)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,8 +11,15 @@ from .passes import Pipeline
 
 logger = logging.getLogger(__name__)
 
+import asyncio
 import ctypes
-from typing import Optional, Callable, Union
+import os
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Callable, Union, Iterable, Sequence
 
 import numpy as np
 
@@ -25,8 +32,23 @@ from ..mlir._mlir.runtime import (
     get_ranked_memref_descriptor,
     get_unranked_memref_descriptor,
 )
-from ..mlir._mlir.ir import Module, UnitAttr
-
+from ..mlir._mlir.ir import Module, UnitAttr, StringAttr
+
+from .batch import batched_func_name, get_batch_outs
+from .kernel_cache import (
+    CACHE_KEY_ATTR,
+    OBJECT_FILENAME,
+    EngineCache,
+    KernelCache,
+    fingerprint,
+    link_shared_library,
+    module_fingerprint,
+    toolchain_version,
+)
+from .loop_profile import LoopProfile, LoopProfileReport, instrument_loops
+from .target import Target
+from .pass_stats import PipelineReport
+from . import tracing
 from .utils import run_pipeline
 
 
@@ -64,6 +86,7 @@ elemental_type_to_ctype = {
 }
 
 CONSUME_RETURN_FUNC_PREFIX = "refbackend_consume_func_return_"
+C_INTERFACE_PREFIX = "_mlir_ciface_"
 
 
 def get_return_funcs(module):
@@ -98,57 +121,434 @@ def get_ctype_func(func_name):
 CData = ctypes._SimpleCData.__mro__[-2]
 
 
+class SharedLibraryEngine:
+    """The subset of the `ExecutionEngine` interface used by
+    `LLVMJITBackendInvoker`, backed by a shared library that contains the packed
+    (`_mlir__mlir_ciface_*`) entry points generated by the `ExecutionEngine`.
+    """
+
+    def __init__(self, lib_path, shared_libs=None):
+        if shared_libs is None:
+            shared_libs = []
+        # runtime libs need to be global so that their symbols resolve for the kernel lib
+        self.shared_libs = [
+            ctypes.CDLL(str(lib), mode=ctypes.RTLD_GLOBAL) for lib in shared_libs
+        ]
+        self.lib_path = Path(lib_path)
+        self.lib = ctypes.CDLL(str(lib_path))
+
+    def raw_lookup(self, name):
+        try:
+            return ctypes.cast(self.lib["_mlir_" + name], ctypes.c_void_p).value
+        except AttributeError:
+            return 0
+
+    def lookup(self, name):
+        func = self.raw_lookup(C_INTERFACE_PREFIX + name)
+        if not func:
+            raise RuntimeError("Unknown function " + name)
+        prototype = ctypes.CFUNCTYPE(None, ctypes.c_void_p)
+        return prototype(func)
+
+    def invoke(self, name, *ctypes_args):
+        func = self.lookup(name)
+        packed_args = (ctypes.c_void_p * len(ctypes_args))()
+        for argNum in range(len(ctypes_args)):
+            packed_args[argNum] = ctypes.cast(ctypes_args[argNum], ctypes.c_void_p)
+        func(packed_args)
+
+    def register_runtime(self, name, ctypes_callback):
+        raise NotImplementedError(
+            "runtime callbacks can't be registered with a precompiled shared library"
+        )
+
+
+def get_c_interface_funcs(module):
+    """Returns the names of the functions (defined in `module`, lowered to LLVM)
+    that have C interface wrappers, i.e., what can be passed to `invoke`."""
+
+    def cb(op):
+        return (
+            op.name == "llvm.func"
+            and len(op.regions[0].blocks) > 0
+            and StringAttr(op.attributes["sym_name"]).value.startswith(
+                C_INTERFACE_PREFIX
+            )
+        )
+
+    return [
+        StringAttr(op.attributes["sym_name"]).value[len(C_INTERFACE_PREFIX) :]
+        for op in find_ops(module, cb)
+    ]
+
+
+def estimate_engine_size(ee, module) -> int:
+    """The size of the native code held by an engine: the linked library for
+    `SharedLibraryEngine`s and the object code generated by `ExecutionEngine`s
+    (which forces codegen of all of `module`)."""
+    if isinstance(ee, SharedLibraryEngine):
+        return os.path.getsize(ee.lib_path)
+    materialize(ee, module)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        object_path = Path(tmp_dir) / OBJECT_FILENAME
+        ee.dump_to_object_file(str(object_path))
+        return os.path.getsize(object_path)
+
+
+def materialize(ee, module):
+    """Forces `ee` to codegen `module` (which otherwise happens lazily on the
+    first lookup), e.g., before dumping its object code."""
+    for func_name in get_c_interface_funcs(module):
+        ee.raw_lookup(C_INTERFACE_PREFIX + func_name)
+
+
+class CallPlan:
+    """A bound entry point of an `LLVMJITBackendInvoker`.
+
+    The symbol is resolved once (on the first call) and the signature (dtype,
+    shape and strides of each array argument) is validated and frozen on the
+    first call. The memref descriptors and the packed argument array handed to
+    the native function are reused across calls; only the data pointers of the
+    descriptors are patched, as long as the arguments match the frozen
+    signature (otherwise the mismatching descriptors are rebuilt).
+
+    For kernels whose results were turned into out params (see
+    `Pipeline.bufferize(results_to_out_params=True)`), the caller passes
+    preallocated arrays as `outs`; they're appended to the arguments, written
+    to in place and returned (no `consume_return_func` callback or copy through
+    Python is involved).
+
+    Since the descriptors are shared between calls, a `CallPlan` must not be
+    called concurrently from multiple threads (`LLVMJITBackendInvoker` hands
+    out one plan per thread). The native function is called through a
+    `ctypes.CFUNCTYPE` prototype, which releases the GIL for the duration of
+    the call.
+    """
+
+    def __init__(self, ee, function_name: str, unranked=False):
+        self.ee = ee
+        self.function_name = function_name
+        self.unranked = unranked
+        self._func = None
+        self._packed_args = None
+        self._signature = None
+        # per arg: (ranked descriptor, view of its `aligned` field, ffi arg)
+        self._slots = None
+
+    def _make_slot(self, arg):
+        if isinstance(arg, CData):
+            return None, None, arg
+
+        assert_arg_type_is_supported(arg.dtype)
+        ranked = get_ranked_memref_descriptor(arg)
+        # writing through this view avoids constructing a typed pointer per call
+        aligned = ctypes.c_void_p.from_buffer(ranked, type(ranked).aligned.offset)
+        if self.unranked:
+            # kernels rewritten by `refbackend_munge_calling_conventions`
+            # (i.e., loaded with a `consume_return_func`) take every memref as
+            # an unranked descriptor, which points at the ranked one
+            desc = UnrankedMemRefDescriptor()
+            desc.rank = arg.ndim
+            desc.descriptor = ctypes.cast(ctypes.pointer(ranked), ctypes.c_void_p)
+        else:
+            desc = ranked
+        return ranked, aligned, ctypes.pointer(ctypes.pointer(desc))
+
+    @staticmethod
+    def _arg_signature(arg):
+        if isinstance(arg, CData):
+            return None
+        return arg.dtype, arg.shape, arg.strides
+
+    def _freeze(self, args):
+        self._slots = [self._make_slot(arg) for arg in args]
+        self._signature = [self._arg_signature(arg) for arg in args]
+        self._packed_args = (ctypes.c_void_p * len(args))()
+        for i, (_ranked, _aligned, ffi_arg) in enumerate(self._slots):
+            self._packed_args[i] = ctypes.cast(ffi_arg, ctypes.c_void_p)
+
+    def __call__(self, *args, outs=None):
+        if outs is not None:
+            assert (
+                not self.unranked
+            ), f"outs can't be combined with refbackend munged calling conventions"
+            assert all(
+                o.flags.writeable and o.flags.c_contiguous for o in outs
+            ), f"outs must be writeable, C contiguous arrays"
+            args = args + tuple(outs)
+        if self._func is None:
+            # the engine generates code lazily, on the first lookup
+            with tracing.span("codegen", "jit", function=self.function_name):
+                self._func = self.ee.lookup(self.function_name)
+        if self._signature is None or len(args) != len(self._signature):
+            self._freeze(args)
+        else:
+            slots, signature, packed_args = (
+                self._slots,
+                self._signature,
+                self._packed_args,
+            )
+            for i, arg in enumerate(args):
+                sig = signature[i]
+                if sig is None or isinstance(arg, CData):
+                    if sig is not None or slots[i][2] is not arg:
+                        slots[i] = self._make_slot(arg)
+                        signature[i] = self._arg_signature(arg)
+                        packed_args[i] = ctypes.cast(slots[i][2], ctypes.c_void_p)
+                elif (
+                    (arg.dtype is sig[0] or arg.dtype == sig[0])
+                    and arg.shape == sig[1]
+                    and arg.strides == sig[2]
+                ):
+                    ranked, aligned, _ffi_arg = slots[i]
+                    data = arg.ctypes.data
+                    ranked.allocated = data
+                    aligned.value = data
+                else:
+                    slots[i] = self._make_slot(arg)
+                    signature[i] = self._arg_signature(arg)
+                    packed_args[i] = ctypes.cast(slots[i][2], ctypes.c_void_p)
+
+        if tracing._tracer is None:
+            self._func(self._packed_args)
+        else:
+            with tracing._tracer.span(self.function_name, "invoke"):
+                self._func(self._packed_args)
+
+        if outs is not None:
+            return outs[0] if len(outs) == 1 else tuple(outs)
+
+
 class LLVMJITBackendInvoker:
+    """Calls the functions of a JITed module by attribute, e.g.
+    `invoker.matmul(A, B, C)`.
+
+    Invocations are thread-safe and release the GIL while the kernel runs, so
+    compute bound kernels can be run concurrently from multiple Python threads
+    (see `LLVMJITBackendExecutor`). The exception is `consume_return_func`,
+    which is called back (with the GIL held) from whichever thread is running
+    the kernel; prefer out params (`outs=`) for concurrent execution.
+    """
+
     return_func: Optional[Callable] = None
 
-    def __init__(self, module, consume_return_func=None, opt_level=2, shared_libs=None):
+    def __init__(
+        self,
+        module,
+        consume_return_func=None,
+        opt_level=2,
+        shared_libs=None,
+        ee=None,
+    ):
         if shared_libs is None:
             shared_libs = []
-        self.ee = ExecutionEngine(module, opt_level=opt_level, shared_libs=shared_libs)
+        if ee is None:
+            with tracing.span("ExecutionEngine", "jit", opt_level=opt_level):
+                ee = ExecutionEngine(
+                    module, opt_level=opt_level, shared_libs=shared_libs
+                )
+        self.ee = ee
+        # call plans hold mutable descriptors, so each thread gets its own
+        self._local = threading.local()
+        # precompiled libraries (see `load_shared_library`) come without a module
+        self.loop_profile = (
+            LoopProfile.from_module(module) if module is not None else None
+        )
+        self.batch_outs = get_batch_outs(module) if module is not None else {}
         if consume_return_func is not None:
             return_funcs = get_return_funcs(module)
             assert len(return_funcs) == 1, f"multiple return funcs not supported"
             self.return_func = return_funcs[0]
             ctype_wrapper, ret_types = get_ctype_func(self.return_func)
             self.ret_types = ret_types
-            self.ee.register_runtime(
-                self.return_func, ctype_wrapper(consume_return_func)
+            # the engine only holds the raw function pointer
+            self._return_callback = ctype_wrapper(consume_return_func)
+            self.ee.register_runtime(self.return_func, self._return_callback)
+
+    def call_plan(self, function_name: str) -> CallPlan:
+        call_plans = getattr(self._local, "call_plans", None)
+        if call_plans is None:
+            call_plans = self._local.call_plans = {}
+        plan = call_plans.get(function_name)
+        if plan is None:
+            plan = CallPlan(
+                self.ee, function_name, unranked=self.return_func is not None
             )
+            call_plans[function_name] = plan
+        return plan
+
+    def invoke_batch(self, function_name: str, batch, outs=None):
+        """Runs `function_name` once for every tuple of arrays in `batch`, using a
+        single native call into the wrapper emitted by
+        `nelli.mlir.batch.add_batched_func`.
+
+        `outs` are the indices of the arguments that are written by the kernel;
+        only those are scattered back into the arrays in `batch`. They default
+        to the `outs` the wrapper was added with (all of the arguments, if they
+        weren't recorded, e.g., for a precompiled library). To skip the
+        gathering/scattering, call the batched function
+        (`invoker.<function_name>_batched`) directly with stacked arrays.
+        """
+        batch = list(batch)
+        if not batch:
+            return
+        batched_name = batched_func_name(function_name)
+        stacked = [np.stack(arrays) for arrays in zip(*batch)]
+        self.call_plan(batched_name)(*stacked)
+        if outs is None:
+            outs = self.batch_outs.get(batched_name, range(len(stacked)))
+        for i in outs:
+            for args, row in zip(batch, stacked[i]):
+                args[i][...] = row
+
+    def read_loop_profile(self) -> LoopProfileReport:
+        """Reads back (and resets) the per-loop counters of a module compiled
+        with `LLVMJITBackend.compile(..., profile_loops=True)`."""
+        assert (
+            self.loop_profile is not None
+        ), f"module wasn't instrumented; compile with profile_loops=True"
+        return self.loop_profile.read(self)
 
     def __getattr__(self, function_name: str):
-        _get = super().__getattribute__
+        if function_name.startswith("__") or function_name == "_local":
+            raise AttributeError(function_name)
+        return self.call_plan(function_name)
 
-        def invoke(*args):
-            ffi_args = []
-            for arg in args:
-                if isinstance(arg, CData):
-                    ffi_args.append(arg)
-                else:
-                    assert_arg_type_is_supported(arg.dtype)
-                    ffi_args.append(
-                        ctypes.pointer(
-                            # TODO(max): this is a hack to handle refbackend
-                            # in principle this has nothing to do with anything
-                            # refbackend related
-                            ctypes.pointer(get_unranked_memref_descriptor(arg))
-                            if _get("return_func") is not None
-                            else ctypes.pointer(get_ranked_memref_descriptor(arg))
-                        )
-                    )
 
-            self.ee.invoke(function_name, *ffi_args)
+class LLVMJITBackendExecutor:
+    """A `concurrent.futures` thread pool over an `LLVMJITBackendInvoker`.
+
+    Since the native calls release the GIL, `max_workers` threads running
+    compute bound kernels scale close to linearly (up to the number of cores).
+    """
+
+    def __init__(self, invoker: LLVMJITBackendInvoker, max_workers=None):
+        self.invoker = invoker
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="nelli-kernel"
+        )
+
+    def submit(self, function_name: str, *args, outs=None) -> Future:
+        return self.pool.submit(self._invoke, function_name, args, outs)
+
+    def _invoke(self, function_name, args, outs):
+        return self.invoker.call_plan(function_name)(*args, outs=outs)
+
+    def map(self, function_name: str, batch: Iterable[tuple], outs=None):
+        """Like `Executor.map`: runs `function_name` on each tuple of arrays in
+        `batch` (and the corresponding tuple in `outs`, if provided)."""
+        if outs is None:
+            futures = [self.submit(function_name, *args) for args in batch]
+        else:
+            futures = [
+                self.submit(function_name, *args, outs=o)
+                for args, o in zip(batch, outs)
+            ]
+
+        def results():
+            for f in futures:
+                yield f.result()
+
+        return results()
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+
+class AsyncLLVMJITBackendInvoker:
+    """An asyncio front end for an `LLVMJITBackendInvoker`: calls (e.g.
+    `await invoker.forward(x, outs=[y])`) return awaitables.
+
+    Kernels run on a bounded thread pool (`LLVMJITBackendExecutor`), with the
+    GIL released, so a single event loop can keep `max_workers` cores busy. At
+    most `max_pending` calls are submitted to the pool at a time; further
+    callers wait (on the event loop) for a slot, which provides backpressure.
+    Inputs are marshalled (made contiguous) on the event loop thread before
+    submission, i.e., while previously submitted calls are still running.
+    """
+
+    def __init__(
+        self,
+        invoker: LLVMJITBackendInvoker,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+    ):
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if max_pending is None:
+            max_pending = 2 * max_workers
+        self.executor = LLVMJITBackendExecutor(invoker, max_workers=max_workers)
+        self._pending = asyncio.Semaphore(max_pending)
+
+    async def invoke(self, function_name: str, *args, outs=None):
+        async with self._pending:
+            args = [
+                np.ascontiguousarray(a) if isinstance(a, np.ndarray) else a
+                for a in args
+            ]
+            future = self.executor.submit(function_name, *args, outs=outs)
+            return await asyncio.wrap_future(future)
+
+    def __getattr__(self, function_name: str):
+        if function_name.startswith("__") or function_name in {
+            "executor",
+            "_pending",
+        }:
+            raise AttributeError(function_name)
+
+        async def invoke(*args, outs=None):
+            return await self.invoke(function_name, *args, outs=outs)
 
         return invoke
 
+    async def aclose(self):
+        await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
 
 class LLVMJITBackend:
+    """Lowers modules to LLVM and JITs them using the `ExecutionEngine`.
+
+    If `cache_dir` is provided, lowered IR and native code are persisted in a
+    `KernelCache` rooted there, such that `compile` and `load` on a warm cache
+    skip both the pass pipeline and LLVM codegen.
+
+    If `engine_cache` is provided, loaded engines are kept in that (possibly
+    shared) `EngineCache`, such that reloading a hot module is free.
+
+    `target` pins the CPU and features that code is generated for (e.g.,
+    `Target.host()` or `Target("skylake-avx512", ["+avx512f"])`); by default
+    the `ExecutionEngine` targets the host. The target (the host's if none is
+    pinned) is part of the native code cache keys.
+    """
+
     def __init__(
         self,
         shared_libs: Optional[list[str]] = None,
+        cache_dir: Optional[str] = None,
+        engine_cache: Optional[EngineCache] = None,
+        target: Optional[Target] = None,
     ):
         if shared_libs is None:
             shared_libs = []
         self.shared_libs = shared_libs
+        self.cache = KernelCache(cache_dir) if cache_dir is not None else None
+        self.engine_cache = engine_cache
+        self.target = target
+        # the `PipelineReport` of the last `compile(..., collect_pass_stats=True)`
+        # (`None` if it didn't collect any, e.g., on a lowered IR cache hit)
+        self.last_pipeline_report: Optional[PipelineReport] = None
 
     def compile(
         self,
@@ -156,7 +556,11 @@ class LLVMJITBackend:
         pipeline: Union[Pipeline, str],
         kernel_name="main",
         enable_ir_printing=False,
+        collect_pass_stats=False,
+        profile_loops=False,
     ):
+        self.last_pipeline_report = None
+
         def cb(op):
             try:
                 return kernel_name == op.opview.sym_name.value
@@ -172,24 +576,202 @@ class LLVMJITBackend:
             needs_cface = "to-llvm" in pipeline
             pipeline_str = pipeline
 
+        if profile_loops:
+            instrument_loops(module)
+
         if needs_cface:
             kernel_func = find_ops(module, cb)
             assert len(kernel_func) == 1, f"kernel func {kernel_func} not found"
             kernel_func[0].attributes["llvm.emit_c_interface"] = UnitAttr.get()
 
-        return run_pipeline(
+        use_caches = self.cache is not None or self.engine_cache is not None
+        if use_caches:
+            key = fingerprint(
+                toolchain_version(),
+                module_fingerprint(module),
+                pipeline_str,
+                *self.shared_libs,
+            )
+        if self.cache is not None:
+            lowered = self.cache.get_lowered(key, context=module.context)
+            if lowered is not None:
+                return lowered
+
+        report = PipelineReport() if collect_pass_stats else None
+        module = run_pipeline(
             module,
             pipeline=pipeline_str,
             description="Lowering IR",
             enable_ir_printing=enable_ir_printing,
+            pass_stats=report,
+        )
+        self.last_pipeline_report = report
+
+        if use_caches:
+            # such that `load` never needs to fingerprint the lowered IR
+            module.operation.attributes[CACHE_KEY_ATTR] = StringAttr.get(
+                key, context=module.context
+            )
+        if self.cache is not None:
+            self.cache.put_lowered(key, module)
+
+        return module
+
+    def compile_many(
+        self,
+        modules: Sequence[Module],
+        pipeline: Union[Pipeline, str],
+        kernel_name="main",
+        max_workers=None,
+        opt_level=None,
+    ) -> list[Module]:
+        """Like `compile` but fans `modules` out to a pool of worker processes,
+        each with its own MLIR context. Modules are exchanged as (textual) IR.
+
+        If the backend has a `cache_dir` and `opt_level` is provided, the workers
+        also codegen the lowered modules into the native code cache, such that
+        `load(..., opt_level=opt_level)` in this process skips codegen as well.
+        """
+        if isinstance(pipeline, Pipeline):
+            pipeline = pipeline.materialize()
+        modules = list(modules)
+        if not modules:
+            return []
+        context = modules[0].context
+        cache_dir = str(self.cache.cache_dir) if self.cache is not None else None
+        # MLIR contexts (and their thread pools) don't survive a fork
+        with ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            futures = [
+                pool.submit(
+                    _compile_in_worker,
+                    module.operation.get_asm(enable_debug_info=True),
+                    pipeline,
+                    kernel_name,
+                    self.shared_libs,
+                    cache_dir,
+                    opt_level,
+                    self.target,
+                )
+                for module in modules
+            ]
+            return [Module.parse(f.result(), context=context) for f in futures]
+
+    def native_cache_key(self, module, opt_level=2):
+        """Modules lowered by `compile` (with a cache) carry their key; others
+        are fingerprinted once and stamped with it."""
+        if CACHE_KEY_ATTR in module.operation.attributes:
+            module_key = StringAttr(module.operation.attributes[CACHE_KEY_ATTR]).value
+        else:
+            module_key = module_fingerprint(module)
+            module.operation.attributes[CACHE_KEY_ATTR] = StringAttr.get(
+                module_key, context=module.context
+            )
+        # code generated for the host is only valid on hosts like it
+        target = self.target if self.target is not None else Target.host()
+        return fingerprint(
+            toolchain_version(), module_key, opt_level, target, *self.shared_libs
         )
 
+    def target_report(self) -> dict:
+        """The target code is generated for; when none was pinned, that's the
+        host (with the features detected from the OS)."""
+        if self.target is None:
+            return Target.host().report()
+        return self.target.report()
+
     def load(
         self, module, consume_return_func=None, opt_level=2
     ) -> LLVMJITBackendInvoker:
-        return LLVMJITBackendInvoker(
+        # callbacks are registered with the ExecutionEngine's symbol table, which
+        # a precompiled shared library can't see (and which would be clobbered if
+        # the engine were shared), so those always get a fresh JIT
+        use_caches = consume_return_func is None and (
+            self.cache is not None or self.engine_cache is not None
+        )
+        ee = None
+        if use_caches:
+            key = self.native_cache_key(module, opt_level)
+            if self.engine_cache is not None:
+                ee = self.engine_cache.get(key)
+                if ee is not None:
+                    return LLVMJITBackendInvoker(module, ee=ee)
+            if self.cache is not None:
+                lib_path = self.cache.get_shared_library(key)
+                if lib_path is not None:
+                    ee = SharedLibraryEngine(lib_path, self.shared_libs)
+
+        if ee is None and self.target is not None:
+            self.target.apply(module)
+        invoker = LLVMJITBackendInvoker(
             module,
             opt_level=opt_level,
             shared_libs=self.shared_libs,
             consume_return_func=consume_return_func,
+            ee=ee,
         )
+
+        if use_caches:
+            if ee is None and self.cache is not None:
+                link_error = self.cache.link_error(key)
+                if link_error is None:
+                    materialize(invoker.ee, module)
+                    self.cache.put_native(key, invoker.ee, self.shared_libs)
+                else:
+                    # don't redo (and re-fail) the dump and link on every load
+                    logger.warning(
+                        f"kernel {key} isn't cached natively, JITing: {link_error}"
+                    )
+            if self.engine_cache is not None:
+                # sizing an engine forces codegen, so only do it if it matters
+                size_bytes = 0
+                if self.engine_cache.max_bytes is not None:
+                    size_bytes = estimate_engine_size(invoker.ee, module)
+                self.engine_cache.put(key, invoker.ee, size_bytes)
+
+        return invoker
+
+    def export_shared_library(self, module, lib_path, opt_level=2) -> Path:
+        """Compiles a module (already lowered by `compile`) to native code and
+        links it, against `shared_libs`, into the shared library `lib_path`.
+
+        The library can be loaded with `load_shared_library`, which runs neither
+        pass pipelines nor LLVM codegen.
+        """
+        assert not get_return_funcs(
+            module
+        ), f"runtime callbacks can't be exported; use out params instead"
+        if self.target is not None:
+            self.target.apply(module)
+        ee = ExecutionEngine(module, opt_level=opt_level, shared_libs=self.shared_libs)
+        materialize(ee, module)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            object_path = Path(tmp_dir) / OBJECT_FILENAME
+            ee.dump_to_object_file(str(object_path))
+            link_shared_library(object_path, lib_path, self.shared_libs)
+        return Path(lib_path)
+
+
+def _compile_in_worker(
+    module_asm, pipeline_str, kernel_name, shared_libs, cache_dir, opt_level, target
+):
+    backend = LLVMJITBackend(
+        shared_libs=shared_libs, cache_dir=cache_dir, target=target
+    )
+    module = backend.compile(
+        Module.parse(module_asm), pipeline_str, kernel_name=kernel_name
+    )
+    if cache_dir is not None and opt_level is not None:
+        backend.load(module, opt_level=opt_level)
+    return module.operation.get_asm(enable_debug_info=True)
+
+
+def load_shared_library(lib_path, shared_libs=None) -> LLVMJITBackendInvoker:
+    """Loads a shared library produced by `LLVMJITBackend.export_shared_library`
+    and returns an invoker with the same interface as `LLVMJITBackend.load`.
+
+    `shared_libs` are loaded (globally) beforehand; that's only necessary if the
+    runtime libs the kernel was linked against can't be found through its rpath.
+    """
+    return LLVMJITBackendInvoker(None, ee=SharedLibraryEngine(lib_path, shared_libs))
@@ -0,0 +1,101 @@
+"""A cache of the code objects produced by `rewrite_ast` and `rewrite_bytecode`.
+
+In memory, rewritten code is keyed by the original code object (which compares
+by value: bytecode, constants, names, line numbers), its file and the range
+constructor, such that decorating the same function again costs a dict lookup.
+If a cache directory is set (`NELLI_REWRITE_CACHE_DIR` or
+`rewrite_cache.cache_dir`), rewritten code is also persisted there (with
+`marshal`, like `__pycache__`), keyed by a hash of the source, the range
+constructor and the Python version, such that new processes skip rewriting too.
+"""
+from __future__ import annotations
+
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+from pathlib import Path
+from types import CodeType
+from typing import Callable, Hashable, Optional, Union
+
+import bytecode
+
+REWRITE_CACHE_DIR_ENV_VAR = "NELLI_REWRITE_CACHE_DIR"
+# bump whenever the rewrites change what they produce
+REWRITE_VERSION = 5
+
+
+def persistent_key(*parts) -> str:
+    h = hashlib.sha256()
+    for part in (
+        sys.implementation.cache_tag,
+        bytecode.__version__,
+        REWRITE_VERSION,
+        *parts,
+    ):
+        h.update(part if isinstance(part, bytes) else str(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class RewriteCache:
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None):
+        self.memory: dict[Hashable, CodeType] = {}
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def cache_dir(self) -> Optional[Path]:
+        return self._cache_dir
+
+    @cache_dir.setter
+    def cache_dir(self, cache_dir: Optional[Union[str, Path]]):
+        self._cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self._cache_dir is not None:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def clear(self):
+        """Clears the in-memory cache (not the cache directory)."""
+        self.memory.clear()
+        self.hits = self.disk_hits = self.misses = 0
+
+    def get_or_rewrite(
+        self,
+        memory_key: Hashable,
+        make_persistent_key: Callable[[], str],
+        rewrite: Callable[[], CodeType],
+    ) -> CodeType:
+        code = self.memory.get(memory_key)
+        if code is not None:
+            self.hits += 1
+            return code
+
+        path = None
+        if self.cache_dir is not None:
+            path = self.cache_dir / f"{make_persistent_key()}.bin"
+            try:
+                code = marshal.loads(path.read_bytes())
+            except (OSError, EOFError, ValueError, TypeError):
+                code = None
+            if code is not None:
+                self.disk_hits += 1
+                self.memory[memory_key] = code
+                return code
+
+        self.misses += 1
+        code = rewrite()
+        self.memory[memory_key] = code
+        if path is not None:
+            # write then rename, such that concurrent processes never read a
+            # partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(marshal.dumps(code))
+            os.replace(tmp_path, path)
+        return code
+
+
+rewrite_cache = RewriteCache(os.environ.get(REWRITE_CACHE_DIR_ENV_VAR) or None)
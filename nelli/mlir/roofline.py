@@ -0,0 +1,395 @@
+"""Static FLOP and byte counts, and roofline reports, for linalg and affine
+(or scf) modules."""
+from __future__ import annotations
+
+import math as pymath
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+from ._mlir import ir
+from .ast.visitors import (
+    AffineDialectVisitor,
+    AllDialectVisitor,
+    ArithDialectVisitor,
+    LinalgDialectVisitor,
+    MathDialectVisitor,
+    MemrefDialectVisitor,
+    VectorDialectVisitor,
+)
+from .benchmark import BenchmarkResult
+from .passes import Pipeline
+from .utils import run_pipeline
+
+
+def _element_bytes(t: ir.Type) -> int:
+    if ir.IndexType.isinstance(t):
+        return 8
+    if ir.IntegerType.isinstance(t):
+        return max(ir.IntegerType(t).width // 8, 1)
+    if ir.F16Type.isinstance(t) or ir.BF16Type.isinstance(t):
+        return 2
+    if ir.F32Type.isinstance(t):
+        return 4
+    if ir.F64Type.isinstance(t):
+        return 8
+    raise NotImplementedError(f"unsupported element type {t}")
+
+
+def _num_elements(t: ir.Type) -> int:
+    """Number of scalars in a (static) shaped type; 1 for scalars."""
+    if not ir.ShapedType.isinstance(t):
+        return 1
+    t = ir.ShapedType(t)
+    assert t.has_static_shape, f"dynamic shape {t}"
+    return pymath.prod(t.shape)
+
+
+def _scalar_bytes(t: ir.Type) -> int:
+    """Bytes of a scalar or a vector."""
+    if ir.VectorType.isinstance(t):
+        return _num_elements(t) * _element_bytes(ir.VectorType(t).element_type)
+    return _element_bytes(t)
+
+
+def _shaped_bytes(t: ir.Type) -> Optional[int]:
+    """Bytes of a whole (statically shaped) memref or tensor."""
+    t = ir.ShapedType(t)
+    if not t.has_static_shape:
+        return None
+    return _num_elements(t) * _element_bytes(t.element_type)
+
+
+def _constant_int(value: ir.Value) -> Optional[int]:
+    owner = value.owner
+    if isinstance(owner, ir.OpView):
+        owner = owner.operation
+    if not isinstance(owner, ir.Operation) or owner.name != "arith.constant":
+        return None
+    return ir.IntegerAttr(owner.attributes["value"]).value
+
+
+def _constant_map_value(map_attr) -> Optional[int]:
+    m = ir.AffineMapAttr(map_attr).value
+    if len(m.results) != 1 or not ir.AffineConstantExpr.isinstance(m.results[0]):
+        return None
+    return ir.AffineConstantExpr(m.results[0]).value
+
+
+def _trip_count(lb, ub, step) -> Optional[int]:
+    if lb is None or ub is None or step is None:
+        return None
+    return max(0, -(-(ub - lb) // step))
+
+
+@dataclass
+class OpCounts:
+    """Static counts for a module (or a function).
+
+    `flops` counts floating point arithmetic (one per `arith` op and `math` op,
+    two per fma) per scalar element. `bytes_accessed` counts every load and
+    store (i.e., assumes no cache reuse at all); `compulsory_bytes` counts
+    every buffer touched exactly once (i.e., assumes perfect reuse). The two
+    bracket the actual traffic to memory.
+
+    Loops whose trip counts aren't static are counted as running once and are
+    listed in `dynamic`; then the counts are lower bounds.
+    """
+
+    flops: int = 0
+    bytes_accessed: int = 0
+    compulsory_bytes: int = 0
+    dynamic: list[str] = field(default_factory=list)
+
+    @property
+    def is_exact(self) -> bool:
+        return not self.dynamic
+
+    @property
+    def arithmetic_intensity(self) -> float:
+        """FLOPs per (compulsory) byte."""
+        return self.flops / self.compulsory_bytes if self.compulsory_bytes else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "flops": self.flops,
+            "bytes_accessed": self.bytes_accessed,
+            "compulsory_bytes": self.compulsory_bytes,
+            "arithmetic_intensity": self.arithmetic_intensity,
+            "is_exact": self.is_exact,
+        }
+
+
+class _ArithCounter(ArithDialectVisitor):
+    def _flop(self, op):
+        self.all_dialect_visitor.add_flops(op.result.type, 1)
+
+    visit_AddFOp = _flop
+    visit_SubFOp = _flop
+    visit_MulFOp = _flop
+    visit_DivFOp = _flop
+    visit_RemFOp = _flop
+    visit_NegFOp = _flop
+    visit_MaxFOp = _flop
+    visit_MinFOp = _flop
+
+
+class _MathCounter(MathDialectVisitor):
+    def visit(self, op):
+        # every math op (exp, sqrt, tanh, ...) counts as a single flop
+        n_flops = 2 if op.operation.name == "math.fma" else 1
+        self.all_dialect_visitor.add_flops(op.operation.results[0].type, n_flops)
+
+
+class _MemrefCounter(MemrefDialectVisitor):
+    def visit_LoadOp(self, op):
+        self.all_dialect_visitor.add_access(op.result.type, op.memref)
+
+    def visit_StoreOp(self, op):
+        self.all_dialect_visitor.add_access(op.value.type, op.memref)
+
+
+class _AffineCounter(AffineDialectVisitor):
+    def visit_AffineLoadOp(self, op):
+        self.all_dialect_visitor.add_access(op.result.type, op.memref)
+
+    def visit_AffineStoreOp(self, op):
+        self.all_dialect_visitor.add_access(op.value.type, op.memref)
+
+    def visit_AffineVectorLoadOp(self, op):
+        self.all_dialect_visitor.add_access(op.result.type, op.memref)
+
+    def visit_AffineVectorStoreOp(self, op):
+        self.all_dialect_visitor.add_access(op.value.type, op.memref)
+
+
+class _VectorCounter(VectorDialectVisitor):
+    def visit_FMAOp(self, op):
+        self.all_dialect_visitor.add_flops(op.result.type, 2)
+
+    def visit_LoadOp(self, op):
+        self.all_dialect_visitor.add_access(op.result.type, op.base)
+
+    def visit_StoreOp(self, op):
+        self.all_dialect_visitor.add_access(op.valueToStore.type, op.base)
+
+    def visit_TransferReadOp(self, op):
+        self.all_dialect_visitor.add_access(op.result.type, op.source)
+
+    def visit_TransferWriteOp(self, op):
+        self.all_dialect_visitor.add_access(op.vector.type, op.source)
+
+
+class _LinalgCounter(LinalgDialectVisitor):
+    def visit_GenericOp(self, op):
+        # every operand is accessed once per iteration; outputs that are read
+        # by the body (e.g., accumulators) are also written
+        domain = self.all_dialect_visitor.iteration_domain(op) or 1
+        body = op.regions[0].blocks[0]
+        n_inputs = len(op.inputs)
+        for i, operand in enumerate(list(op.inputs) + list(op.outputs)):
+            t = ir.ShapedType(operand.type)
+            n_accesses = 1
+            if i >= n_inputs and any(True for _ in body.arguments[i].uses):
+                n_accesses = 2
+            self.all_dialect_visitor.add_access(
+                t.element_type, operand, n_accesses * domain
+            )
+
+
+class OpCounter(AllDialectVisitor):
+    """Counts FLOPs and bytes (see `OpCounts`) by visiting every op, scaled by
+    the (static) trip counts of the enclosing `affine.for`/`scf.for`/
+    `scf.parallel` loops and iteration domains of the enclosing
+    `linalg.generic`s. Named linalg ops must be generalized first (see
+    `count_flops_and_bytes`)."""
+
+    def __init__(self):
+        super().__init__(
+            affine_visitor_ctor=_AffineCounter,
+            arith_visitor_ctor=_ArithCounter,
+            linalg_visitor_ctor=_LinalgCounter,
+            math_visitor_ctor=_MathCounter,
+            memref_visitor_ctor=_MemrefCounter,
+            vector_visitor_ctor=_VectorCounter,
+        )
+        self.counts = OpCounts()
+        self._multiplier = 1
+        self._buffers = {}
+
+    def add_flops(self, t: ir.Type, n_flops: int):
+        self.counts.flops += n_flops * _num_elements(t) * self._multiplier
+
+    def add_access(self, t: ir.Type, buffer: ir.Value, n_accesses=1):
+        self.counts.bytes_accessed += _scalar_bytes(t) * n_accesses * self._multiplier
+        if buffer not in self._buffers:
+            self._buffers[buffer] = _shaped_bytes(buffer.type)
+            if self._buffers[buffer] is None:
+                self.counts.dynamic.append(str(buffer.type))
+            else:
+                self.counts.compulsory_bytes += self._buffers[buffer]
+
+    def iteration_domain(self, op) -> Optional[int]:
+        """The product of the loop ranges of a `linalg.generic`, inferred from
+        the dims that appear as results of the indexing maps."""
+        ranges = {}
+        operands = list(op.inputs) + list(op.outputs)
+        for operand, map_attr in zip(operands, op.indexing_maps):
+            shape = ir.ShapedType(operand.type).shape
+            for dim_size, expr in zip(shape, ir.AffineMapAttr(map_attr).value.results):
+                if ir.AffineDimExpr.isinstance(expr):
+                    ranges.setdefault(ir.AffineDimExpr(expr).position, dim_size)
+        n_loops = len(op.iterator_types)
+        if len(ranges) != n_loops or any(r < 0 for r in ranges.values()):
+            return None
+        return pymath.prod(ranges.values())
+
+    def trip_count(self, op) -> Optional[int]:
+        """How many times the body of `op` runs; `None` if not static."""
+        if op.name == "linalg.generic":
+            return self.iteration_domain(op.opview)
+        if op.name == "affine.for":
+            return _trip_count(
+                _constant_map_value(op.attributes["lower_bound"]),
+                _constant_map_value(op.attributes["upper_bound"]),
+                ir.IntegerAttr(op.attributes["step"]).value,
+            )
+        if op.name == "scf.for":
+            return _trip_count(*[_constant_int(o) for o in op.operands[:3]])
+        if op.name == "scf.parallel":
+            n_dims = len(op.regions[0].blocks[0].arguments)
+            bounds = [_constant_int(o) for o in op.operands[: 3 * n_dims]]
+            trips = [
+                _trip_count(bounds[i], bounds[n_dims + i], bounds[2 * n_dims + i])
+                for i in range(n_dims)
+            ]
+            if any(t is None for t in trips):
+                return None
+            return pymath.prod(trips)
+        return 1
+
+    def visit(self, op: ir.Operation):
+        multiplier = self.trip_count(op)
+        if multiplier is None:
+            self.counts.dynamic.append(str(op.location))
+            multiplier = 1
+        outer_multiplier = self._multiplier
+        self._multiplier *= multiplier
+        super().visit(op)
+        self._multiplier = outer_multiplier
+
+
+def count_flops_and_bytes(
+    module: ir.Module, func_name: Optional[str] = None
+) -> OpCounts:
+    """Statically counts FLOPs and bytes in `module` (or only in `func_name`).
+
+    The module is cloned and named linalg ops are generalized first, such that
+    every linalg op is a `linalg.generic` with explicit indexing maps.
+    """
+    with module.context:
+        module = ir.Module.parse(str(module))
+    run_pipeline(
+        module,
+        Pipeline().FUNC().linalg_generalize_named_ops().CNUF().materialize(),
+        description="Generalizing linalg named ops",
+    )
+    counter = OpCounter()
+    if func_name is None:
+        counter.visit(module.operation)
+    else:
+        funcs = [
+            op
+            for op in module.body.operations
+            if op.operation.name == "func.func" and op.sym_name.value == func_name
+        ]
+        assert len(funcs) == 1, f"func {func_name} not found"
+        # visit the func as if it were the only op in the module
+        counter.visit(funcs[0].operation)
+    return counter.counts
+
+
+@dataclass
+class Machine:
+    """Peak FLOP rate (GFLOP/s) and memory bandwidth (GB/s) of a machine."""
+
+    peak_gflops: float
+    peak_bandwidth_gbs: float
+
+    @property
+    def ridge_point(self) -> float:
+        """The arithmetic intensity (FLOPs/byte) above which kernels are
+        compute-bound."""
+        return self.peak_gflops / self.peak_bandwidth_gbs
+
+    def attainable_gflops(self, arithmetic_intensity: float) -> float:
+        return min(self.peak_gflops, arithmetic_intensity * self.peak_bandwidth_gbs)
+
+
+@dataclass
+class RooflineReport:
+    counts: OpCounts
+    time_s: float
+    machine: Machine
+
+    @property
+    def achieved_gflops(self) -> float:
+        return self.counts.flops / self.time_s / 1e9
+
+    @property
+    def achieved_bandwidth_gbs(self) -> float:
+        return self.counts.compulsory_bytes / self.time_s / 1e9
+
+    @property
+    def arithmetic_intensity(self) -> float:
+        return self.counts.arithmetic_intensity
+
+    @property
+    def bound(self) -> str:
+        if self.arithmetic_intensity >= self.machine.ridge_point:
+            return "compute"
+        return "memory"
+
+    @property
+    def percent_of_peak(self) -> float:
+        return 100 * self.achieved_gflops / self.machine.peak_gflops
+
+    @property
+    def percent_of_roofline(self) -> float:
+        """Achieved GFLOP/s relative to what is attainable at this arithmetic
+        intensity."""
+        attainable = self.machine.attainable_gflops(self.arithmetic_intensity)
+        return 100 * self.achieved_gflops / attainable if attainable else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            **self.counts.as_dict(),
+            "time_s": self.time_s,
+            "achieved_gflops": self.achieved_gflops,
+            "achieved_bandwidth_gbs": self.achieved_bandwidth_gbs,
+            "bound": self.bound,
+            "percent_of_peak": self.percent_of_peak,
+            "percent_of_roofline": self.percent_of_roofline,
+            "peak_gflops": self.machine.peak_gflops,
+            "peak_bandwidth_gbs": self.machine.peak_bandwidth_gbs,
+        }
+
+    def __str__(self):
+        return (
+            f"{self.achieved_gflops:.2f} GFLOP/s ({self.percent_of_peak:.1f}% of peak, "
+            f"{self.percent_of_roofline:.1f}% of roofline), "
+            f"arithmetic intensity {self.arithmetic_intensity:.2f} FLOP/byte, "
+            f"{self.bound}-bound"
+            + ("" if self.counts.is_exact else " (counts are lower bounds)")
+        )
+
+
+def roofline(
+    counts: OpCounts,
+    time: Union[BenchmarkResult, float],
+    machine: Machine,
+) -> RooflineReport:
+    """Combines static counts with a measured time (a `BenchmarkResult`, whose
+    median is used, or seconds)."""
+    if isinstance(time, BenchmarkResult):
+        time = time.median / 1e9
+    return RooflineReport(counts, time, machine)
@@ -2,8 +2,9 @@ from typing import Optional, Union, Sequence
 
 from ._mlir.dialects._ods_common import get_op_results_or_values
 from .arith import ArithValue, constant
-from .utils import doublewrap, get_dense_int64_array_attr
+from .utils import caller_location, doublewrap, get_dense_int64_array_attr
 from ._mlir.dialects import scf
+from .vector import wrap_value
 from ._mlir.ir import InsertionPoint, IndexType, Operation, OpView, Value
 
 
@@ -48,10 +49,58 @@ def scf_endif():
     _current_if_op.pop()
 
 
+# which `iter_args` of the enclosing loops are carried, innermost last
+_carried_iter_args: list[list[bool]] = []
+
+
+def carry_iter_args(iter_args) -> list[Value]:
+    """Loops only carry the `iter_args` that are MLIR values; anything else
+    (e.g., a Python counter updated while tracing) passes through the (single
+    traced) iteration like in Python. Returns the values to carry."""
+    carried = [isinstance(a, Value) for a in iter_args]
+    _carried_iter_args.append(carried)
+    return [a for a, c in zip(iter_args, carried) if c]
+
+
+def _interleave(carried, values, passed_through):
+    values = iter(values)
+    return [
+        wrap_value(next(values)) if c else p for c, p in zip(carried, passed_through)
+    ]
+
+
+def inner_iter_args(for_op, iter_args) -> list:
+    """The `iter_args` as seen in the body of `for_op`."""
+    return _interleave(_carried_iter_args[-1], for_op.inner_iter_args, iter_args)
+
+
+def yield_iter_args(yield_op, for_op, yielded, names=None) -> list:
+    """Yields the carried values among `yielded` (with `yield_op`) and returns
+    the values of the `iter_args` after the loop. `names` (of the variables
+    holding `yielded`) are only used for error messages."""
+    carried = _carried_iter_args.pop() if yielded else []
+    if names is None:
+        names = [f"iter_args[{i}]" for i in range(len(yielded))]
+    carried_args = iter(for_op.inner_iter_args)
+    for y, c, name in zip(yielded, carried, names):
+        if not c:
+            continue
+        assert isinstance(
+            y, Value
+        ), f"loop-carried {name!r} reassigned to a non-MLIR value: {y}"
+        arg_type = next(carried_args).type
+        assert (
+            y.type == arg_type
+        ), f"loop-carried {name!r} changes type in the loop body, from {arg_type} to {y.type}"
+    yield_op([y for y, c in zip(yielded, carried) if c])
+    return _interleave(carried, for_op.results, yielded)
+
+
 _for_ip = None
 
 
-def scf_range(start, stop=None, step=1):
+def scf_range(start, stop=None, step=1, iter_args=None):
+    """See `affine_range` for the handling of `iter_args`."""
     global _for_ip
     if stop is None:
         stop = start
@@ -63,16 +112,28 @@ def scf_range(start, stop=None, step=1):
         stop = constant(stop, index=True)
     if isinstance(step, int):
         step = constant(step, index=True)
-    for_op = scf.ForOp(start, stop, step)
+    inits = carry_iter_args(iter_args) if iter_args else None
+    for_op = scf.ForOp(start, stop, step, inits, loc=caller_location())
     _for_ip = InsertionPoint(for_op.body)
     _for_ip.__enter__()
-    return [ArithValue(for_op.induction_variable)]
+    if not iter_args:
+        return [ArithValue(for_op.induction_variable)]
+    return [
+        (
+            ArithValue(for_op.induction_variable),
+            *inner_iter_args(for_op, iter_args),
+        )
+    ]
 
 
-def end_for():
-    scf.YieldOp([])
-    global _for_ip
-    _for_ip.__exit__(None, None, None)
+def end_for(*yielded, names=None):
+    for_op = InsertionPoint.current.block.owner
+    try:
+        return yield_iter_args(scf.YieldOp, for_op, yielded, names)
+    finally:
+        # also on a bad yield, such that the error isn't masked by unbalanced
+        # insertion points
+        _for_ip.__exit__(None, None, None)
 
 
 # // CHECK: _ODS_OPERAND_SEGMENTS = [-1,1,0,]
@@ -145,7 +206,7 @@ def par_range(starts, stops, steps=None):
         for i, a in enumerate(args):
             if isinstance(a, int):
                 args[i] = constant(a, index=True)
-    for_op = ParallelOp(starts, stops, steps)
+    for_op = ParallelOp(starts, stops, steps, loc=caller_location())
     _parfor_ip = InsertionPoint(for_op.body)
     _parfor_ip.__enter__()
     return [
@@ -0,0 +1,237 @@
+"""Codegen target (CPU name and features) for the LLVM JIT."""
+from __future__ import annotations
+
+import logging
+import os
+import platform
+import re
+import subprocess
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from ..utils import find_ops
+from ._mlir.ir import ArrayAttr, StringAttr
+
+logger = logging.getLogger(__name__)
+
+# /proc/cpuinfo flag -> LLVM feature name; only what matters for vectorization
+X86_FEATURES = {
+    "sse4_1": "sse4.1",
+    "sse4_2": "sse4.2",
+    "avx": "avx",
+    "avx2": "avx2",
+    "fma": "fma",
+    "f16c": "f16c",
+    "bmi1": "bmi",
+    "bmi2": "bmi2",
+    "avx512f": "avx512f",
+    "avx512cd": "avx512cd",
+    "avx512bw": "avx512bw",
+    "avx512dq": "avx512dq",
+    "avx512vl": "avx512vl",
+    "avx512_vnni": "avx512vnni",
+    "avx512_bf16": "avx512bf16",
+    "avx512_fp16": "avx512fp16",
+    "amx_tile": "amx-tile",
+    "amx_bf16": "amx-bf16",
+    "amx_int8": "amx-int8",
+}
+AARCH64_FEATURES = {
+    "asimd": "neon",
+    "fphp": "fullfp16",
+    "asimddp": "dotprod",
+    "i8mm": "i8mm",
+    "bf16": "bf16",
+    "sve": "sve",
+    "sve2": "sve2",
+}
+
+# `sysctl machdep.cpu` feature names (lowercased, "." -> "_") that differ from
+# the /proc/cpuinfo flags
+DARWIN_FLAG_ALIASES = {
+    "avx1_0": "avx",
+    "avx512vnni": "avx512_vnni",
+}
+
+# widest first
+SIMD_ISAS = [
+    ("avx512f", "avx512"),
+    ("avx2", "avx2"),
+    ("avx", "avx"),
+    ("sse4.2", "sse4.2"),
+    ("sve2", "sve2"),
+    ("sve", "sve"),
+    ("neon", "neon"),
+]
+
+
+@lru_cache(maxsize=None)
+def _proc_cpuinfo() -> Optional[dict[str, str]]:
+    """The fields of /proc/cpuinfo (those of the first processor, where they're
+    per processor), or `None` if there's no /proc/cpuinfo."""
+    cpuinfo = Path("/proc/cpuinfo")
+    if not cpuinfo.exists():
+        return None
+    fields = {}
+    for line in cpuinfo.read_text().splitlines():
+        key, _, value = line.partition(":")
+        fields.setdefault(key.strip(), value.strip())
+    return fields
+
+
+@lru_cache(maxsize=None)
+def _host_cpu_flags() -> frozenset[str]:
+    cpuinfo = _proc_cpuinfo()
+    if cpuinfo is not None:
+        # "flags" on x86, "Features" on aarch64
+        return frozenset(cpuinfo.get("flags", cpuinfo.get("Features", "")).split())
+    if platform.system() == "Darwin":
+        if platform.machine() == "arm64":
+            return frozenset({"asimd", "fphp", "asimddp"})
+        try:
+            out = subprocess.run(
+                ["sysctl", "-n", "machdep.cpu.features", "machdep.cpu.leaf7_features"],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return frozenset()
+        flags = (f.lower().replace(".", "_") for f in out.split())
+        return frozenset(DARWIN_FLAG_ALIASES.get(f, f) for f in flags)
+    return frozenset()
+
+
+def host_cpu_features() -> list[str]:
+    flags = _host_cpu_flags()
+    if platform.machine() in {"arm64", "aarch64"}:
+        feature_map = AARCH64_FEATURES
+    else:
+        feature_map = X86_FEATURES
+    return sorted(f"+{feature_map[f]}" for f in flags if f in feature_map)
+
+
+@lru_cache(maxsize=None)
+def host_cpu_model() -> str:
+    """A human readable name of the host CPU (e.g., `Intel(R) Xeon(R) ...`),
+    for reports; see `host_cpu_name` for the name LLVM knows it by."""
+    cpuinfo = _proc_cpuinfo()
+    if cpuinfo is not None and "model name" in cpuinfo:
+        return cpuinfo["model name"]
+    if platform.system() == "Darwin":
+        try:
+            return subprocess.run(
+                ["sysctl", "-n", "machdep.cpu.brand_string"],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            pass
+    return platform.processor() or platform.machine()
+
+
+@lru_cache(maxsize=None)
+def host_cpu_name() -> Optional[str]:
+    """The LLVM name of the host CPU (e.g., `skylake-avx512`), as resolved by
+    the host C compiler driver (`$CC`, default `cc`) for `-march=native` (or
+    `-mcpu=native` on aarch64), or `None` if it can't be determined."""
+    native = (
+        "-mcpu=native"
+        if platform.machine() in {"arm64", "aarch64"}
+        else "-march=native"
+    )
+    try:
+        out = subprocess.run(
+            [os.environ.get("CC", "cc"), "-###", native, "-x", "c", "-c", os.devnull],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stderr
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    # clang: "-target-cpu" "skylake-avx512"; gcc (x86): -march=skylake-avx512
+    m = re.search(r'"-target-cpu" "([\w.-]+)"', out) or re.search(
+        r"-march=([\w.-]+)", out.replace("-march=native", "")
+    )
+    if m is None or m.group(1) in {"native", "generic"}:
+        return None
+    return m.group(1)
+
+
+@dataclass
+class Target:
+    """The CPU and features to generate code for.
+
+    `cpu=None` means the host CPU, as detected by the `ExecutionEngine` itself
+    (LLVM's `sys::getHostCPUName`); `Target.host()` resolves it up front (see
+    `host_cpu_name`). Features are LLVM feature strings, e.g.,
+    `["+avx2", "+fma"]`. Both are attached to every function (as `target-cpu`
+    and `target-features` passthrough attributes), such that they take
+    precedence over the JIT's default target machine.
+    """
+
+    cpu: Optional[str] = None
+    features: list[str] = field(default_factory=list)
+
+    @classmethod
+    def host(cls, cpu: Optional[str] = None, extra_features=None) -> Target:
+        if cpu is None:
+            cpu = host_cpu_name()
+        features = host_cpu_features()
+        if extra_features is not None:
+            features = sorted(set(features) | set(extra_features))
+        return cls(cpu=cpu, features=features)
+
+    @property
+    def simd_isa(self) -> Optional[str]:
+        """The widest SIMD ISA enabled by the features."""
+        enabled = {f[1:] for f in self.features if f.startswith("+")}
+        return next((isa for feat, isa in SIMD_ISAS if feat in enabled), None)
+
+    def report(self) -> dict:
+        return {
+            "cpu": self.cpu or "host",
+            "features": list(self.features),
+            "simd_isa": self.simd_isa,
+        }
+
+    def __str__(self):
+        return f"{self.cpu or 'host'}:{','.join(self.features)}"
+
+    def apply(self, module):
+        """Adds `target-cpu`/`target-features` to the passthrough attributes of
+        every `llvm.func` defined in the (lowered) `module`."""
+        passthrough = []
+        if self.cpu is not None:
+            passthrough.append(["target-cpu", self.cpu])
+        if self.features:
+            passthrough.append(["target-features", ",".join(self.features)])
+        if not passthrough:
+            return module
+
+        def cb(op):
+            return op.name == "llvm.func" and len(op.regions[0].blocks) > 0
+
+        with module.context:
+            new_attrs = [
+                ArrayAttr.get([StringAttr.get(k), StringAttr.get(v)])
+                for k, v in passthrough
+            ]
+            for op in find_ops(module, cb):
+                attrs = []
+                if "passthrough" in op.attributes:
+                    # drop previous target-cpu/target-features
+                    attrs = [
+                        a
+                        for a in ArrayAttr(op.attributes["passthrough"])
+                        if not (
+                            ArrayAttr.isinstance(a)
+                            and StringAttr(ArrayAttr(a)[0]).value
+                            in {"target-cpu", "target-features"}
+                        )
+                    ]
+                op.attributes["passthrough"] = ArrayAttr.get(attrs + new_attrs)
+        return module
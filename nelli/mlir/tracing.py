@@ -0,0 +1,146 @@
+"""Opt-in timeline tracing across tracing (`mlir_func`), lowering, JIT and
+execution, written as Chrome trace JSON (viewable in `chrome://tracing` or
+Perfetto), e.g.,
+
+    with trace("nelli.trace.json"):
+        ...
+
+or `NELLI_TRACE=nelli.trace.json python ...` for a whole process.
+
+Pass pipelines get a single span by default; with `pass_spans=True` (or
+`NELLI_TRACE_PASSES=1`), `run_pipeline` runs passes one at a time (the Python
+bindings have no pass instrumentation) such that each gets its own span.
+
+Spans are "complete" events, per thread; nesting follows from containment.
+When tracing is disabled, `span` returns a shared no-op context manager, i.e.,
+instrumented code pays a global lookup and a call.
+"""
+from __future__ import annotations
+
+import atexit
+import contextlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+TRACE_ENV_VAR = "NELLI_TRACE"
+TRACE_PASSES_ENV_VAR = "NELLI_TRACE_PASSES"
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start_ns")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end_ns = time.perf_counter_ns()
+        self.tracer.add_event(self.name, self.cat, self.start_ns, end_ns, self.args)
+        return False
+
+
+class Tracer:
+    def __init__(self, pass_spans=False):
+        self.pass_spans = pass_spans
+        self.pid = os.getpid()
+        self.events: list[dict] = []
+        self._t0_ns = time.perf_counter_ns()
+
+    def span(self, name: str, cat: str = "nelli", **args) -> _Span:
+        return _Span(self, name, cat, args)
+
+    def add_event(self, name, cat, start_ns, end_ns, args=None):
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            # microseconds
+            "ts": (start_ns - self._t0_ns) / 1e3,
+            "dur": (end_ns - start_ns) / 1e3,
+            "pid": self.pid,
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = {k: str(v) for k, v in args.items()}
+        # list.append is atomic, so spans can end on any thread
+        self.events.append(event)
+
+    def to_chrome_trace(self) -> dict:
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        metadata = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self.pid,
+                "tid": tid,
+                "args": {"name": thread_names.get(tid, str(tid))},
+            }
+            for tid in sorted({e["tid"] for e in self.events})
+        ]
+        return {"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}
+
+    def save(self, path: Union[str, Path]):
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def pass_spans_enabled() -> bool:
+    return _tracer is not None and _tracer.pass_spans
+
+
+def span(name: str, cat: str = "nelli", **args):
+    """A context manager that records a span (if tracing is enabled)."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, cat, **args)
+
+
+def start_tracing(pass_spans=False) -> Tracer:
+    global _tracer
+    assert _tracer is None, f"already tracing"
+    _tracer = Tracer(pass_spans=pass_spans)
+    return _tracer
+
+
+def stop_tracing(path: Optional[Union[str, Path]] = None) -> Tracer:
+    global _tracer
+    assert _tracer is not None, f"not tracing"
+    tracer, _tracer = _tracer, None
+    if path is not None:
+        tracer.save(path)
+    return tracer
+
+
+@contextlib.contextmanager
+def trace(path: Optional[Union[str, Path]] = None, pass_spans=False):
+    """Traces everything in the context and writes the trace to `path` (if
+    provided) on exit."""
+    tracer = start_tracing(pass_spans=pass_spans)
+    try:
+        yield tracer
+    finally:
+        stop_tracing(path)
+
+
+if os.environ.get(TRACE_ENV_VAR):
+    start_tracing(pass_spans=bool(os.environ.get(TRACE_PASSES_ENV_VAR)))
+    atexit.register(lambda: enabled() and stop_tracing(os.environ[TRACE_ENV_VAR]))
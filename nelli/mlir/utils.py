@@ -23,6 +23,8 @@ from ._mlir.ir import (
     Context,
 )
 from ._mlir.passmanager import PassManager
+from . import tracing
+from .pass_stats import PipelineReport, run_passes
 
 
 class NelliMlirCompilerError(Exception):
@@ -34,6 +36,14 @@ class NelliMlirCompilerError(Exception):
         return self.value
 
 
+def caller_location(depth=1) -> ir.Location:
+    """The `Location` of the Python source line `depth` frames above the
+    caller, e.g., the line of a `for` loop in a function decorated with
+    `mlir_func` (rewritten functions keep their original file and lines)."""
+    frame = sys._getframe(depth + 1)
+    return ir.Location.file(frame.f_code.co_filename, frame.f_lineno, 0)
+
+
 def get_module_name_for_debug_dump(module):
     if not "nelli.debug_module_name" in module.operation.attributes:
         return "UnnammedModule"
@@ -46,8 +56,15 @@ def run_pipeline(
     description: Optional[str] = None,
     enable_ir_printing=False,
     print_pipeline=False,
+    pass_stats: Optional[PipelineReport] = None,
 ):
-    """Runs `pipeline` on `module`, with a nice repro report if it fails."""
+    """Runs `pipeline` on `module`, with a nice repro report if it fails.
+
+    If a `pass_stats` report is provided, the passes are run one at a time and
+    it's filled in (per-pass wall time, op counts before and after and growth
+    of the peak memory use). Passes are also run one at a time when tracing
+    with `pass_spans` (see `tracing`), such that each gets its own span.
+    """
     module_name = get_module_name_for_debug_dump(module)
     try:
         original_stderr = sys.stderr
@@ -55,6 +72,9 @@ def run_pipeline(
         # Lower module in place to make it ready for compiler backends.
         with ExitStack() as stack:
             stack.enter_context(module.context)
+            stack.enter_context(
+                tracing.span("run_pipeline", "compile", description=description)
+            )
             asm_for_error_report = module.operation.get_asm(
                 large_elements_limit=10,
                 enable_debug_info=True,
@@ -66,7 +86,10 @@ def run_pipeline(
                 stack.enter_context(disable_multithreading())
                 pm.enable_ir_printing()
 
-            pm.run(module.operation)
+            if pass_stats is not None or tracing.pass_spans_enabled():
+                run_passes(module, pipeline, pass_stats, enable_ir_printing)
+            else:
+                pm.run(module.operation)
     except Exception as e:
         print(e, file=sys.stderr)
         filename = os.path.join(tempfile.gettempdir(), module_name + ".mlir")
@@ -0,0 +1,330 @@
+from typing import Optional, Sequence, Tuple, Union
+
+from .annot import Annot
+from .arith import ArithValue, constant, _is_float_type
+from ._mlir.dialects import arith
+from ._mlir.dialects import vector
+from ._mlir.dialects._ods_common import get_op_result_or_value
+from ._mlir.ir import (
+    AffineMap,
+    AffineMapAttr,
+    ArrayAttr,
+    Attribute,
+    BoolAttr,
+    MemRefType,
+    Type,
+    Value,
+    VectorType,
+)
+
+# vector.reduction combining kinds
+REDUCTION_KINDS = {
+    "add",
+    "mul",
+    "minf",
+    "maxf",
+    "minsi",
+    "maxsi",
+    "minui",
+    "maxui",
+    "and",
+    "or",
+    "xor",
+}
+
+
+class ReductionOp(vector.ReductionOp):
+    def __init__(self, kind: str, vector_, acc=None, *, loc=None, ip=None):
+        assert kind in REDUCTION_KINDS, f"unknown reduction kind {kind}"
+        vector_ = get_op_result_or_value(vector_)
+        super(vector.ReductionOp, self).__init__(
+            self.build_generic(
+                results=[VectorType(vector_.type).element_type],
+                operands=[vector_] + ([acc] if acc is not None else []),
+                attributes={"kind": Attribute.parse(f"#vector.kind<{kind}>")},
+                loc=loc,
+                ip=ip,
+            )
+        )
+
+
+class FMAOp(vector.FMAOp):
+    def __init__(self, lhs, rhs, acc, *, loc=None, ip=None):
+        lhs = get_op_result_or_value(lhs)
+        super(vector.FMAOp, self).__init__(
+            self.build_generic(
+                results=[lhs.type], operands=[lhs, rhs, acc], loc=loc, ip=ip
+            )
+        )
+
+
+def _in_bounds_attr(in_bounds: Sequence[bool]) -> ArrayAttr:
+    return ArrayAttr.get([BoolAttr.get(b) for b in in_bounds])
+
+
+class TransferReadOp(vector.TransferReadOp):
+    def __init__(
+        self,
+        vector_type: VectorType,
+        source,
+        indices,
+        padding,
+        permutation_map: Optional[AffineMap] = None,
+        in_bounds: Optional[Sequence[bool]] = None,
+        *,
+        loc=None,
+        ip=None,
+    ):
+        source = get_op_result_or_value(source)
+        if permutation_map is None:
+            permutation_map = AffineMap.get_minor_identity(
+                MemRefType(source.type).rank, vector_type.rank
+            )
+        attributes = {"permutation_map": AffineMapAttr.get(permutation_map)}
+        if in_bounds is not None:
+            attributes["in_bounds"] = _in_bounds_attr(in_bounds)
+        super(vector.TransferReadOp, self).__init__(
+            self.build_generic(
+                results=[vector_type],
+                # source, indices, padding, mask
+                operands=[source, list(indices), padding, None],
+                attributes=attributes,
+                loc=loc,
+                ip=ip,
+            )
+        )
+
+
+class TransferWriteOp(vector.TransferWriteOp):
+    def __init__(
+        self,
+        vector_,
+        source,
+        indices,
+        permutation_map: Optional[AffineMap] = None,
+        in_bounds: Optional[Sequence[bool]] = None,
+        *,
+        loc=None,
+        ip=None,
+    ):
+        vector_ = get_op_result_or_value(vector_)
+        source = get_op_result_or_value(source)
+        if permutation_map is None:
+            permutation_map = AffineMap.get_minor_identity(
+                MemRefType(source.type).rank, VectorType(vector_.type).rank
+            )
+        attributes = {"permutation_map": AffineMapAttr.get(permutation_map)}
+        if in_bounds is not None:
+            attributes["in_bounds"] = _in_bounds_attr(in_bounds)
+        super(vector.TransferWriteOp, self).__init__(
+            self.build_generic(
+                # writes to memrefs have no result
+                results=[],
+                # vector, source, indices, mask
+                operands=[vector_, source, list(indices), None],
+                attributes=attributes,
+                loc=loc,
+                ip=ip,
+            )
+        )
+
+
+def _index(i):
+    return constant(i, index=True) if isinstance(i, int) else i
+
+
+def _indices(indices):
+    if not isinstance(indices, (tuple, list)):
+        indices = [indices]
+    return [_index(i) for i in indices]
+
+
+class VectorValue(ArithValue):
+    """A (SIMD) vector value; arithmetic is elementwise and scalar operands
+    (Python numbers or scalar values) are broadcast.
+
+    Since this is a subclass of `ArithValue`, mixed scalar-vector expressions
+    (e.g., `a * v`) dispatch to the vector implementation.
+    """
+
+    def __class_getitem__(
+        cls, dim_sizes_el_type: Tuple[Union[list[int], tuple[int, ...]], Type]
+    ):
+        assert (
+            len(dim_sizes_el_type) == 2
+        ), f"wrong dim_sizes_el_type: {dim_sizes_el_type}"
+        dim_sizes, el_type = dim_sizes_el_type
+        assert all(
+            isinstance(t, int) for t in dim_sizes
+        ), f"wrong type T args for vector: {dim_sizes}"
+        assert isinstance(el_type, Type), f"wrong type T args for vector: {el_type}"
+        return Annot(cls, VectorType.get(list(dim_sizes), el_type))
+
+    @property
+    def vector_type(self) -> VectorType:
+        return VectorType(self.type)
+
+    @property
+    def shape(self) -> list[int]:
+        return self.vector_type.shape
+
+    @property
+    def element_type(self) -> Type:
+        return self.vector_type.element_type
+
+    def _coerce(self, other):
+        if isinstance(other, (float, int)):
+            other = constant(other, type=self.element_type)
+        if not VectorType.isinstance(get_op_result_or_value(other).type):
+            other = broadcast(other, self.vector_type)
+        return other
+
+    def _binary(self, float_op, int_op, lhs, rhs):
+        op = float_op if _is_float_type(self.element_type) else int_op
+        return VectorValue(op(lhs, rhs).result)
+
+    def __add__(self, other):
+        return self._binary(arith.AddFOp, arith.AddIOp, self, self._coerce(other))
+
+    def __radd__(self, lhs):
+        return self._binary(arith.AddFOp, arith.AddIOp, self._coerce(lhs), self)
+
+    def __sub__(self, other):
+        return self._binary(arith.SubFOp, arith.SubIOp, self, self._coerce(other))
+
+    def __rsub__(self, lhs):
+        return self._binary(arith.SubFOp, arith.SubIOp, self._coerce(lhs), self)
+
+    def __mul__(self, other):
+        return self._binary(arith.MulFOp, arith.MulIOp, self, self._coerce(other))
+
+    def __rmul__(self, lhs):
+        return self._binary(arith.MulFOp, arith.MulIOp, self._coerce(lhs), self)
+
+    def __truediv__(self, other):
+        return self._binary(arith.DivFOp, arith.DivSIOp, self, self._coerce(other))
+
+    def __rtruediv__(self, lhs):
+        return self._binary(arith.DivFOp, arith.DivSIOp, self._coerce(lhs), self)
+
+    def __neg__(self):
+        if _is_float_type(self.element_type):
+            return VectorValue(arith.NegFOp(self).result)
+        return self._coerce(0) - self
+
+    def fma(self, rhs, acc) -> "VectorValue":
+        """`self * rhs + acc`, fused."""
+        return fma(self, rhs, acc)
+
+    def reduce(self, kind="add", acc=None) -> ArithValue:
+        return reduction(self, kind, acc)
+
+    def store(self, memref, indices):
+        store(self, memref, indices)
+
+    def transfer_write(self, memref, indices, **kwargs):
+        transfer_write(self, memref, indices, **kwargs)
+
+
+def wrap_value(value: Value) -> ArithValue:
+    """Wraps `value` as a `VectorValue` if it's a vector and as an `ArithValue`
+    otherwise."""
+    if VectorType.isinstance(value.type):
+        return VectorValue(value)
+    return ArithValue(value)
+
+
+def _vector_type(shape, el_type) -> VectorType:
+    if isinstance(shape, VectorType):
+        return shape
+    return VectorType.get(list(shape), el_type)
+
+
+def load(memref, indices, shape) -> VectorValue:
+    """Loads a vector of `shape` from (the innermost dims of) `memref`, starting
+    at `indices`. The slice must be contiguous and in bounds."""
+    vector_type = _vector_type(shape, MemRefType(memref.type).element_type)
+    return VectorValue(vector.LoadOp(vector_type, memref, _indices(indices)).result)
+
+
+def store(vector_, memref, indices):
+    vector.StoreOp(vector_, memref, _indices(indices))
+
+
+def transfer_read(
+    memref,
+    indices,
+    shape,
+    padding=None,
+    permutation_map: Optional[AffineMap] = None,
+    in_bounds: Optional[Sequence[bool]] = None,
+) -> VectorValue:
+    """Reads a vector of `shape` from `memref` starting at `indices`. Unlike
+    `load`, the slice can be strided (through `permutation_map`, e.g., a
+    transposed read) and can run out of bounds; out of bounds elements are
+    `padding` (zero by default). Dims declared `in_bounds` aren't masked."""
+    el_type = MemRefType(memref.type).element_type
+    vector_type = _vector_type(shape, el_type)
+    if padding is None:
+        padding = 0.0 if _is_float_type(el_type) else 0
+    if isinstance(padding, (float, int)):
+        padding = constant(padding, type=el_type)
+    return VectorValue(
+        TransferReadOp(
+            vector_type,
+            memref,
+            _indices(indices),
+            padding,
+            permutation_map=permutation_map,
+            in_bounds=in_bounds,
+        ).result
+    )
+
+
+def transfer_write(
+    vector_,
+    memref,
+    indices,
+    permutation_map: Optional[AffineMap] = None,
+    in_bounds: Optional[Sequence[bool]] = None,
+):
+    """Writes `vector_` to `memref` starting at `indices`; the counterpart of
+    `transfer_read` (out of bounds elements aren't written)."""
+    TransferWriteOp(
+        vector_,
+        memref,
+        _indices(indices),
+        permutation_map=permutation_map,
+        in_bounds=in_bounds,
+    )
+
+
+def broadcast(value, shape, el_type: Optional[Type] = None) -> VectorValue:
+    """Broadcasts a scalar (or a lower rank vector) to a vector of `shape` (or
+    a `VectorType`)."""
+    if isinstance(value, (float, int)):
+        assert el_type is not None or isinstance(
+            shape, VectorType
+        ), f"el_type is needed to broadcast Python numbers"
+        if el_type is None:
+            el_type = VectorType(shape).element_type
+        value = constant(value, type=el_type)
+    value = get_op_result_or_value(value)
+    if el_type is None:
+        el_type = (
+            VectorType(value.type).element_type
+            if VectorType.isinstance(value.type)
+            else value.type
+        )
+    return VectorValue(vector.BroadcastOp(_vector_type(shape, el_type), value).result)
+
+
+def reduction(vector_, kind="add", acc=None) -> ArithValue:
+    """Reduces `vector_` to a scalar with the combining `kind` (see
+    `REDUCTION_KINDS`), starting from `acc` (if provided)."""
+    return ArithValue(ReductionOp(kind, vector_, acc).result)
+
+
+def fma(lhs, rhs, acc) -> VectorValue:
+    """`lhs * rhs + acc`, elementwise and fused."""
+    return VectorValue(FMAOp(lhs, rhs, acc).result)
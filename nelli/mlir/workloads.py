@@ -0,0 +1,292 @@
+"""Vectorized generators of (reproducible) dense and sparse benchmark inputs."""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+PATTERNS = ("uniform", "banded", "block", "power_law")
+FORMATS = ("dense", "coo", "csr")
+
+
+@dataclass
+class SparseCOO:
+    shape: tuple[int, ...]
+    # (ndim, nnz), lexicographically sorted
+    coords: np.ndarray
+    values: np.ndarray
+
+    @property
+    def nnz(self) -> int:
+        return len(self.values)
+
+    def to_dense(self) -> np.ndarray:
+        dense = np.zeros(self.shape, dtype=self.values.dtype)
+        dense[tuple(self.coords)] = self.values
+        return dense
+
+    def to_scipy(self):
+        from scipy.sparse import coo_array
+
+        assert len(self.shape) == 2, f"scipy only supports matrices"
+        return coo_array((self.values, tuple(self.coords)), shape=self.shape)
+
+
+@dataclass
+class SparseCSR:
+    shape: tuple[int, int]
+    indptr: np.ndarray
+    indices: np.ndarray
+    values: np.ndarray
+
+    @property
+    def nnz(self) -> int:
+        return len(self.values)
+
+    def to_dense(self) -> np.ndarray:
+        dense = np.zeros(self.shape, dtype=self.values.dtype)
+        rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+        dense[rows, self.indices] = self.values
+        return dense
+
+    def to_scipy(self):
+        from scipy.sparse import csr_array
+
+        return csr_array((self.values, self.indices, self.indptr), shape=self.shape)
+
+
+def _resolve_nnz(shape, nnz, density) -> int:
+    total = math.prod(shape)
+    assert (nnz is None) != (density is None), f"pass exactly one of nnz or density"
+    if nnz is None:
+        assert 0 <= density <= 1, f"{density=} not in [0, 1]"
+        nnz = int(round(density * total))
+    assert 0 <= nnz <= total, f"{nnz=} doesn't fit in {shape=}"
+    return nnz
+
+
+def _sample_distinct(rng, population: int, k: int) -> np.ndarray:
+    """`k` distinct random ints in `[0, population)`, sorted. Unlike `choice`
+    without replacement, the population isn't materialized: this draws with
+    replacement and tops up whatever was lost to duplicates (for `k` over half
+    the population, it draws the complement instead)."""
+    if 2 * k > population:
+        keep = np.ones(population, dtype=bool)
+        keep[_sample_distinct(rng, population, population - k)] = False
+        return np.flatnonzero(keep)
+    idx = np.empty(0, dtype=np.int64)
+    while len(idx) < k:
+        drawn = rng.integers(0, population, size=k - len(idx))
+        idx = np.unique(np.concatenate([idx, drawn]))
+    return idx
+
+
+def _uniform(rng, shape, nnz) -> np.ndarray:
+    return _sample_distinct(rng, math.prod(shape), nnz)
+
+
+def _banded(rng, shape, nnz, bandwidth) -> np.ndarray:
+    m, n = shape
+    rows = np.arange(m)
+    starts = np.clip(rows - bandwidth, 0, n)
+    stops = np.clip(rows + bandwidth + 1, 0, n)
+    row_sizes = stops - starts
+    band_cells = np.concatenate([[0], np.cumsum(row_sizes)])
+    assert nnz <= band_cells[-1], f"{nnz=} doesn't fit in the band ({bandwidth=})"
+    band_idx = _sample_distinct(rng, band_cells[-1], nnz)
+    row = np.searchsorted(band_cells, band_idx, side="right") - 1
+    col = starts[row] + band_idx - band_cells[row]
+    return row * n + col
+
+
+def _block(rng, shape, nnz, block_shape) -> np.ndarray:
+    # whole (dense) blocks, so there are at least nnz nonzeros: nnz rounded up
+    # to whole blocks, plus blocks making up for those clipped at the edges
+    m, n = shape
+    bm, bn = block_shape
+    grid = (-(-m // bm), -(-n // bn))
+    n_blocks = min(-(-nnz // (bm * bn)), math.prod(grid))
+    while True:
+        blocks = _sample_distinct(rng, math.prod(grid), n_blocks)
+        block_rows, block_cols = np.divmod(blocks, grid[1])
+        sizes = np.minimum(m - block_rows * bm, bm) * np.minimum(
+            n - block_cols * bn, bn
+        )
+        missing = nnz - sizes.sum()
+        if missing <= 0:
+            break
+        n_blocks += -(-missing // (bm * bn))
+    i, j = np.meshgrid(np.arange(bm), np.arange(bn), indexing="ij")
+    rows = (block_rows[:, None] * bm + i.ravel()[None, :]).ravel()
+    cols = (block_cols[:, None] * bn + j.ravel()[None, :]).ravel()
+    in_bounds = (rows < m) & (cols < n)
+    return rows[in_bounds] * n + cols[in_bounds]
+
+
+def _power_law(rng, shape, nnz, alpha) -> np.ndarray:
+    # rows (in random order) have nonzeros in proportion to rank ** -alpha,
+    # capped at the number of columns
+    m, n = shape
+    weights = np.arange(1, m + 1, dtype=np.float64) ** -alpha
+    weights = weights[rng.permutation(m)]
+    degrees = np.zeros(m, dtype=np.int64)
+    remaining = nnz
+    while remaining > 0:
+        free = n - degrees
+        p = np.where(free > 0, weights, 0)
+        degrees += np.minimum(rng.multinomial(remaining, p / p.sum()), free)
+        remaining = nnz - degrees.sum()
+    # rows that are more than half full are built from the columns they don't
+    # have, such that drawing distinct columns always converges quickly
+    dense_rows = np.flatnonzero(2 * degrees > n)
+    idx = _distinct_cols(rng, np.where(2 * degrees > n, 0, degrees), n)
+    if len(dense_rows):
+        mask = np.ones((len(dense_rows), n), dtype=bool)
+        excluded = np.zeros(m, dtype=np.int64)
+        excluded[dense_rows] = n - degrees[dense_rows]
+        excluded_rows, excluded_cols = np.divmod(_distinct_cols(rng, excluded, n), n)
+        mask[np.searchsorted(dense_rows, excluded_rows), excluded_cols] = False
+        i, j = np.nonzero(mask)
+        idx = np.concatenate([idx, dense_rows[i] * n + j])
+    return idx
+
+
+def _distinct_cols(rng, counts, n) -> np.ndarray:
+    """Linear indices of `counts[i]` distinct random columns in every row `i`;
+    draws with replacement and tops up whatever was lost to duplicates."""
+    idx = np.empty(0, dtype=np.int64)
+    missing = counts
+    while missing.sum() > 0:
+        rows = np.repeat(np.arange(len(counts)), missing)
+        cols = rng.integers(0, n, size=len(rows))
+        idx = np.sort(np.concatenate([idx, rows * n + cols]))
+        idx = idx[np.concatenate([[True], idx[1:] != idx[:-1]])]
+        missing = counts - np.bincount(idx // n, minlength=len(counts))
+    return idx
+
+
+def random_sparse_indices(
+    shape: Sequence[int],
+    nnz: Optional[int] = None,
+    density: Optional[float] = None,
+    pattern: str = "uniform",
+    seed: Union[int, np.random.Generator, None] = None,
+    bandwidth: int = 8,
+    block_shape: tuple[int, int] = (4, 4),
+    alpha: float = 1.0,
+) -> np.ndarray:
+    """Returns the sorted, distinct, (row-major) linear indices of the nonzeros
+    of a `shape` tensor with `nnz` nonzeros (or `density * size`).
+
+    Patterns (other than "uniform") are for matrices:
+
+    * "banded": nonzeros within `bandwidth` of the diagonal;
+    * "block": dense `block_shape` blocks at random block positions;
+    * "power_law": the number of nonzeros per row follows a power law with
+      exponent `alpha` (rows are shuffled).
+    """
+    shape = tuple(shape)
+    assert pattern in PATTERNS, f"unknown {pattern=}; expected one of {PATTERNS}"
+    if pattern != "uniform":
+        assert len(shape) == 2, f"{pattern=} needs a matrix; got {shape=}"
+    rng = np.random.default_rng(seed)
+    nnz = _resolve_nnz(shape, nnz, density)
+    if pattern == "uniform":
+        idx = _uniform(rng, shape, nnz)
+    elif pattern == "banded":
+        idx = _banded(rng, shape, nnz, bandwidth)
+    elif pattern == "block":
+        idx = _block(rng, shape, nnz, block_shape)
+    else:
+        idx = _power_law(rng, shape, nnz, alpha)
+    return np.sort(idx.astype(np.int64))
+
+
+def _zeros(path, shape, dtype, name=None) -> np.ndarray:
+    if path is None:
+        return np.zeros(shape, dtype=dtype)
+    path = Path(path)
+    if name is not None:
+        path = path.with_name(f"{path.name}.{name}.npy")
+    elif path.suffix != ".npy":
+        path = path.with_name(f"{path.name}.npy")
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+def random_sparse(
+    shape: Sequence[int],
+    nnz: Optional[int] = None,
+    density: Optional[float] = None,
+    pattern: str = "uniform",
+    format: str = "dense",
+    seed: Union[int, np.random.Generator, None] = None,
+    dtype=np.float64,
+    low: float = 1.0,
+    high: float = 100.0,
+    memmap_path: Optional[Union[str, Path]] = None,
+    **pattern_kwargs,
+) -> Union[np.ndarray, SparseCOO, SparseCSR]:
+    """Generates a random sparse tensor (see `random_sparse_indices` for the
+    sparsity patterns) with values drawn uniformly from `[low, high)`.
+
+    `format` is one of "dense" (an `np.ndarray`), "coo" (`SparseCOO`) or "csr"
+    (`SparseCSR`, matrices only). If `memmap_path` is provided, the arrays are
+    memory-mapped `.npy` files (`<memmap_path>.npy` if it doesn't already end
+    in `.npy` or, for "coo"/"csr", one per array, named
+    `<memmap_path>.<array>.npy`), such that inputs larger than memory can be
+    built. The same `seed` always produces the same tensor.
+    """
+    shape = tuple(shape)
+    assert format in FORMATS, f"unknown {format=}; expected one of {FORMATS}"
+    rng = np.random.default_rng(seed)
+    idx = random_sparse_indices(
+        shape, nnz, density, pattern, seed=rng, **pattern_kwargs
+    )
+    values = rng.uniform(low, high, size=len(idx)).astype(dtype)
+
+    if format == "dense":
+        dense = _zeros(memmap_path, shape, dtype)
+        dense.reshape(-1)[idx] = values
+        return dense
+
+    if format == "coo":
+        coords = _zeros(memmap_path, (len(shape), len(idx)), np.int64, "coords")
+        coords[...] = np.unravel_index(idx, shape)
+        coo_values = _zeros(memmap_path, (len(idx),), dtype, "values")
+        coo_values[...] = values
+        return SparseCOO(shape, coords, coo_values)
+
+    assert len(shape) == 2, f"csr needs a matrix; got {shape=}"
+    rows, cols = np.divmod(idx, shape[1])
+    indptr = _zeros(memmap_path, (shape[0] + 1,), np.int64, "indptr")
+    indptr[0] = 0
+    np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+    indices = _zeros(memmap_path, (len(idx),), np.int64, "indices")
+    indices[...] = cols
+    csr_values = _zeros(memmap_path, (len(idx),), dtype, "values")
+    csr_values[...] = values
+    return SparseCSR(shape, indptr, indices, csr_values)
+
+
+def random_dense(
+    shape: Sequence[int],
+    seed: Union[int, np.random.Generator, None] = None,
+    dtype=np.float64,
+    low: float = 0.0,
+    high: float = 1.0,
+    memmap_path: Optional[Union[str, Path]] = None,
+) -> np.ndarray:
+    """A dense tensor with values drawn uniformly from `[low, high)`; see
+    `random_sparse` for `seed` and `memmap_path`."""
+    rng = np.random.default_rng(seed)
+    out = _zeros(memmap_path, tuple(shape), dtype)
+    flat = out.reshape(-1)
+    # fill in chunks so memory-mapped outputs never need a full size temporary
+    chunk = 1 << 24
+    for start in range(0, flat.size, chunk):
+        stop = min(start + chunk, flat.size)
+        flat[start:stop] = rng.uniform(low, high, size=stop - start)
+    return out
@@ -0,0 +1,285 @@
+"""Scaling benchmarks for the dependence analysis in `nelli.poly`.
+
+`loop_nest_source` generates affine loop nests (like the ones in
+`examples/dependence_check.py`) of a given depth, number of accesses and number
+of symbolic parameters; `benchmark_dependence_analysis` runs the analysis on
+every pair of accesses (at least one of which is a store) with every phase
+timed and the solver calls counted, e.g.,
+
+    python -m nelli.poly.benchmark --depths 1 2 3 --accesses 2 4 --params 0 2
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import itertools
+import json
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import wraps
+
+import numpy as np
+import z3
+
+from . import affine
+from . import constraints
+from ..mlir._mlir import ir
+from ..mlir.affine._affine_ops_gen import AffineLoadOp, AffineStoreOp
+from ..mlir.frontend_benchmark import load_source
+from ..mlir.func import mlir_func
+from ..utils import find_ops, reset_disambig_names
+
+PHASES = (
+    # the access relations of each access, as sympy relations
+    "sympy_build",
+    # sympy -> z3
+    "z3_translate",
+    # composing the access relations of a pair of accesses (and ordering them)
+    "compose",
+    # `opt_system`, i.e., finding (optimal) witnesses of a dependence
+    "solve",
+    # `elim_vars`, i.e., projecting onto the direction vector variables
+    "quantifier_elimination",
+)
+
+_PRELUDE = """\
+from nelli.mlir.affine import RankedAffineMemRefValue as AffineMemRef
+from nelli.mlir.arith import constant
+from nelli.mlir.utils import F32, Index
+from nelli.poly.sympy_ import d0, d1, d2, d3, d4, d5, s0, s1, s2, s3, s4, s5
+"""
+
+MAX_DEPTH = 6
+MAX_PARAMS = 6
+
+
+def _affine_index(rng, depth, n_params) -> str:
+    coeffs = rng.integers(1, 4, size=depth + n_params)
+    terms = [f"{c} * d{d}" for d, c in enumerate(coeffs[:depth])]
+    terms += [f"{c} * s{p}" for p, c in enumerate(coeffs[depth:])]
+    operands = [f"i{d}" for d in range(depth)] + [f"S{p}" for p in range(n_params)]
+    operands = ", ".join(operands) + ("," if len(operands) == 1 else "")
+    return f"({' + '.join(terms)}) @ ({operands})"
+
+
+def loop_nest_source(name, depth, n_accesses, n_params=0, rank=2, n=64, seed=0) -> str:
+    """A `depth` deep affine loop nest (over a `rank` dimensional memref)
+    whose innermost body alternates `n_accesses` stores and loads; every index
+    is a random (positive) combination of all the induction variables and all
+    of the `n_params` symbolic parameters (the function's `Index` arguments).
+    """
+    assert 1 <= depth <= MAX_DEPTH, f"{depth=} not in [1, {MAX_DEPTH}]"
+    assert 0 <= n_params <= MAX_PARAMS, f"{n_params=} not in [0, {MAX_PARAMS}]"
+    rng = np.random.default_rng(seed)
+    params = "".join(f", S{p}: Index" for p in range(n_params))
+    lines = [
+        f"def {name}(A: AffineMemRef[({', '.join([str(n)] * rank)}), F32]{params}):",
+        "    zero = constant(0.0, F32)",
+    ]
+    for d in range(depth):
+        lines.append("    " * (d + 1) + f"for i{d} in range(0, {n}):")
+    body = "    " * (depth + 1)
+    for k in range(n_accesses):
+        idx = [f"idx{k}_{r}" for r in range(rank)]
+        for r in range(rank):
+            lines.append(f"{body}{idx[r]} = {_affine_index(rng, depth, n_params)}")
+        if k % 2 == 0:
+            lines.append(f"{body}A[{', '.join(idx)}] = zero")
+        else:
+            lines.append(f"{body}v{k} = A[{', '.join(idx)}]")
+    return "\n".join(lines) + "\n"
+
+
+@dataclass
+class DependenceBenchmarkResult:
+    depth: int
+    n_accesses: int
+    n_params: int
+    # (src, dst) access pairs analyzed
+    n_pairs: int
+    n_dependences: int
+    # phase -> total wall time
+    phase_times_s: dict[str, float]
+    # phase -> number of calls; "solver_checks" counts every z3 `check()`
+    calls: dict[str, int]
+    total_s: float
+    metadata: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            "depth": self.depth,
+            "n_accesses": self.n_accesses,
+            "n_params": self.n_params,
+            "n_pairs": self.n_pairs,
+            "n_dependences": self.n_dependences,
+            "phase_times_s": dict(self.phase_times_s),
+            "calls": dict(self.calls),
+            "total_s": self.total_s,
+            **self.metadata,
+        }
+
+    def __str__(self):
+        total = self.total_s or 1.0
+        phases = ", ".join(
+            f"{p} {self.phase_times_s[p]:.3f}s ({100 * self.phase_times_s[p] / total:.0f}%)"
+            for p in PHASES
+        )
+        return (
+            f"depth={self.depth} accesses={self.n_accesses} params={self.n_params}: "
+            f"{self.n_pairs} pairs, {self.n_dependences} dependences in "
+            f"{self.total_s:.3f}s; {phases}; "
+            f"{self.calls['solver_checks']} solver checks"
+        )
+
+
+@contextlib.contextmanager
+def _instrumented():
+    """Times (and counts calls of) each phase by wrapping the functions that
+    implement it, for the duration of the context."""
+    times = Counter({p: 0.0 for p in PHASES})
+    calls = Counter({p: 0 for p in PHASES + ("solver_checks",)})
+
+    def timed(fn, phase):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                times[phase] += time.perf_counter() - start
+                calls[phase] += 1
+
+        return wrapper
+
+    def counted(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            calls["solver_checks"] += 1
+            return fn(*args, **kwargs)
+
+        return wrapper
+
+    patches = [
+        (affine.MemOp, "_build_sympy_access_constraints", "sympy_build"),
+        (affine, "build_z3_access_constraints", "z3_translate"),
+        (constraints, "compose", "compose"),
+        (constraints, "get_ordering_constraints", "compose"),
+        (constraints, "opt_system", "solve"),
+        (constraints, "elim_vars", "quantifier_elimination"),
+    ]
+    originals = [(obj, attr, getattr(obj, attr)) for obj, attr, _ in patches]
+    originals.append((z3.Optimize, "check", z3.Optimize.check))
+    try:
+        for obj, attr, phase in patches:
+            setattr(obj, attr, timed(getattr(obj, attr), phase))
+        z3.Optimize.check = counted(z3.Optimize.check)
+        yield times, calls
+    finally:
+        for obj, attr, original in originals:
+            setattr(obj, attr, original)
+
+
+def benchmark_dependence_analysis(
+    depth,
+    n_accesses,
+    n_params=0,
+    rank=2,
+    direction_vectors=True,
+    seed=0,
+    tmp_dir=None,
+) -> DependenceBenchmarkResult:
+    """Traces a generated loop nest and, for every ordered pair of accesses
+    (at least one of which is a store), builds the constraint system and
+    checks for a dependence and, if there is one and `direction_vectors`,
+    computes the direction vector at every loop depth."""
+    reset_disambig_names()
+    nest = load_source(
+        loop_nest_source("nest", depth, n_accesses, n_params, rank, seed=seed),
+        "nest",
+        tmp_dir if tmp_dir is not None else tempfile.mkdtemp(),
+        prelude=_PRELUDE,
+    )
+    module = ir.Module.create()
+    with ir.InsertionPoint(module.body):
+        mlir_func(nest)
+
+    n_pairs = n_dependences = 0
+    with _instrumented() as (times, calls):
+        start = time.perf_counter()
+        mem_ops = [
+            affine.make_mem_op(op)
+            for op in find_ops(
+                module, lambda op: isinstance(op.opview, (AffineStoreOp, AffineLoadOp))
+            )
+        ]
+        for src, dst in itertools.permutations(mem_ops, 2):
+            if not (isinstance(src, affine.StoreOp) or isinstance(dst, affine.StoreOp)):
+                continue
+            n_pairs += 1
+            quants, cons = constraints.build_constraint_system(src, dst)
+            if constraints.check_mem_dep(quants, cons) is None:
+                continue
+            n_dependences += 1
+            if direction_vectors:
+                for loop_depth in range(1, depth + 1):
+                    try:
+                        constraints.compute_dependence_direction_vector(
+                            src, dst, loop_depth
+                        )
+                    except AssertionError:
+                        # no dependence carried at this depth
+                        pass
+        total_s = time.perf_counter() - start
+
+    return DependenceBenchmarkResult(
+        depth,
+        n_accesses,
+        n_params,
+        n_pairs,
+        n_dependences,
+        dict(times),
+        dict(calls),
+        total_s,
+        {"rank": rank, "direction_vectors": direction_vectors, "seed": seed},
+    )
+
+
+def run_suite(
+    depths=(1, 2, 3), accesses=(2, 4), params=(0, 2), **kwargs
+) -> list[DependenceBenchmarkResult]:
+    tmp_dir = tempfile.mkdtemp()
+    return [
+        benchmark_dependence_analysis(
+            depth, n_accesses, n_params, tmp_dir=tmp_dir, **kwargs
+        )
+        for depth, n_accesses, n_params in itertools.product(depths, accesses, params)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--depths", nargs="*", type=int, default=[1, 2, 3])
+    parser.add_argument("--accesses", nargs="*", type=int, default=[2, 4])
+    parser.add_argument("--params", nargs="*", type=int, default=[0, 2])
+    parser.add_argument("--rank", type=int, default=2)
+    parser.add_argument("--no-direction-vectors", action="store_true")
+    parser.add_argument("--output", help="JSON lines file to append results to")
+    args = parser.parse_args(argv)
+
+    for result in run_suite(
+        args.depths,
+        args.accesses,
+        args.params,
+        rank=args.rank,
+        direction_vectors=not args.no_direction_vectors,
+    ):
+        print(result)
+        if args.output is not None:
+            with open(args.output, "a") as f:
+                f.write(json.dumps(result.as_dict()) + "\n")
+
+
+if __name__ == "__main__":
+    main()
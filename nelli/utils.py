@@ -83,6 +83,15 @@ def mlir_mod_ctx(src: Optional[str] = None):
         yield module
 
 
+def nelli_version() -> Optional[str]:
+    try:
+        from importlib.metadata import version
+
+        return version("nelli")
+    except Exception:
+        return None
+
+
 def shlib_ext():
     if platform.system() == "Darwin":
         shlib_ext = "dylib"
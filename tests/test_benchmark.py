@@ -12,15 +12,21 @@ from nelli.mlir._mlir import runtime as rt
 from nelli.mlir._mlir.dialects.linalg.opdsl import lang as dsl
 from nelli.mlir._mlir.execution_engine import ExecutionEngine
 from nelli.mlir._mlir.ir import Module
-from nelli.mlir.benchmark import create_sparse_np_tensor, wrap
+from nelli.mlir.benchmark import (
+    BenchmarkResult,
+    benchmark,
+    create_sparse_np_tensor,
+    wrap,
+)
 from nelli.mlir.func import mlir_func, declare
 from nelli.mlir.memref import MemRefValue as MemRef
 from nelli.mlir.passes import Pipeline
 from nelli.mlir.refbackend import LLVMJITBackend
+from nelli.mlir.roofline import Machine, count_flops_and_bytes, roofline
 from nelli.mlir.scf import scf_range
 from nelli.mlir.tensor import TensorValue as Tensor
 from nelli.utils import shlib_ext, mlir_mod_ctx
-from util import check_correct
+from util import check_correct, matmul_module
 
 c_runner_utils_lib_path = (
     Path(_mlir_libs.__file__).parent / f"libmlir_c_runner_utils.{shlib_ext()}"
@@ -41,6 +47,18 @@ def matmul_dsl(
     C[dsl.D.m, dsl.D.n] += A[dsl.D.m, dsl.D.k] * B[dsl.D.k, dsl.D.n]
 
 
+def linalg_matmul_module(M, N, K):
+    with mlir_mod_ctx() as module:
+
+        @mlir_func
+        def matmul(
+            x: Tensor[[M, N], F64], y: Tensor[[N, K], F64], z: Tensor[[M, K], F64]
+        ):
+            return matmul_dsl(x, y, outs=[z])
+
+    return module
+
+
 c_runner_utils_lib_path = (
     Path(_mlir_libs.__file__).parent / f"libmlir_c_runner_utils.{shlib_ext()}"
 )
@@ -232,3 +250,83 @@ class TestBenchmark:
         times = np.zeros(self.N_RUNS).astype(np.int64)
         invoker.timing_wrapper(A, B, C, times)
         print("avg time", times.mean() / 1e9)
+
+    def test_benchmark_harness(self):
+        M, N, K = 32, 32, 32
+        module = linalg_matmul_module(M, N, K)
+
+        A = np.random.uniform(size=(M, N))
+        B = np.random.uniform(size=(N, K))
+        C = np.zeros((M, K))
+
+        result = benchmark(
+            module,
+            "matmul",
+            [A, B, C],
+            Pipeline().sparse_compiler(),
+            backend=self.backend,
+            warmup=5,
+            repetitions=50,
+        )
+        assert isinstance(result, BenchmarkResult)
+        assert result.repetitions == 50
+        assert 0 < result.min <= result.median <= result.p90 <= result.p99 <= result.max
+        assert result.stddev >= 0
+        stats = result.as_dict()
+        assert stats["kernel_name"] == "matmul"
+        assert stats["opt_level"] == 3
+        print()
+        print(result)
+
+    def test_roofline_affine(self):
+        M, N, K = 16, 32, 64
+        module = matmul_module(M, N, K)
+        counts = count_flops_and_bytes(module)
+        assert counts.is_exact
+        assert counts.flops == 2 * M * N * K
+        # load A, B and C and store C in every iteration
+        assert counts.bytes_accessed == 4 * 8 * M * N * K
+        assert counts.compulsory_bytes == 8 * (M * N + N * K + M * K)
+
+        A = np.random.uniform(size=(M, N))
+        B = np.random.uniform(size=(N, K))
+        C = np.zeros((M, K))
+        result = benchmark(
+            module,
+            "matmul",
+            [A, B, C],
+            Pipeline().bufferize().lower_to_llvm(),
+            backend=self.backend,
+        )
+        report = roofline(
+            counts, result, Machine(peak_gflops=100, peak_bandwidth_gbs=10)
+        )
+        assert report.time_s == result.median / 1e9
+        assert report.achieved_gflops > 0
+        assert report.bound == "memory"
+        assert 0 < report.percent_of_peak
+        print()
+        print(report)
+
+    def test_roofline_linalg(self):
+        M, N, K = self.M, self.N, self.K
+        module = linalg_matmul_module(M, N, K)
+        counts = count_flops_and_bytes(module, "matmul")
+        assert counts.is_exact
+        assert counts.flops == 2 * M * N * K
+        # the output is read (accumulated into) and written
+        assert counts.bytes_accessed == (1 + 1 + 2) * 8 * M * N * K
+        assert counts.compulsory_bytes == 8 * (M * N + N * K + M * K)
+        assert counts.arithmetic_intensity == counts.flops / counts.compulsory_bytes
+
+        machine = Machine(peak_gflops=100, peak_bandwidth_gbs=10)
+        report = roofline(counts, 1e-3, machine)
+        assert report.achieved_gflops == counts.flops / 1e-3 / 1e9
+        # 6e6 FLOPs over 520 KB of compulsory traffic is ~11.5 FLOP/byte, above
+        # the ridge point of 100 / 10 = 10 FLOP/byte
+        assert machine.ridge_point == 10
+        assert 11.5 < report.arithmetic_intensity < 11.6
+        assert report.bound == "compute"
+        # and below the ridge point of 100 / 5 = 20 FLOP/byte
+        slow_memory = Machine(peak_gflops=100, peak_bandwidth_gbs=5)
+        assert roofline(counts, 1e-3, slow_memory).bound == "memory"
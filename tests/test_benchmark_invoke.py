@@ -0,0 +1,73 @@
+from pathlib import Path
+
+import numpy as np
+
+from nelli.mlir._mlir import _mlir_libs
+from nelli.mlir.affine import RankedAffineMemRefValue as MemRef
+from nelli.mlir.func import mlir_func
+from nelli.mlir.invoke_benchmark import (
+    benchmark_call_overhead,
+    benchmark_executor_scaling,
+)
+from nelli.mlir.passes import Pipeline
+from nelli.mlir.refbackend import LLVMJITBackend, CallPlan
+from nelli.mlir.utils import F32
+from nelli.utils import mlir_mod_ctx, shlib_ext
+
+c_runner_utils_lib_path = (
+    Path(_mlir_libs.__file__).parent / f"libmlir_c_runner_utils.{shlib_ext()}"
+)
+assert c_runner_utils_lib_path.exists()
+runner_utils_lib_path = (
+    Path(_mlir_libs.__file__).parent / f"libmlir_runner_utils.{shlib_ext()}"
+)
+assert runner_utils_lib_path.exists()
+
+
+class TestBenchmarkInvoke:
+    """Functional checks of the call path; the benchmarks themselves are run by
+    `python -m nelli.mlir.invoke_benchmark`."""
+
+    backend = LLVMJITBackend(
+        shared_libs=[str(c_runner_utils_lib_path), str(runner_utils_lib_path)]
+    )
+    N = 4
+
+    def small_kernel(self):
+        N = self.N
+        with mlir_mod_ctx() as module:
+
+            @mlir_func
+            def vadd(A: MemRef[(N,), F32], B: MemRef[(N,), F32], C: MemRef[(N,), F32]):
+                for i in range(0, N):
+                    C[i] = A[i] + B[i]
+
+        module = self.backend.compile(
+            module,
+            kernel_name="vadd",
+            pipeline=Pipeline().bufferize().lower_to_llvm(),
+        )
+        return self.backend.load(module, opt_level=3)
+
+    def test_call_plan_rebinds_new_buffers(self):
+        invoker = self.small_kernel()
+        assert isinstance(invoker.vadd, CallPlan)
+        assert invoker.vadd is invoker.vadd
+        for _ in range(3):
+            A = np.random.randn(self.N).astype(np.float32)
+            B = np.random.randn(self.N).astype(np.float32)
+            C = np.zeros(self.N).astype(np.float32)
+            invoker.vadd(A, B, C)
+            assert np.allclose(A + B, C)
+
+    def test_benchmarks_run(self):
+        overhead = benchmark_call_overhead(n_calls=10, backend=self.backend)
+        stats = overhead.as_dict()
+        assert stats["legacy_calls_per_s"] > 0 and stats["calls_per_s"] > 0
+        assert stats["raw_calls_per_s"] > 0
+
+        scaling = benchmark_executor_scaling(
+            max_workers=[1, 2], n=8, n_tasks=4, backend=self.backend
+        )
+        assert set(scaling.wall_time_s) == {1, 2}
+        assert scaling.kernels_per_s(2) > 0
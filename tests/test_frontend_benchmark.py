@@ -0,0 +1,38 @@
+from nelli.mlir.frontend_benchmark import (
+    benchmark_module_class,
+    benchmark_tracing,
+    if_nest_source,
+    load_source,
+    loop_nest_source,
+    module_class_source,
+    straight_line_source,
+)
+from nelli.mlir.scf import scf_range
+
+
+class TestFrontendBenchmark:
+    def test_straight_line(self, tmp_path):
+        f = load_source(straight_line_source("f", 100), "f", tmp_path)
+        result = benchmark_tracing("straight_line", [f], repetitions=2)
+        # func.func + (mulf, addf) per statement + func.return
+        assert result.n_ops == 2 * 100 + 2
+        assert len(result.ir_build_s) == 2
+        d = result.as_dict()
+        assert d["ops_per_s"] > 0
+        assert d["total_s"] >= d["ast_rewrite_s"] + d["ir_build_s"]
+
+    def test_nests(self, tmp_path):
+        g = load_source(loop_nest_source("g", 4, n_statements=2), "g", tmp_path)
+        loops = benchmark_tracing("loop_nest", [g], repetitions=1)
+        scf_loops = benchmark_tracing("loop_nest", [g], scf_range, repetitions=1)
+        assert scf_loops.as_dict()["range_ctor"] == "scf_range"
+        assert loops.n_ops > 4 * 2
+
+        h = load_source(if_nest_source("h", 4), "h", tmp_path)
+        ifs = benchmark_tracing("if_nest", [h], repetitions=1)
+        assert ifs.n_ops > 4 * 2
+
+    def test_module_class(self, tmp_path):
+        cls = load_source(module_class_source("C", 10, n_statements=5), "C", tmp_path)
+        result = benchmark_module_class("module", cls, repetitions=1)
+        assert result.n_ops == 10 * (2 * 5 + 2)
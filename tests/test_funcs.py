@@ -3,6 +3,7 @@ from textwrap import dedent
 from nelli.mlir.utils import F32
 from nelli.mlir.arith import constant
 from nelli.mlir.func import mlir_func
+from nelli.mlir.rewrite_cache import rewrite_cache
 from nelli.utils import mlir_mod_ctx
 from util import check_correct
 
@@ -176,3 +177,35 @@ class TestFunc:
         """
         )
         check_correct(correct, module)
+
+    def test_rewrite_cache(self, tmp_path):
+        def build():
+            with mlir_mod_ctx() as module:
+
+                @mlir_func
+                def method(x: F32):
+                    y = constant(1.0, type=F32)
+                    if x < y:
+                        z = x + y
+
+            return str(module)
+
+        rewrite_cache.clear()
+        first = build()
+        # one for the ast rewrite, one for the bytecode rewrite
+        assert rewrite_cache.misses == 2 and rewrite_cache.hits == 0
+        assert build() == first
+        assert rewrite_cache.misses == 2 and rewrite_cache.hits == 2
+
+        try:
+            rewrite_cache.cache_dir = tmp_path
+            rewrite_cache.clear()
+            assert build() == first
+            assert len(list(tmp_path.glob("*.bin"))) == 2
+            # a "new process"
+            rewrite_cache.clear()
+            assert build() == first
+            assert rewrite_cache.disk_hits == 2 and rewrite_cache.misses == 0
+        finally:
+            rewrite_cache.cache_dir = None
+            rewrite_cache.clear()
@@ -0,0 +1,81 @@
+import numpy as np
+from numpy.random import randn
+
+from nelli.mlir._mlir.ir import MemRefType
+from nelli.mlir.jit import arg_signature, infer_annotation, jit
+from nelli.mlir.passes import Pipeline
+
+
+def make_scale_add():
+    """A fresh `JITFunction` (with no specializations), per test."""
+
+    @jit
+    def scale_add(a, X, Y):
+        M, N = MemRefType(X.type).shape
+        for i in range(0, M):
+            for j in range(0, N):
+                Y[i, j] = a * X[i, j] + Y[i, j]
+
+    return scale_add
+
+
+class TestJIT:
+    def test_specializes_per_signature(self):
+        scale_add = make_scale_add()
+        X = randn(4, 8).astype(np.float32)
+        Y = randn(4, 8).astype(np.float32)
+        expected = 2 * X + Y
+        scale_add(np.float32(2.0), X, Y)
+        assert np.allclose(expected, Y)
+        assert len(scale_add.specializations) == 1
+
+        # same signature, different data: no new specialization
+        X = randn(4, 8).astype(np.float32)
+        expected = 2 * X + Y
+        scale_add(np.float32(2.0), X, Y)
+        assert np.allclose(expected, Y)
+        assert len(scale_add.specializations) == 1
+
+        # scalars are passed through the same pointer every call, so the call
+        # plan keeps its slot
+        (spec,) = scale_add.specializations.values()
+        plan = spec.invoker.call_plan("scale_add")
+        scalar_slot = plan._slots[0]
+        expected = 3 * X + Y
+        scale_add(np.float32(3.0), X, Y)
+        assert np.allclose(expected, Y)
+        assert plan._slots[0] is scalar_slot
+
+        # new shape and dtype
+        X = randn(3, 5)
+        Y = randn(3, 5)
+        expected = 0.5 * X + Y
+        scale_add(0.5, X, Y)
+        assert np.allclose(expected, Y)
+        assert len(scale_add.specializations) == 2
+
+    def test_strided_layout(self):
+        scale_add = make_scale_add()
+        X = randn(8, 4).T
+        assert not X.flags.c_contiguous
+        Y = np.zeros((4, 8))
+        scale_add(1.0, X, Y)
+        assert np.allclose(X, Y)
+        assert (
+            str(infer_annotation(arg_signature(X)).mlir_type)
+            == "memref<4x8xf64, strided<[1, 4]>>"
+        )
+        assert str(infer_annotation(arg_signature(Y)).mlir_type) == "memref<4x8xf64>"
+
+    def test_pipeline(self):
+        @jit(pipeline=Pipeline().bufferize().lower_to_llvm(), opt_level=3)
+        def copy(A, B):
+            (N,) = MemRefType(A.type).shape
+            for i in range(0, N):
+                B[i] = A[i]
+
+        A = randn(16).astype(np.float32)
+        B = np.zeros_like(A)
+        copy(A, B)
+        assert np.allclose(A, B)
+        assert copy.__name__ == "copy"
@@ -1,5 +1,7 @@
 from textwrap import dedent
 
+import pytest
+
 from nelli.mlir.affine import (
     affine_range,
     end_for as affine_endfor,
@@ -13,6 +15,7 @@ from nelli.mlir.scf import (
     scf_if,
     scf_endif_branch,
     scf_endif,
+    scf_range,
     par_range as parfor,
 )
 from nelli.mlir.utils import run_pipeline, F32, F64, Index
@@ -417,3 +420,122 @@ class TestLoops:
         """
         )
         check_correct(correct, module)
+
+    def test_iter_args(self):
+        with mlir_mod_ctx() as module:
+
+            @mlir_func
+            def sum(A: AffineMemRef[(10, 10), F64]):
+                acc = constant(0.0)
+                for i in range(0, 10):
+                    for j in range(0, 10):
+                        acc = acc + A[i, j]
+                return acc
+
+        correct = dedent(
+            """\
+        module {
+          func.func @sum(%arg0: memref<10x10xf64>) -> f64 {
+            %cst = arith.constant 0.000000e+00 : f64
+            %0 = affine.for %arg1 = 0 to 10 iter_args(%arg2 = %cst) -> (f64) {
+              %1 = affine.for %arg3 = 0 to 10 iter_args(%arg4 = %arg2) -> (f64) {
+                %2 = affine.load %arg0[%arg1, %arg3] : memref<10x10xf64>
+                %3 = arith.addf %arg4, %2 : f64
+                affine.yield %3 : f64
+              }
+              affine.yield %1 : f64
+            }
+            return %0 : f64
+          }
+        }
+        """
+        )
+        check_correct(correct, module)
+
+    def test_iter_args_scf(self):
+        with mlir_mod_ctx() as module:
+
+            @mlir_func(range_ctor=scf_range)
+            def sum_prod(A: MemRef[(10,), F64], B: MemRef[(10,), F64]):
+                acc = constant(0.0)
+                prod = constant(1.0)
+                for i in range(0, 10):
+                    # not carried: only bound in the loop
+                    a = A[i]
+                    acc = acc + a
+                    prod = prod * a
+                    B[i] = acc
+                return acc, prod
+
+        correct = dedent(
+            """\
+        module {
+          func.func @sum_prod(%arg0: memref<10xf64>, %arg1: memref<10xf64>) -> (f64, f64) {
+            %cst = arith.constant 0.000000e+00 : f64
+            %cst_0 = arith.constant 1.000000e+00 : f64
+            %c0 = arith.constant 0 : index
+            %c10 = arith.constant 10 : index
+            %c1 = arith.constant 1 : index
+            %0:2 = scf.for %arg2 = %c0 to %c10 step %c1 iter_args(%arg3 = %cst, %arg4 = %cst_0) -> (f64, f64) {
+              %1 = memref.load %arg0[%arg2] : memref<10xf64>
+              %2 = arith.addf %arg3, %1 : f64
+              %3 = arith.mulf %arg4, %1 : f64
+              memref.store %2, %arg1[%arg2] : memref<10xf64>
+              scf.yield %2, %3 : f64, f64
+            }
+            return %0#0, %0#1 : f64, f64
+          }
+        }
+        """
+        )
+        check_correct(correct, module)
+
+    def test_iter_args_python_values(self):
+        with mlir_mod_ctx() as module:
+
+            @mlir_func(range_ctor=scf_range)
+            def sum_col(A: MemRef[(4, 2), F64]):
+                acc = constant(0.0)
+                # a Python value updated while tracing isn't carried
+                k = 0
+                for i in range(0, 4):
+                    acc = acc + A[i, k]
+                    k = k + 1
+                A[0, k] = acc
+
+        correct = dedent(
+            """\
+        module {
+          func.func @sum_col(%arg0: memref<4x2xf64>) {
+            %cst = arith.constant 0.000000e+00 : f64
+            %c0 = arith.constant 0 : index
+            %c4 = arith.constant 4 : index
+            %c1 = arith.constant 1 : index
+            %0 = scf.for %arg1 = %c0 to %c4 step %c1 iter_args(%arg2 = %cst) -> (f64) {
+              %c0_2 = arith.constant 0 : index
+              %2 = memref.load %arg0[%arg1, %c0_2] : memref<4x2xf64>
+              %3 = arith.addf %arg2, %2 : f64
+              scf.yield %3 : f64
+            }
+            %c0_0 = arith.constant 0 : index
+            %c1_1 = arith.constant 1 : index
+            memref.store %0, %arg0[%c0_0, %c1_1] : memref<4x2xf64>
+            return
+          }
+        }
+        """
+        )
+        check_correct(correct, module)
+
+    def test_iter_args_type_change(self):
+        with pytest.raises(
+            AssertionError,
+            match="loop-carried 'x' changes type in the loop body, from f64 to f32",
+        ):
+            with mlir_mod_ctx():
+
+                @mlir_func(range_ctor=scf_range)
+                def last(A: MemRef[(4,), F32]):
+                    x = constant(0.0)
+                    for i in range(0, 4):
+                        x = A[i]
@@ -21,6 +21,7 @@ from nelli.poly.sympy_ import d0, d1, d2, s0, s1
 from nelli.mlir.arith import constant
 from nelli.mlir.func import mlir_func
 from nelli.mlir.affine import RankedAffineMemRefValue
+from nelli.poly.benchmark import PHASES, benchmark_dependence_analysis
 from nelli.utils import (
     mlir_gc,
     mlir_mod_ctx,
@@ -250,3 +251,19 @@ class TestMemrefDependenceCheck:
             assert str(dir_vecs) == "{v0: [0, 0], v1: [2, 6], v2: [-3, 3]}"
             dir_vecs = compute_dependence_direction_vector(store, load, 3)
             assert str(dir_vecs) == "{v0: [0, 0], v1: [0, 0], v2: [1, 3]}"
+
+    def test_benchmark_dependence_analysis(self, tmp_path):
+        result = benchmark_dependence_analysis(
+            depth=2, n_accesses=2, n_params=1, tmp_dir=tmp_path
+        )
+        # (store, load) and (load, store)
+        assert result.n_pairs == 2
+        assert result.calls["sympy_build"] == result.calls["z3_translate"] == 2
+        assert result.calls["compose"] >= 2 * result.n_pairs
+        # one dependence check per pair, then a projection per depth per dependence
+        assert result.calls["solve"] >= result.n_pairs
+        assert result.calls["quantifier_elimination"] == 2 * result.n_dependences
+        assert result.calls["solver_checks"] >= result.calls["solve"]
+        assert set(result.phase_times_s) == set(PHASES)
+        assert sum(result.phase_times_s.values()) <= result.total_s
+        mlir_gc()
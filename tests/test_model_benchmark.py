@@ -0,0 +1,34 @@
+import json
+from pathlib import Path
+
+from nelli.mlir.model_benchmark import STAGES, discover_models, main, model_pipeline
+
+MODELS_DIR = Path(__file__).parent / "pytorch_nns"
+
+
+class TestModelBenchmark:
+    def test_discover_models(self):
+        models = discover_models(MODELS_DIR, sizes=[299])
+        assert [m.name for m in models] == ["inception_v3"]
+        assert models[0].input_shape == (1, 3, 299, 299)
+
+        models = discover_models(MODELS_DIR, models=["alexnet", "resnet18"])
+        assert {m.name: m.input_size for m in models} == {
+            "alexnet": 224,
+            "resnet18": 32,
+        }
+
+    def test_model_benchmark(self, tmp_path):
+        output = tmp_path / "results.jsonl"
+        argv = [str(MODELS_DIR), "--models", "resnet18", "--sizes", "32"]
+        main(argv + ["--repetitions", "2", "--warmup", "1", "--output", str(output)])
+
+        [result] = [json.loads(l) for l in output.read_text().splitlines()]
+        assert result["model"] == "resnet18"
+        assert result["input_shape"] == [1, 3, 32, 32]
+        assert list(result["lowering_times_s"]) == [name for name, _ in STAGES]
+        assert result["jit_time_s"] > 0 and result["first_inference_s"] > 0
+        assert result["inference"]["repetitions"] == 2
+        assert result["inference"]["pipeline"] == model_pipeline().materialize()
+        assert result["throughput_per_s"] > 0
+        assert "nelli_version" in result and "timestamp" in result
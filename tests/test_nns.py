@@ -10,6 +10,7 @@ from nelli.mlir._mlir import _mlir_libs
 from nelli.mlir._mlir.runtime import unranked_memref_to_numpy
 from nelli.mlir.func import declare, mlir_func, call_func
 from nelli.mlir.memref import MemRefValue as MemRef
+from nelli.mlir.model_benchmark import basic_tile, model_pipeline
 from nelli.mlir.passes import Pipeline
 from nelli.mlir.refbackend import (
     LLVMJITBackend,
@@ -18,7 +19,7 @@ from nelli.mlir.refbackend import (
 )
 from nelli.mlir.scf import scf_range
 from nelli.mlir.tensor import TensorValue as Tensor
-from nelli.mlir.transform import sequence, match, tile_linalg_to_scf_for
+from nelli.mlir.transform import sequence
 from nelli.utils import mlir_mod_ctx, shlib_ext
 
 c_runner_utils_lib_path = (
@@ -57,11 +58,6 @@ example_224 = lambda: np.random.randn(
 example_299 = lambda: np.random.randn(BATCH_SIZE, CHANNEL, 299, 299)
 
 
-def basic_tile(target, *extra_args):
-    m = match(target, ["linalg.matmul"])
-    tiled = tile_linalg_to_scf_for(m, sizes=[2, 2])
-
-
 class TestNNs:
     backend = LLVMJITBackend(
         shared_libs=[
@@ -75,24 +71,7 @@ class TestNNs:
         return self.backend.compile(
             module,
             kernel_name="forward",
-            pipeline=Pipeline()
-            .FUNC()
-            .refbackend_generalize_tensor_pad()
-            .linalg_transform_patterns(generalize_pad_tensor=True)
-            .linalg_fuse_elementwise_ops()
-            .CNUF()
-            .bufferize()
-            .FUNC()
-            .refbackend_munge_memref_copy()
-            .CNUF()
-            .transform_dialect_interpreter()
-            .transform_dialect_erase_schedule()
-            .FUNC()
-            .convert_linalg_to_parallel_loops()
-            .CNUF()
-            .lower_to_openmp()
-            .refbackend_munge_calling_conventions()
-            .lower_to_llvm(),
+            pipeline=model_pipeline(),
             # enable_ir_printing=True
         )
 
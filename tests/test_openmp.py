@@ -23,9 +23,11 @@ from nelli.mlir.omp.omp import (
     parallel,
     ws_loop as omp_range,
 )
+from nelli.mlir.parallel import prange
 from nelli.mlir.refbackend import LLVMJITBackend
 from nelli.mlir.passes import Pipeline
-from nelli.utils import mlir_mod_ctx, shlib_ext
+from nelli.mlir.scf import scf_range
+from nelli.utils import find_ops, mlir_mod_ctx, shlib_ext
 from util import check_correct
 
 from nelli.mlir._mlir import _mlir_libs
@@ -201,6 +203,110 @@ class TestOMP:
             A, np.array([0, 2, 0, 2, 0, 2, 0, 2, 0, 2, 0, 0], dtype=np.int32)
         )
 
+    def test_prange_scf(self):
+        with mlir_mod_ctx() as module:
+
+            @mlir_func(range_ctor=scf_range)
+            def double(A: MemRef[(4, 8), F32]):
+                for i in prange(0, 4, lowering="scf"):
+                    for j in range(0, 8):
+                        A[i, j] = A[i, j] + A[i, j]
+
+        # print(module)
+        correct = dedent(
+            """\
+        module {
+          func.func @double(%arg0: memref<4x8xf32>) {
+            %c0 = arith.constant 0 : index
+            %c4 = arith.constant 4 : index
+            %c1 = arith.constant 1 : index
+            scf.parallel (%arg1) = (%c0) to (%c4) step (%c1) {
+              %c0_0 = arith.constant 0 : index
+              %c8 = arith.constant 8 : index
+              %c1_1 = arith.constant 1 : index
+              scf.for %arg2 = %c0_0 to %c8 step %c1_1 {
+                %0 = memref.load %arg0[%arg1, %arg2] : memref<4x8xf32>
+                %1 = memref.load %arg0[%arg1, %arg2] : memref<4x8xf32>
+                %2 = arith.addf %0, %1 : f32
+                memref.store %2, %arg0[%arg1, %arg2] : memref<4x8xf32>
+              }
+              scf.yield
+            }
+            return
+          }
+        }
+        """
+        )
+        check_correct(correct, module)
+
+    def test_prange_iter_args(self):
+        with mlir_mod_ctx() as module:
+
+            @mlir_func(range_ctor=scf_range)
+            def row_sums(A: MemRef[(4, 8), F32], B: MemRef[(4,), F32]):
+                # bound outside the prange: can't be carried by loops in it
+                acc = constant(0.0, type=F32)
+                for i in prange(0, 4, lowering="scf"):
+                    acc = constant(0.0, type=F32)
+                    for j in range(0, 8):
+                        acc = acc + A[i, j]
+                    B[i] = acc
+
+        # print(module)
+        correct = dedent(
+            """\
+        module {
+          func.func @row_sums(%arg0: memref<4x8xf32>, %arg1: memref<4xf32>) {
+            %cst = arith.constant 0.000000e+00 : f32
+            %c0 = arith.constant 0 : index
+            %c4 = arith.constant 4 : index
+            %c1 = arith.constant 1 : index
+            scf.parallel (%arg2) = (%c0) to (%c4) step (%c1) {
+              %cst_0 = arith.constant 0.000000e+00 : f32
+              %c0_1 = arith.constant 0 : index
+              %c8 = arith.constant 8 : index
+              %c1_2 = arith.constant 1 : index
+              %0 = scf.for %arg3 = %c0_1 to %c8 step %c1_2 iter_args(%arg4 = %cst_0) -> (f32) {
+                %1 = memref.load %arg0[%arg2, %arg3] : memref<4x8xf32>
+                %2 = arith.addf %arg4, %1 : f32
+                scf.yield %2 : f32
+              }
+              memref.store %0, %arg1[%arg2] : memref<4xf32>
+              scf.yield
+            }
+            return
+          }
+        }
+        """
+        )
+        check_correct(correct, module)
+        assert module.operation.verify()
+
+    def test_prange_runtime(self):
+        with mlir_mod_ctx() as module:
+
+            @mlir_func(range_ctor=scf_range)
+            def double(A: MemRef[(16, 8), F32]):
+                for i in prange(0, 16, schedule="dynamic", chunk=2, num_threads=4):
+                    for j in range(0, 8):
+                        A[i, j] = A[i, j] + A[i, j]
+
+        (ws_loop,) = find_ops(module, lambda op: op.name == "omp.wsloop")
+        assert (
+            str(ws_loop.attributes["schedule_val"]) == "#omp<schedulekind dynamic>"
+        )
+        assert len(find_ops(module, lambda op: op.name == "omp.parallel")) == 1
+
+        module = self.backend.compile(
+            module,
+            kernel_name="double",
+            pipeline=Pipeline().bufferize().lower_to_llvm(),
+        )
+        A = np.random.randn(16, 8).astype(np.float32)
+        expected = 2 * A
+        self.backend.load(module).double(A)
+        assert np.allclose(expected, A)
+
     def test_scf_to_openmp1(self):
         module = Module.parse(
             dedent(
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from nelli.mlir.benchmark import BenchmarkResult
+from nelli.mlir.perf_db import (
+    PERF_DB_ENV_VAR,
+    PerfDB,
+    compare_results,
+    git_revision,
+    main,
+    mann_whitney_u,
+    record_result,
+)
+
+
+def make_result(name, median_ns, seed, n=50):
+    rng = np.random.default_rng(seed)
+    times = rng.normal(median_ns, median_ns * 0.01, size=n).astype(np.int64)
+    return BenchmarkResult(
+        name,
+        times,
+        warmup=5,
+        metadata={"pipeline": "builtin.module(cse)", "opt_level": 3},
+    )
+
+
+class TestPerfDB:
+    def test_mann_whitney_u(self):
+        rng = np.random.default_rng(0)
+        a = rng.normal(100, 1, size=50)
+        assert mann_whitney_u(a, rng.normal(100, 1, size=50)) > 0.01
+        assert mann_whitney_u(a, rng.normal(105, 1, size=50)) < 1e-6
+        assert mann_whitney_u(np.ones(10), np.ones(10)) == 1.0
+
+    def test_record_and_compare(self, tmp_path, capsys):
+        db = PerfDB(tmp_path / "perf.db")
+        baseline = db.record(
+            [make_result("matmul", 1000, 0), make_result("conv", 5000, 1)], label="a"
+        )
+        candidate = db.record(
+            [make_result("matmul", 1200, 2), make_result("conv", 5000, 3)], label="b"
+        )
+        runs = db.runs()
+        assert [r.id for r in runs] == [baseline, candidate]
+        assert runs[0].label == "a" and runs[0].host_cpu
+        assert db.resolve_run_id(-1) == candidate
+
+        results = db.results(baseline)
+        key = ("matmul", "builtin.module(cse)", 3)
+        assert set(results) == {key, ("conv", "builtin.module(cse)", 3)}
+        assert results[key].warmup == 5
+        assert results[key].repetitions == 50
+
+        comparisons = {
+            c.key[0]: c for c in compare_results(results, db.results(candidate))
+        }
+        assert comparisons["matmul"].verdict == "slower"
+        assert abs(comparisons["matmul"].ratio - 1.2) < 0.01
+        assert comparisons["conv"].verdict == "unchanged"
+        db.close()
+
+        assert main([str(tmp_path / "perf.db"), "compare", "-2", "-1"]) == 1
+        assert "slower" in capsys.readouterr().out
+        assert main([str(tmp_path / "perf.db"), "compare", "-1", "-1"]) == 0
+
+    def test_duplicate_results(self, tmp_path):
+        db = PerfDB(tmp_path / "perf.db")
+        run_id = db.new_run()
+        db.add_result(run_id, make_result("matmul", 1000, 0))
+        with pytest.raises(AssertionError, match="already has a result"):
+            db.add_result(run_id, make_result("matmul", 1000, 1))
+        db.add_result(run_id, make_result("matmul", 1000, 1), name="matmul_2")
+        assert len(db.results(run_id)) == 2
+        db.close()
+
+    def test_git_revision(self, tmp_path, monkeypatch):
+        revision = git_revision()
+        # of nelli's checkout, not of wherever the process runs
+        monkeypatch.chdir(tmp_path)
+        assert git_revision() == revision
+        assert git_revision(tmp_path) is None
+
+    def test_record_result(self, tmp_path, monkeypatch):
+        assert record_result(make_result("matmul", 1000, 0)) is None
+
+        monkeypatch.setenv(PERF_DB_ENV_VAR, str(tmp_path / "perf.db"))
+        run_id = record_result(make_result("matmul", 1000, 0))
+        assert record_result(make_result("conv", 1000, 0)) == run_id
+        assert record_result(make_result("matmul", 2000, 1)) == run_id
+        names = {key[0] for key in PerfDB(tmp_path / "perf.db").results(run_id)}
+        assert names == {
+            "tests/test_perf_db.py::TestPerfDB::test_record_result::matmul",
+            "tests/test_perf_db.py::TestPerfDB::test_record_result::conv",
+            "tests/test_perf_db.py::TestPerfDB::test_record_result::matmul#2",
+        }
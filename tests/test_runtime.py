@@ -1,23 +1,40 @@
+import asyncio
 import ctypes
 from pathlib import Path
 from textwrap import dedent
 
 import numpy as np
+import pytest
 from numpy import zeros
 from numpy.random import randn
 
-from nelli.mlir.utils import F32, F64
+from nelli.mlir.utils import F32, F64, run_pipeline
 from nelli.mlir._mlir import _mlir_libs
 from nelli.mlir._mlir.runtime import get_unranked_memref_descriptor
 from nelli.mlir.affine import (
     UnrankedAffineMemRefValue as UnrankedMemRef,
     RankedAffineMemRefValue as MemRef,
 )
+from nelli.mlir.batch import add_batched_func
 from nelli.mlir.func import mlir_func, declare
+from nelli.mlir.kernel_cache import EngineCache, OBJECT_FILENAME
+from nelli.mlir.pass_stats import PipelineReport, split_pipeline
 from nelli.mlir.passes import Pipeline
-from nelli.mlir.refbackend import LLVMJITBackend
+from nelli.mlir.target import Target
+from nelli.mlir.tensor import TensorValue as Tensor
+from nelli.mlir._mlir.dialects import linalg
+from nelli.mlir._mlir.execution_engine import ExecutionEngine
+from nelli.mlir import refbackend
+from nelli.mlir.refbackend import (
+    AsyncLLVMJITBackendInvoker,
+    LLVMJITBackend,
+    LLVMJITBackendExecutor,
+    SharedLibraryEngine,
+    get_c_interface_funcs,
+    load_shared_library,
+)
 from nelli.utils import mlir_mod_ctx, shlib_ext
-from util import check_correct
+from util import check_correct, matmul_args, matmul_module
 
 c_runner_utils_lib_path = (
     Path(_mlir_libs.__file__).parent / f"libmlir_c_runner_utils.{shlib_ext()}"
@@ -92,3 +109,388 @@ class TestRuntime:
         )
         out, err = capfd.readouterr()
         check_correct(correct, out)
+
+    def test_kernel_cache(self, tmp_path, monkeypatch):
+        M, N, K = 4, 16, 8
+
+        backend = LLVMJITBackend(
+            shared_libs=[str(c_runner_utils_lib_path), str(runner_utils_lib_path)],
+            cache_dir=tmp_path,
+        )
+        pipeline = Pipeline().bufferize().lower_to_llvm()
+
+        cold_module = backend.compile(
+            matmul_module(M, N, K),
+            kernel_name="matmul",
+            pipeline=pipeline,
+            collect_pass_stats=True,
+        )
+        assert backend.last_pipeline_report is not None
+        cold_invoker = backend.load(cold_module)
+        assert isinstance(cold_invoker.ee, ExecutionEngine)
+        key = backend.native_cache_key(cold_module)
+        assert backend.cache.link_error(key) is None
+        assert backend.cache.get_shared_library(key) is not None
+
+        # the warm path neither lowers nor JITs
+        def fail(*args, **kwargs):
+            raise AssertionError("warm compile/load must not lower or JIT")
+
+        monkeypatch.setattr(refbackend, "run_pipeline", fail)
+        monkeypatch.setattr(refbackend, "ExecutionEngine", fail)
+        warm_module = backend.compile(
+            matmul_module(M, N, K),
+            kernel_name="matmul",
+            pipeline=pipeline,
+            collect_pass_stats=True,
+        )
+        # nothing ran, so there's no (stale) report
+        assert backend.last_pipeline_report is None
+        assert str(warm_module) == str(cold_module)
+        assert get_c_interface_funcs(warm_module) == ["matmul"]
+        warm_invoker = backend.load(warm_module)
+        assert isinstance(warm_invoker.ee, SharedLibraryEngine)
+
+        for invoker in [cold_invoker, warm_invoker]:
+            A, B, C = matmul_args(M, N, K)
+            invoker.matmul(A, B, C)
+            assert np.allclose(A @ B, C)
+
+    def test_kernel_cache_link_error(self, tmp_path, monkeypatch):
+        M, N, K = 4, 16, 8
+        module = matmul_module(M, N, K)
+
+        monkeypatch.setenv("CC", str(tmp_path / "no-such-cc"))
+        backend = LLVMJITBackend(
+            shared_libs=self.backend.shared_libs, cache_dir=tmp_path / "cache"
+        )
+        module = backend.compile(
+            module,
+            kernel_name="matmul",
+            pipeline=Pipeline().bufferize().lower_to_llvm(),
+        )
+        backend.load(module)
+        key = backend.native_cache_key(module)
+        assert backend.cache.get_shared_library(key) is None
+        assert "no-such-cc" in backend.cache.link_error(key)
+        assert isinstance(backend.load(module).ee, ExecutionEngine)
+
+    def test_out_params(self):
+        M, N, K = 4, 16, 8
+
+        with mlir_mod_ctx() as module:
+
+            @mlir_func
+            def matmuls(
+                A: Tensor[(M, N), F64],
+                B: Tensor[(N, K), F64],
+                C: Tensor[(M, K), F64],
+            ):
+                AB = linalg.matmul(A, B, outs=[C])
+                return AB, linalg.matmul(A, B, outs=[AB])
+
+        module = self.backend.compile(
+            module,
+            kernel_name="matmuls",
+            pipeline=Pipeline().bufferize(results_to_out_params=True).lower_to_llvm(),
+        )
+        invoker = self.backend.load(module)
+
+        A, B, C = matmul_args(M, N, K)
+        outs = [np.empty((M, K)), np.empty((M, K))]
+        AB, ABAB = invoker.matmuls(A, B, C, outs=outs)
+        assert AB is outs[0] and ABAB is outs[1]
+        assert np.allclose(A @ B, AB)
+        assert np.allclose(2 * (A @ B), ABAB)
+        # inputs aren't clobbered
+        assert np.allclose(C, 0)
+
+    def test_invoke_batch(self):
+        N, BATCH = 8, 16
+
+        with mlir_mod_ctx() as module:
+
+            @mlir_func
+            def vadd(A: MemRef[(N,), F32], B: MemRef[(N,), F32], C: MemRef[(N,), F32]):
+                for i in range(0, N):
+                    C[i] = A[i] + B[i]
+
+        add_batched_func(module, "vadd", outs=[2])
+        module = self.backend.compile(
+            module,
+            kernel_name="vadd",
+            pipeline=Pipeline().bufferize().lower_to_llvm(),
+        )
+        invoker = self.backend.load(module)
+
+        batch = [
+            (
+                randn(N).astype(np.float32),
+                randn(N).astype(np.float32),
+                zeros(N).astype(np.float32),
+            )
+            for _ in range(BATCH)
+        ]
+        # only the recorded outs are copied back (A and B can be read only)
+        assert invoker.batch_outs == {"vadd_batched": [2]}
+        for A, B, _C in batch:
+            A.flags.writeable = B.flags.writeable = False
+        invoker.invoke_batch("vadd", batch)
+        for A, B, C in batch:
+            assert np.allclose(A + B, C)
+
+        A = randn(BATCH, N).astype(np.float32)
+        B = randn(BATCH, N).astype(np.float32)
+        C = zeros((BATCH, N)).astype(np.float32)
+        invoker.vadd_batched(A, B, C)
+        assert np.allclose(A + B, C)
+
+    def test_executor(self):
+        M, N, K = 4, 16, 8
+
+        module = self.backend.compile(
+            matmul_module(M, N, K),
+            kernel_name="matmul",
+            pipeline=Pipeline().bufferize().lower_to_llvm(),
+        )
+        invoker = self.backend.load(module)
+
+        batch = [matmul_args(M, N, K) for _ in range(64)]
+        with LLVMJITBackendExecutor(invoker, max_workers=4) as executor:
+            futures = [executor.submit("matmul", *args) for args in batch]
+            for f in futures:
+                f.result()
+            for A, B, C in batch:
+                assert np.allclose(A @ B, C)
+
+            for _ in executor.map("matmul", batch):
+                pass
+            for A, B, C in batch:
+                assert np.allclose(2 * (A @ B), C)
+
+    def test_export_shared_library(self, tmp_path):
+        M, N, K = 4, 16, 8
+
+        module = self.backend.compile(
+            matmul_module(M, N, K),
+            kernel_name="matmul",
+            pipeline=Pipeline().bufferize().lower_to_llvm(),
+        )
+        lib_path = self.backend.export_shared_library(
+            module, tmp_path / f"libmatmul.{shlib_ext()}", opt_level=3
+        )
+        invoker = load_shared_library(lib_path)
+        assert isinstance(invoker.ee, SharedLibraryEngine)
+
+        A, B, C = matmul_args(M, N, K)
+        invoker.matmul(A, B, C)
+        assert np.allclose(A @ B, C)
+
+    def test_engine_cache(self):
+        def build(M, N, K):
+            return backend.compile(
+                matmul_module(M, N, K),
+                kernel_name="matmul",
+                pipeline=Pipeline().bufferize().lower_to_llvm(),
+            )
+
+        engine_cache = EngineCache(max_entries=2)
+        backend = LLVMJITBackend(
+            shared_libs=[str(c_runner_utils_lib_path), str(runner_utils_lib_path)],
+            engine_cache=engine_cache,
+        )
+        shapes = [(4, 16, 8), (8, 16, 4), (16, 8, 4)]
+        modules = [build(*shape) for shape in shapes]
+
+        first = backend.load(modules[0])
+        assert backend.load(modules[0]).ee is first.ee
+
+        # hits use the key stamped by compile, rather than rehashing the IR
+        def fail(*args, **kwargs):
+            raise AssertionError("loads must not fingerprint the lowered IR")
+
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(refbackend, "module_fingerprint", fail)
+            assert backend.load(modules[0]).ee is first.ee
+        assert backend.load(modules[0], opt_level=3).ee is not first.ee
+        assert len(engine_cache) == 2
+
+        backend.load(modules[1])
+        assert len(engine_cache) == 2
+        # the least recently used variant got evicted
+        assert backend.load(modules[0]).ee is not first.ee
+
+        for (M, N, K), module in zip(shapes, modules):
+            A, B, C = matmul_args(M, N, K)
+            backend.load(module).matmul(A, B, C)
+            assert np.allclose(A @ B, C)
+
+        engine_cache.max_bytes = 0
+        backend.load(modules[2], opt_level=1)
+        assert len(engine_cache) == 1
+        # the size of the generated code
+        assert engine_cache.total_bytes > 0
+
+    def test_compile_many(self, tmp_path):
+        backend = LLVMJITBackend(
+            shared_libs=[str(c_runner_utils_lib_path), str(runner_utils_lib_path)],
+            cache_dir=tmp_path,
+        )
+        shapes = [(4, 16, 8), (8, 16, 4), (16, 8, 4), (2, 2, 2)]
+        modules = backend.compile_many(
+            [matmul_module(*shape) for shape in shapes],
+            Pipeline().bufferize().lower_to_llvm(),
+            kernel_name="matmul",
+            max_workers=2,
+            opt_level=3,
+        )
+        for (M, N, K), module in zip(shapes, modules):
+            key = backend.native_cache_key(module, opt_level=3)
+            assert (backend.cache.entry_dir(key) / OBJECT_FILENAME).exists()
+            A, B, C = matmul_args(M, N, K)
+            backend.load(module, opt_level=3).matmul(A, B, C)
+            assert np.allclose(A @ B, C)
+
+    def test_host_target(self):
+        M, N, K = 4, 16, 8
+        module = matmul_module(M, N, K)
+
+        target = Target.host()
+        backend = LLVMJITBackend(
+            shared_libs=[str(c_runner_utils_lib_path), str(runner_utils_lib_path)],
+            target=target,
+        )
+        report = backend.target_report()
+        assert report["cpu"] == (target.cpu or "host")
+        assert report["features"] == target.features
+        # the host's CPU is resolved (by the C compiler driver)
+        assert target.cpu is not None
+
+        module = backend.compile(
+            module,
+            kernel_name="matmul",
+            pipeline=Pipeline().bufferize().lower_to_llvm(),
+        )
+        untargeted = LLVMJITBackend(shared_libs=backend.shared_libs)
+        # unpinned backends key native code by the host target too
+        assert untargeted.native_cache_key(
+            module, opt_level=3
+        ) == backend.native_cache_key(module, opt_level=3)
+        assert LLVMJITBackend(
+            shared_libs=backend.shared_libs, target=Target("generic")
+        ).native_cache_key(module, opt_level=3) != backend.native_cache_key(
+            module, opt_level=3
+        )
+
+        invoker = backend.load(module, opt_level=3)
+        if target.features:
+            assert "target-features" in str(module)
+
+        A, B, C = matmul_args(M, N, K)
+        invoker.matmul(A, B, C)
+        assert np.allclose(A @ B, C)
+
+    def test_async_invoker(self):
+        M, N, K = 4, 16, 8
+
+        module = self.backend.compile(
+            matmul_module(M, N, K),
+            kernel_name="matmul",
+            pipeline=Pipeline().bufferize().lower_to_llvm(),
+        )
+        batch = [matmul_args(M, N, K) for _ in range(32)]
+
+        async def serve():
+            async with AsyncLLVMJITBackendInvoker(
+                self.backend.load(module), max_workers=4, max_pending=2
+            ) as invoker:
+                await asyncio.gather(*[invoker.matmul(*args) for args in batch])
+
+        asyncio.run(serve())
+        for A, B, C in batch:
+            assert np.allclose(A @ B, C)
+
+    def test_pass_stats(self):
+        M, N, K = 4, 16, 8
+        module = matmul_module(M, N, K)
+
+        pipeline = Pipeline().bufferize().lower_to_llvm()
+        passes = split_pipeline(pipeline.materialize())
+        assert all(p.startswith("builtin.module(") for p in passes)
+        assert "builtin.module(func.func(buffer-deallocation))" in passes
+
+        backend = LLVMJITBackend(shared_libs=self.backend.shared_libs)
+        module = backend.compile(
+            module, kernel_name="matmul", pipeline=pipeline, collect_pass_stats=True
+        )
+        report = backend.last_pipeline_report
+        assert [p.pass_pipeline for p in report.passes] == passes
+        loops = ["affine.for", "scf.for"]
+        first, last = report.passes[0], report.passes[-1]
+        assert sum(first.op_counts_before.get(l, 0) for l in loops) == 3
+        assert not any(l in last.op_counts_after for l in loops)
+        assert last.op_counts_after["llvm.func"] > 0
+        for before, after in zip(report.passes, report.passes[1:]):
+            assert before.op_counts_after == after.op_counts_before
+        assert report.total_wall_time_s > 0
+        assert report.process_peak_rss_bytes > 0
+        assert all(p.peak_rss_growth_bytes >= 0 for p in report.passes)
+        assert len(report.as_dict()["passes"]) == len(passes)
+        print()
+        print(report)
+
+        invoker = backend.load(module)
+        A, B, C = matmul_args(M, N, K)
+        invoker.matmul(A, B, C)
+        assert np.allclose(A @ B, C)
+
+    def test_pass_stats_ir_printing(self, capfd):
+        report = PipelineReport()
+        run_pipeline(
+            matmul_module(4, 16, 8),
+            Pipeline().bufferize().lower_to_llvm().materialize(),
+            enable_ir_printing=True,
+            pass_stats=report,
+        )
+        _out, err = capfd.readouterr()
+        # running the passes one by one still prints the IR after each of them
+        assert err.count("IR Dump After") >= len(report.passes) > 0
+
+    def test_loop_profile(self):
+        M, N, K = 4, 16, 8
+
+        module = self.backend.compile(
+            matmul_module(M, N, K),
+            kernel_name="matmul",
+            pipeline=Pipeline().bufferize().lower_to_llvm(),
+            profile_loops=True,
+        )
+        invoker = self.backend.load(module)
+        A, B, C = matmul_args(M, N, K)
+        n_calls = 3
+        for _ in range(n_calls):
+            invoker.matmul(A, B, C)
+
+        report = invoker.read_loop_profile()
+        assert [l.loop.depth for l in report.loops] == [0, 1, 2]
+        assert [l.entries for l in report.loops] == [
+            n_calls,
+            n_calls * M,
+            n_calls * M * N,
+        ]
+        assert [l.trips for l in report.loops] == [
+            n_calls * M,
+            n_calls * M * N,
+            n_calls * M * N * K,
+        ]
+        # inclusive times
+        outer, middle, inner = report.loops
+        assert outer.time_ns >= middle.time_ns >= inner.time_ns > 0
+        # keyed to the lines of the for loops in `matmul_module`
+        assert all(l.loop.source.startswith("util.py:") for l in report.loops)
+        assert len({l.loop.source for l in report.loops}) == 3
+        print()
+        print(report)
+
+        # reading resets the counters
+        assert all(l.entries == 0 for l in invoker.read_loop_profile().loops)
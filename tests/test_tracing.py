@@ -0,0 +1,75 @@
+import json
+
+import numpy as np
+
+from nelli.mlir import tracing
+from nelli.mlir.affine import RankedAffineMemRefValue as AffineMemRef
+from nelli.mlir.func import mlir_func
+from nelli.mlir.passes import Pipeline
+from nelli.mlir.refbackend import LLVMJITBackend
+from nelli.mlir.utils import F32
+from nelli.utils import mlir_mod_ctx
+
+
+class TestTracing:
+    def test_disabled(self):
+        assert not tracing.enabled()
+        assert tracing.span("anything") is tracing.span("else")
+
+    def test_trace(self, tmp_path):
+        path = tmp_path / "trace.json"
+        with tracing.trace(path, pass_spans=True) as tracer:
+            with mlir_mod_ctx() as module:
+
+                @mlir_func
+                def double(A: AffineMemRef[(8,), F32]):
+                    for i in range(0, 8):
+                        A[i] = A[i] + A[i]
+
+            backend = LLVMJITBackend()
+            module = backend.compile(
+                module,
+                Pipeline().lower_to_llvm(),
+                kernel_name="double",
+            )
+            invoker = backend.load(module)
+            A = np.ones(8, dtype=np.float32)
+            for _ in range(3):
+                invoker.double(A)
+        assert not tracing.enabled()
+        assert np.all(A == 8)
+
+        events = json.loads(path.read_text())["traceEvents"]
+        spans = [e for e in events if e["ph"] == "X"]
+        assert len(spans) == len(tracer.events)
+        names = [e["name"] for e in spans]
+        for name in ["rewrite_ast", "rewrite_bytecode", "build_ir", "run_pipeline"]:
+            assert name in names
+        assert "ExecutionEngine" in names and "codegen" in names
+        assert names.count("double") == 3
+        cats = {e["cat"] for e in spans}
+        assert {"frontend", "compile", "pass", "jit", "invoke"} <= cats
+
+        # every pass is nested in the pipeline
+        [pipeline] = [e for e in spans if e["name"] == "run_pipeline"]
+        for e in spans:
+            if e["cat"] == "pass":
+                assert pipeline["ts"] <= e["ts"]
+                assert e["ts"] + e["dur"] <= pipeline["ts"] + pipeline["dur"]
+
+    def test_no_pass_spans(self):
+        with tracing.trace() as tracer:
+            with mlir_mod_ctx() as module:
+
+                @mlir_func
+                def double(A: AffineMemRef[(8,), F32]):
+                    for i in range(0, 8):
+                        A[i] = A[i] + A[i]
+
+            LLVMJITBackend().compile(
+                module, Pipeline().lower_to_llvm(), kernel_name="double"
+            )
+        # the pipeline runs as a whole, in a single span
+        cats = [e["cat"] for e in tracer.events]
+        assert cats.count("compile") == 1
+        assert "pass" not in cats
@@ -0,0 +1,142 @@
+from textwrap import dedent
+
+import numpy as np
+from numpy.random import randn
+
+from nelli.mlir import vector
+from nelli.mlir.affine import RankedAffineMemRefValue as AffineMemRef
+from nelli.mlir.func import mlir_func
+from nelli.mlir.memref import MemRefValue as MemRef
+from nelli.mlir.passes import Pipeline
+from nelli.mlir.refbackend import LLVMJITBackend
+from nelli.mlir.utils import F32
+from nelli.mlir.vector import VectorValue as Vector
+from nelli.utils import mlir_mod_ctx
+from util import check_correct
+
+
+class TestVector:
+    backend = LLVMJITBackend()
+
+    def test_saxpy(self):
+        with mlir_mod_ctx() as module:
+
+            @mlir_func
+            def saxpy(a: F32, X: AffineMemRef[(16,), F32], Y: AffineMemRef[(16,), F32]):
+                for i in range(0, 16, 8):
+                    x = vector.load(X, [i], (8,))
+                    y = vector.load(Y, [i], (8,))
+                    (a * x + y).store(Y, [i])
+
+        correct = dedent(
+            """\
+        module {
+          func.func @saxpy(%arg0: f32, %arg1: memref<16xf32>, %arg2: memref<16xf32>) {
+            affine.for %arg3 = 0 to 16 step 8 {
+              %0 = vector.load %arg1[%arg3] : memref<16xf32>, vector<8xf32>
+              %1 = vector.load %arg2[%arg3] : memref<16xf32>, vector<8xf32>
+              %2 = vector.broadcast %arg0 : f32 to vector<8xf32>
+              %3 = arith.mulf %2, %0 : vector<8xf32>
+              %4 = arith.addf %3, %1 : vector<8xf32>
+              vector.store %4, %arg2[%arg3] : memref<16xf32>, vector<8xf32>
+            }
+            return
+          }
+        }
+        """
+        )
+        check_correct(correct, module)
+
+    def test_dot(self):
+        with mlir_mod_ctx() as module:
+
+            @mlir_func
+            def dot(X: AffineMemRef[(64,), F32], Y: AffineMemRef[(64,), F32]):
+                acc = vector.broadcast(0.0, (8,), F32)
+                for i in range(0, 64, 8):
+                    x = vector.load(X, [i], (8,))
+                    acc = x.fma(vector.load(Y, [i], (8,)), acc)
+                return acc.reduce("add")
+
+        correct = dedent(
+            """\
+        module {
+          func.func @dot(%arg0: memref<64xf32>, %arg1: memref<64xf32>) -> f32 {
+            %cst = arith.constant 0.000000e+00 : f32
+            %0 = vector.broadcast %cst : f32 to vector<8xf32>
+            %1 = affine.for %arg2 = 0 to 64 step 8 iter_args(%arg3 = %0) -> (vector<8xf32>) {
+              %3 = vector.load %arg0[%arg2] : memref<64xf32>, vector<8xf32>
+              %4 = vector.load %arg1[%arg2] : memref<64xf32>, vector<8xf32>
+              %5 = vector.fma %3, %4, %arg3 : vector<8xf32>
+              affine.yield %5 : vector<8xf32>
+            }
+            %2 = vector.reduction <add>, %1 : vector<8xf32> into f32
+            return %2 : f32
+          }
+        }
+        """
+        )
+        check_correct(correct, module)
+
+    def test_vector_args(self):
+        with mlir_mod_ctx() as module:
+
+            @mlir_func
+            def scale(v: Vector[(4,), F32], s: F32):
+                return -(v * s) + 1.0
+
+        correct = dedent(
+            """\
+        module {
+          func.func @scale(%arg0: vector<4xf32>, %arg1: f32) -> vector<4xf32> {
+            %0 = vector.broadcast %arg1 : f32 to vector<4xf32>
+            %1 = arith.mulf %arg0, %0 : vector<4xf32>
+            %2 = arith.negf %1 : vector<4xf32>
+            %cst = arith.constant 1.000000e+00 : f32
+            %3 = vector.broadcast %cst : f32 to vector<4xf32>
+            %4 = arith.addf %2, %3 : vector<4xf32>
+            return %4 : vector<4xf32>
+          }
+        }
+        """
+        )
+        check_correct(correct, module)
+
+    def test_transfer_runtime(self):
+        N = 20
+
+        with mlir_mod_ctx() as module:
+
+            @mlir_func
+            def sum_tail(
+                X: AffineMemRef[(N,), F32],
+                Y: AffineMemRef[(N,), F32],
+                Out: MemRef[(1,), F32],
+            ):
+                acc = vector.broadcast(0.0, (8,), F32)
+                # 20 isn't a multiple of 8, so the last read is partially out
+                # of bounds (and padded with zeros)
+                for i in range(0, N, 8):
+                    x = vector.transfer_read(X, [i], (8,))
+                    x.transfer_write(Y, [i])
+                    acc = acc + x
+                Out[0] = acc.reduce("add")
+
+        module = self.backend.compile(
+            module,
+            kernel_name="sum_tail",
+            pipeline=Pipeline().bufferize().lower_to_llvm(vector=True),
+        )
+        X = randn(N).astype(np.float32)
+        Y = np.zeros(N, dtype=np.float32)
+        Out = np.zeros(1, dtype=np.float32)
+        self.backend.load(module).sum_tail(X, Y, Out)
+        assert np.allclose(X, Y)
+        assert np.allclose(X.sum(), Out[0], rtol=1e-5)
+
+    def test_lower_to_llvm_vector_flag(self):
+        default = Pipeline().lower_to_llvm().materialize()
+        assert "vector" not in default
+        with_vector = Pipeline().lower_to_llvm(vector=True).materialize()
+        assert "convert-vector-to-scf" in with_vector
+        assert "convert-vector-to-llvm" in with_vector
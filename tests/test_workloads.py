@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from nelli.mlir.benchmark import create_sparse_np_tensor
+from nelli.mlir.workloads import (
+    SparseCOO,
+    SparseCSR,
+    random_dense,
+    random_sparse,
+    random_sparse_indices,
+)
+
+
+class TestWorkloads:
+    shape = (100, 150)
+    nnz = 1000
+
+    @pytest.mark.parametrize("pattern", ["uniform", "banded", "block", "power_law"])
+    def test_patterns(self, pattern):
+        dense = random_sparse(self.shape, nnz=self.nnz, pattern=pattern, seed=0)
+        assert dense.shape == self.shape
+        nnz = np.count_nonzero(dense)
+        if pattern == "block":
+            # rounded up to whole blocks
+            assert nnz >= self.nnz
+        else:
+            assert nnz == self.nnz
+        # reproducible
+        assert np.array_equal(
+            dense, random_sparse(self.shape, nnz=self.nnz, pattern=pattern, seed=0)
+        )
+        assert not np.array_equal(
+            dense, random_sparse(self.shape, nnz=self.nnz, pattern=pattern, seed=1)
+        )
+
+        coo = random_sparse(
+            self.shape, nnz=self.nnz, pattern=pattern, seed=0, format="coo"
+        )
+        assert isinstance(coo, SparseCOO)
+        assert coo.nnz == nnz
+        assert np.array_equal(coo.to_dense(), dense)
+
+        csr = random_sparse(
+            self.shape, nnz=self.nnz, pattern=pattern, seed=0, format="csr"
+        )
+        assert isinstance(csr, SparseCSR)
+        assert csr.indptr[-1] == nnz
+        assert np.array_equal(csr.to_dense(), dense)
+
+    def test_banded(self):
+        dense = random_sparse(
+            self.shape, nnz=self.nnz, pattern="banded", bandwidth=5, seed=0
+        )
+        rows, cols = np.nonzero(dense)
+        assert np.abs(rows - cols).max() <= 5
+
+    def test_block(self):
+        dense = random_sparse(
+            (64, 64), nnz=160, pattern="block", block_shape=(4, 8), seed=0
+        )
+        blocks = dense.reshape(16, 4, 8, 8).transpose(0, 2, 1, 3).reshape(16, 8, -1)
+        nonzeros_per_block = np.count_nonzero(blocks, axis=-1)
+        assert set(np.unique(nonzeros_per_block)) == {0, 32}
+
+    def test_power_law(self):
+        dense = random_sparse(
+            (1000, 1000), nnz=20000, pattern="power_law", alpha=1.5, seed=0
+        )
+        degrees = np.sort(np.count_nonzero(dense, axis=1))[::-1]
+        assert degrees.sum() == 20000
+        assert degrees[0] > 10 * np.median(degrees)
+
+    def test_density(self):
+        idx = random_sparse_indices((3, 4, 5), density=0.5, seed=0)
+        assert len(idx) == 30
+        assert np.all(np.diff(idx) > 0)
+
+    def test_memmap(self, tmp_path):
+        dense = random_sparse(
+            self.shape, density=0.1, seed=0, memmap_path=tmp_path / "dense.npy"
+        )
+        assert isinstance(dense, np.memmap)
+        dense.flush()
+        assert np.array_equal(np.load(tmp_path / "dense.npy"), dense)
+
+        csr = random_sparse(
+            self.shape, density=0.1, seed=0, format="csr", memmap_path=tmp_path / "a"
+        )
+        assert isinstance(csr.indices, np.memmap)
+        assert np.array_equal(np.load(tmp_path / "a.values.npy"), csr.values)
+        assert np.array_equal(csr.to_dense(), dense)
+
+        ones = random_dense((1000, 10), seed=0, memmap_path=tmp_path / "ones.npy")
+        assert isinstance(ones, np.memmap)
+        assert np.all((0 <= ones) & (ones < 1))
+
+        # the suffix is added if missing
+        random_dense((10, 10), seed=0, memmap_path=tmp_path / "b")
+        assert np.load(tmp_path / "b.npy").shape == (10, 10)
+
+    def test_large_uniform(self):
+        # the population (10 ** 12 cells) is never materialized
+        idx = random_sparse_indices((10**6, 10**6), nnz=1000, seed=0)
+        assert len(idx) == 1000
+        assert np.all(np.diff(idx) > 0)
+
+    def test_create_sparse_np_tensor(self):
+        tensor = create_sparse_np_tensor([10, 20, 30], 1000, seed=0)
+        assert np.count_nonzero(tensor) == 1000
+        assert np.all(tensor[tensor != 0] >= 1)
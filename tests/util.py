@@ -2,6 +2,14 @@ import difflib
 import re
 from textwrap import dedent
 
+from numpy import zeros
+from numpy.random import randn
+
+from nelli.mlir.affine import RankedAffineMemRefValue as MemRef
+from nelli.mlir.func import mlir_func
+from nelli.mlir.utils import F64
+from nelli.utils import mlir_mod_ctx
+
 
 def check_correct(correct, module):
     correct = dedent(re.sub(r"([%#@]\w+)|(\^bb\d+)|(0x\w+)", "%DONT_CARE", correct))
@@ -14,3 +22,26 @@ def check_correct(correct, module):
         )
     )
     assert len(diff) == 0, "\n".join(diff)
+
+
+def matmul_module(M, N, K, dtype=F64):
+    """A module with an affine `matmul(A: MxN, B: NxK, C: MxK)` (accumulating
+    into `C`)."""
+    with mlir_mod_ctx() as module:
+
+        @mlir_func
+        def matmul(
+            A: MemRef[(M, N), dtype],
+            B: MemRef[(N, K), dtype],
+            C: MemRef[(M, K), dtype],
+        ):
+            for i in range(0, M):
+                for j in range(0, N):
+                    for k in range(0, K):
+                        C[i, k] += A[i, j] * B[j, k]
+
+    return module
+
+
+def matmul_args(M, N, K):
+    return randn(M, N), randn(N, K), zeros((M, K))